@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Inter-annotator agreement for any number of annotators with possibly missing labels: Cohen's kappa
+(pairwise), Fleiss' kappa and Krippendorff's alpha, plus per-class agreement, all computed from
+label count and coincidence matrices.
+
+Labels are held in a reliability matrix of integer codes, shape (num_items, num_annotators), with
+MISSING where an annotator did not label an item. Build it from wide columns (`label_matrix`, e.g.
+Human1_Annotation/Human2_Annotation) or from long (item, annotator, label) records (`matrix_from_records`).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+MISSING = -1
+# Claim labels of the annotation guidelines, in order of increasing check-worthiness
+CLAIM_LABELS = ['NFS', 'UFS', 'CFS']
+
+
+def _encode(values, categories):
+    """Codes of `values` in `categories`; empty, NA or unknown values become MISSING."""
+    lookup = {category: code for code, category in enumerate(categories)}
+    labels = pd.Series(values, dtype=object)
+    codes = labels.where(labels.map(type) == str, '').str.strip().str.upper().map(lookup)
+    return codes.fillna(MISSING).to_numpy(dtype=np.int64)
+
+
+def label_matrix(df, columns, categories=CLAIM_LABELS):
+    """Reliability matrix from one label column per annotator (e.g. ['Human1_Annotation', 'Human2_Annotation'])."""
+    return np.column_stack([_encode(df[col].to_numpy(dtype=object), categories) for col in columns])
+
+
+def matrix_from_records(items, annotators, labels, categories=CLAIM_LABELS):
+    """
+    Reliability matrix from long-format annotations, where each annotator only labelled some items.
+
+    Returns:
+        tuple: (matrix, item ids, annotator ids) with rows/columns in order of first appearance.
+    """
+    item_codes, item_ids = pd.factorize(pd.Series(items), sort=False)
+    annotator_codes, annotator_ids = pd.factorize(pd.Series(annotators), sort=False)
+    matrix = np.full((len(item_ids), len(annotator_ids)), MISSING, dtype=np.int64)
+    matrix[item_codes, annotator_codes] = _encode(np.asarray(labels, dtype=object), categories)
+    return matrix, list(item_ids), list(annotator_ids)
+
+
+def category_counts(matrix, num_categories):
+    """n_ic: how many annotators gave item i category c (missing labels are ignored)."""
+    matrix = np.asarray(matrix)
+    rows, cols = np.nonzero(matrix != MISSING)
+    flat = rows * num_categories + matrix[rows, cols]
+    return np.bincount(flat, minlength=len(matrix) * num_categories).reshape(len(matrix), num_categories)
+
+
+def coincidence_matrix(matrix, num_categories):
+    """
+    Krippendorff's coincidence matrix o_ck: pairs of values (c, k) given to the same item by different
+    annotators, each item weighted by 1 / (m_i - 1). Items with fewer than two labels are not pairable.
+    """
+    counts = category_counts(matrix, num_categories).astype(np.float64)
+    labels_per_item = counts.sum(axis=1)
+    pairable = labels_per_item >= 2
+    counts = counts[pairable]
+    weights = 1.0 / (labels_per_item[pairable] - 1)
+    weighted = counts * weights[:, None]
+    return weighted.T @ counts - np.diag(weighted.sum(axis=0))
+
+
+def _distance_matrix(num_categories, level):
+    categories = np.arange(num_categories)
+    if level == 'nominal':
+        return (categories[:, None] != categories[None, :]).astype(np.float64)
+    if level == 'interval':
+        return (categories[:, None] - categories[None, :]).astype(np.float64) ** 2
+    raise ValueError(f"Unknown measurement level: {level} (use 'nominal' or 'interval')")
+
+
+def krippendorff_alpha(matrix, num_categories=len(CLAIM_LABELS), level='nominal'):
+    """
+    Krippendorff's alpha from the coincidence matrix; handles any number of annotators and missing labels.
+
+    Args:
+        level (str): 'nominal' (NFS/UFS/CFS as unordered classes) or 'interval' (codes as equally spaced).
+    """
+    coincidences = coincidence_matrix(matrix, num_categories)
+    totals = coincidences.sum(axis=1)
+    n = totals.sum()
+    if n <= 1:
+        return float('nan')
+    distances = _distance_matrix(num_categories, level)
+    observed = (coincidences * distances).sum()
+    expected = (np.outer(totals, totals) * distances).sum() / (n - 1)
+    if expected == 0:
+        return 1.0
+    return float(1 - observed / expected)
+
+
+def fleiss_kappa(matrix, num_categories=len(CLAIM_LABELS)):
+    """
+    Fleiss' kappa, generalised to a varying number of labels per item (items with fewer than two labels
+    are skipped).
+    """
+    counts = category_counts(matrix, num_categories).astype(np.float64)
+    labels_per_item = counts.sum(axis=1)
+    counts, labels_per_item = counts[labels_per_item >= 2], labels_per_item[labels_per_item >= 2]
+    if len(counts) == 0:
+        return float('nan')
+    item_agreement = ((counts ** 2).sum(axis=1) - labels_per_item) / (labels_per_item * (labels_per_item - 1))
+    observed = item_agreement.mean()
+    category_shares = counts.sum(axis=0) / labels_per_item.sum()
+    expected = (category_shares ** 2).sum()
+    if expected == 1:
+        return 1.0
+    return float((observed - expected) / (1 - expected))
+
+
+def confusion_matrix(labels_a, labels_b, num_categories=len(CLAIM_LABELS)):
+    """Confusion matrix of two annotators over the items both labelled (rows: a, columns: b)."""
+    labels_a, labels_b = np.asarray(labels_a), np.asarray(labels_b)
+    both = (labels_a != MISSING) & (labels_b != MISSING)
+    flat = labels_a[both] * num_categories + labels_b[both]
+    return np.bincount(flat, minlength=num_categories ** 2).reshape(num_categories, num_categories)
+
+
+def cohen_kappa(labels_a, labels_b, num_categories=len(CLAIM_LABELS)):
+    """Cohen's kappa of two annotators over the items both labelled."""
+    confusion = confusion_matrix(labels_a, labels_b, num_categories).astype(np.float64)
+    n = confusion.sum()
+    if n == 0:
+        return float('nan')
+    observed = np.trace(confusion) / n
+    expected = (confusion.sum(axis=1) * confusion.sum(axis=0)).sum() / n ** 2
+    if expected == 1:
+        return 1.0
+    return float((observed - expected) / (1 - expected))
+
+
+def pairwise_cohen_kappa(matrix, num_categories=len(CLAIM_LABELS)):
+    """Cohen's kappa for every pair of annotators: {(a, b): kappa}."""
+    matrix = np.asarray(matrix)
+    return {
+        (a, b): cohen_kappa(matrix[:, a], matrix[:, b], num_categories)
+        for a in range(matrix.shape[1]) for b in range(a + 1, matrix.shape[1])
+    }
+
+
+def per_class_agreement(matrix, categories=CLAIM_LABELS):
+    """
+    Per-class view of the coincidence matrix: how often a value of class c is paired with another value
+    of class c, and Krippendorff's alpha of the binary c-vs-rest labelling.
+
+    Returns:
+        list: One dict per class.
+    """
+    num_categories = len(categories)
+    coincidences = coincidence_matrix(matrix, num_categories)
+    totals = coincidences.sum(axis=1)
+    matrix = np.asarray(matrix)
+    rows = []
+    for code, category in enumerate(categories):
+        binary = np.where(matrix == MISSING, MISSING, (matrix == code).astype(np.int64))
+        rows.append({
+            'label': category,
+            'pairable_values': float(totals[code]),
+            'specific_agreement': float(coincidences[code, code] / totals[code]) if totals[code] > 0 else float('nan'),
+            'alpha_vs_rest': krippendorff_alpha(binary, 2),
+        })
+    return rows
+
+
+def agreement_report(matrix, categories=CLAIM_LABELS):
+    """
+    Every agreement statistic of a reliability matrix.
+
+    Returns:
+        dict: Items/annotator counts, mean pairwise Cohen's kappa, Fleiss' kappa, nominal and interval
+        Krippendorff's alpha, the coincidence matrix and per-class agreement.
+    """
+    matrix = np.asarray(matrix)
+    num_categories = len(categories)
+    pairwise = pairwise_cohen_kappa(matrix, num_categories)
+    labelled = (matrix != MISSING).sum(axis=1)
+    return {
+        'items': int(len(matrix)),
+        'annotators': int(matrix.shape[1]),
+        'labels': int(labelled.sum()),
+        'pairable_items': int((labelled >= 2).sum()),
+        'cohen_kappa_mean': float(np.nanmean(list(pairwise.values()))) if pairwise else float('nan'),
+        'fleiss_kappa': fleiss_kappa(matrix, num_categories),
+        'krippendorff_alpha': krippendorff_alpha(matrix, num_categories, 'nominal'),
+        'krippendorff_alpha_interval': krippendorff_alpha(matrix, num_categories, 'interval'),
+        'coincidence_matrix': coincidence_matrix(matrix, num_categories).tolist(),
+        'per_class': per_class_agreement(matrix, categories),
+    }
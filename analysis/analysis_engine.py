@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Analysis engine: loads analysis.csv and human_annotations.csv once into NumPy columns and computes
+every statistic reported in the paper (conversation, extraction, prevalence, annotator agreement and
+classifier effectiveness). The per-table scripts in this folder are thin front-ends over this module;
+running it directly writes all tables as JSON/CSV in one pass.
+"""
+
+import os
+import csv
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from text_stats import count_words_array
+from agreement import CLAIM_LABELS, label_matrix, agreement_report
+from cw_metrics import METRICS, confusion_matrices, metrics_from_counts, bootstrap_metrics, pairwise_tests
+from bool_arrays import (
+    parse_bool_arrays,
+    save_bool_arrays,
+    load_bool_arrays,
+    cache_path_for,
+    cache_is_fresh,
+)
+
+
+ANNOTATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'annotations')
+ANALYSIS_CSV = os.path.join(ANNOTATIONS_DIR, 'analysis.csv')
+HUMAN_ANNOTATIONS_CSV = os.path.join(ANNOTATIONS_DIR, 'human_annotations.csv')
+
+EXTRACTION_METHODS = ['FHuo', 'FSong']
+CW_METHODS = ['Hassan', 'Majer', 'Intersection', 'Union']
+# FHuo_Hassan, FHuo_Majer, ..., FSong_Union: one bool per extracted claim of the utterance
+CW_ARRAY_COLUMNS = [f'{extraction}_{cw}' for extraction in EXTRACTION_METHODS for cw in CW_METHODS]
+BINARY_COLUMNS = ['Hassan_Binary', 'Majer_Binary', 'Intersection', 'Union']
+# Utterance attributes prevalence can be broken down by -> engine table name
+PREVALENCE_GROUPS = {
+    'Task_Classification': 'prevalence_by_task',
+    'Selected_Agent_Column': 'prevalence_by_agent_column',
+}
+
+ANALYSIS_COLUMNS = [
+    'Conversation_Hash', 'Turn_Num', 'Corresponding_User_Question', 'Selected_Agent_Utterance',
+    'Selected_Agent_Column', 'Task_Classification',
+] + CW_ARRAY_COLUMNS
+
+
+def count_words(text):
+    """Count words in a text string, handling empty/None values."""
+    if not text or text == '' or text == 'nan':
+        return 0
+    return len(str(text).split())
+
+
+def calculate_kappa(observed_agreement, expected_agreement):
+    """Calculate Cohen's kappa coefficient."""
+    if expected_agreement == 1:
+        return 1.0  # Perfect agreement
+    return (observed_agreement - expected_agreement) / (1 - expected_agreement)
+
+
+def calculate_precision_recall_f1(true_positives, false_positives, false_negatives):
+    """Calculate precision, recall, and F1 score."""
+    precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
+    recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
+    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    return precision, recall, f1
+
+
+def _pct(part, whole):
+    return (part / whole) * 100 if whole > 0 else 0
+
+
+def _segments(keys):
+    """
+    Sorts `keys` once for repeated segment reductions.
+
+    Returns:
+        tuple: (order, unique keys, start of each key's segment in key-sorted order).
+    """
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))) if len(keys) else np.zeros(0, dtype=np.int64)
+    return order, sorted_keys[starts], starts
+
+
+def _segment_any(segments, flags):
+    """Whether any flag is set within each segment from `_segments`."""
+    order, _, starts = segments
+    if len(starts) == 0:
+        return np.zeros(0, dtype=bool)
+    return np.maximum.reduceat(flags[order].astype(np.uint8), starts) > 0
+
+
+def _codes_in_order(values):
+    """Integer codes for `values` and the unique values, in order of first appearance (like a dict)."""
+    codes, uniques = pd.factorize(values, sort=False)
+    return codes.astype(np.int64), list(uniques)
+
+
+class AnalysisData:
+    """
+    Utterance-level annotations (annotations/analysis.csv) held as typed columns.
+
+    Attributes:
+        num_rows (int): Number of utterances.
+        conversation_codes (np.ndarray): int64 code per row into `conversations`.
+        conversations (list): Conversation hashes in order of first appearance.
+        turn_num (np.ndarray): int64 turn number per row (0 where `turn_valid` is False).
+        turn_valid (np.ndarray): bool, False where Turn_Num is not an integer.
+        user_question_words, agent_utterance_words (np.ndarray): int64 word counts per row.
+        task_classification, selected_agent_column (np.ndarray): object arrays of the raw labels.
+        cw_arrays (dict): CW array column -> RaggedBoolArray with the label of every claim.
+        claim_counts (dict): CW array column -> int64 number of claims per row.
+        cw_counts (dict): CW array column -> int64 number of check-worthy claims per row.
+    """
+
+    def __init__(self, df, cw_arrays=None):
+        self.num_rows = len(df)
+        self.conversation_codes, self.conversations = _codes_in_order(df['Conversation_Hash'].to_numpy(dtype=object))
+
+        turn_str = df['Turn_Num'].str.strip()
+        self.turn_valid = turn_str.str.fullmatch(r'[+-]?\d+').to_numpy(dtype=bool)
+        self.turn_num = np.zeros(self.num_rows, dtype=np.int64)
+        self.turn_num[self.turn_valid] = turn_str[self.turn_valid].astype(np.int64).to_numpy()
+
+        self.user_question_words = count_words_array(df['Corresponding_User_Question'])
+        self.agent_utterance_words = count_words_array(df['Selected_Agent_Utterance'])
+        self.task_classification = df['Task_Classification'].to_numpy(dtype=object)
+        self.selected_agent_column = df['Selected_Agent_Column'].to_numpy(dtype=object)
+        self.group_labels = {
+            'Task_Classification': self.task_classification,
+            'Selected_Agent_Column': self.selected_agent_column,
+        }
+
+        self.cw_arrays = cw_arrays if cw_arrays is not None else {col: parse_bool_arrays(df[col]) for col in CW_ARRAY_COLUMNS}
+        self.claim_counts = {col: array.lengths() for col, array in self.cw_arrays.items()}
+        self.cw_counts = {col: array.row_sums() for col, array in self.cw_arrays.items()}
+
+    @property
+    def num_conversations(self):
+        return len(self.conversations)
+
+    def per_conversation(self, values, mask=None):
+        """Sums a per-row array within each conversation (optionally only over rows where `mask`)."""
+        codes = self.conversation_codes if mask is None else self.conversation_codes[mask]
+        values = values if mask is None else values[mask]
+        return np.bincount(codes, weights=values, minlength=self.num_conversations)
+
+
+class HumanAnnotations:
+    """
+    Claim-level human annotations (annotations/human_annotations.csv) held as boolean columns.
+
+    Attributes:
+        method_codes (np.ndarray): int64 code per row into `methods`.
+        methods (list): Claim extraction methods in order of first appearance.
+        labels (dict): Column name (Human1_CW, Human2_CW, Gold, Hassan_Binary, ...) -> bool array.
+        claim_labels (np.ndarray): NFS/UFS/CFS codes per (claim, annotator), see agreement.label_matrix.
+    """
+
+    LABEL_COLUMNS = ['Human1_CW', 'Human2_CW', 'Gold'] + BINARY_COLUMNS
+    ANNOTATOR_COLUMNS = ['Human1_Annotation', 'Human2_Annotation']
+
+    def __init__(self, df):
+        self.num_rows = len(df)
+        self.method_codes, self.methods = _codes_in_order(df['Claim_Extr_Method'].to_numpy(dtype=object))
+        self.labels = {col: (df[col].str.upper() == 'TRUE').to_numpy(dtype=bool) for col in self.LABEL_COLUMNS}
+        self.claim_labels = label_matrix(df, self.ANNOTATOR_COLUMNS)
+
+    def method_mask(self, method):
+        return self.method_codes == self.methods.index(method)
+
+
+def load_analysis_data(csv_path=ANALYSIS_CSV, cache=False):
+    """
+    Reads analysis.csv once (only the columns the statistics use) and returns an AnalysisData.
+
+    With `cache=True` the parsed CW arrays are kept in a bit-packed `analysis.cw_arrays.npz` next to the
+    CSV; later loads read the arrays from it and skip the eight array columns of the CSV entirely.
+    """
+    cache_path = cache_path_for(csv_path)
+    if cache and cache_is_fresh(cache_path, csv_path, CW_ARRAY_COLUMNS):
+        cw_arrays = load_bool_arrays(cache_path)
+        columns = [col for col in ANALYSIS_COLUMNS if col not in CW_ARRAY_COLUMNS]
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, usecols=lambda col: col in columns)
+        return AnalysisData(df, cw_arrays={col: cw_arrays[col] for col in CW_ARRAY_COLUMNS})
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, usecols=lambda col: col in ANALYSIS_COLUMNS)
+    data = AnalysisData(df)
+    if cache:
+        save_bool_arrays(cache_path, data.cw_arrays)
+    return data
+
+
+def load_human_annotations(csv_path=HUMAN_ANNOTATIONS_CSV):
+    """Reads human_annotations.csv and returns a HumanAnnotations."""
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    return HumanAnnotations(df)
+
+
+def dataset_summary(data):
+    """Row, conversation and Selected_Agent_Column counts of analysis.csv."""
+    return {
+        'utterances': data.num_rows,
+        'conversations': data.num_conversations,
+        'selected_agent_columns': len(pd.unique(data.selected_agent_column)),
+    }
+
+
+def conversation_statistics(data):
+    """
+    Conversation structure, utterance lengths and task distribution (statistics_3k_conversation.py).
+    Rows whose Turn_Num is not an integer are left out of everything but the utterance count.
+
+    Returns:
+        dict: Summary values; `task_distribution` lists {task, count, pct} by decreasing count.
+    """
+    valid = data.turn_valid
+    turns_per_conversation = data.per_conversation(np.ones(data.num_rows), mask=valid)
+    present = turns_per_conversation > 0
+    conversations = int(present.sum())
+    single_turn = int((turns_per_conversation == 1).sum())
+    multi_turn = conversations - single_turn
+    turn_sums = data.per_conversation(data.turn_num.astype(np.float64), mask=valid)
+    avg_turns = turn_sums[present] / turns_per_conversation[present]
+
+    tasks = data.task_classification[valid]
+    task_codes, task_names = _codes_in_order(tasks)
+    task_counts = np.bincount(task_codes, minlength=len(task_names))
+    # Stable sort keeps first-seen order among ties, like Counter.most_common
+    order = np.argsort(-task_counts, kind='stable')
+    total_tasks = int(task_counts.sum())
+
+    return {
+        'utterances': data.num_rows,
+        'conversations': conversations,
+        'single_turn_conversations': single_turn,
+        'pct_single_turn': _pct(single_turn, conversations),
+        'multi_turn_conversations': multi_turn,
+        'pct_multi_turn': _pct(multi_turn, conversations),
+        'avg_turn_num': float(avg_turns.mean()) if len(avg_turns) else 0,
+        'avg_words_user_question': float(data.user_question_words[valid].mean()) if valid.any() else 0,
+        'avg_words_agent_utterance': float(data.agent_utterance_words[valid].mean()) if valid.any() else 0,
+        'task_classifications': total_tasks,
+        'unique_task_types': len(task_names),
+        'task_distribution': [
+            {'task': task_names[i], 'count': int(task_counts[i]), 'pct': _pct(int(task_counts[i]), total_tasks)}
+            for i in order
+        ],
+    }
+
+
+def extraction_statistics(data):
+    """
+    Claims extracted per utterance and conversation by FHuo and FSong (statistics_fact_claim_extraction_3k.py),
+    counted on the `<method>_Hassan` arrays (one entry per extracted claim).
+
+    Returns:
+        list: One dict per extraction method.
+    """
+    rows = []
+    for method in EXTRACTION_METHODS:
+        claims = data.claim_counts[f'{method}_Hassan']
+        per_conversation = data.per_conversation(claims)
+        total = int(claims.sum())
+        utterances_with_claims = int((claims > 0).sum())
+        conversations_with_claims = int((per_conversation > 0).sum())
+        rows.append({
+            'method': method,
+            'total_claims': total,
+            'avg_claims_per_utterance': total / data.num_rows if data.num_rows > 0 else 0,
+            'avg_claims_per_conversation': float(per_conversation.mean()) if data.num_conversations else 0,
+            'utterances_with_claims': utterances_with_claims,
+            'pct_utterances_with_claims': _pct(utterances_with_claims, data.num_rows),
+            'conversations_with_claims': conversations_with_claims,
+            'pct_conversations_with_claims': _pct(conversations_with_claims, data.num_conversations),
+        })
+    return rows
+
+
+def prevalence_statistics(data):
+    """
+    Prevalence of check-worthy claims for every extraction x CW method (prevalence_check_worthy_3k.py):
+    share of CW claims, of utterances with >=1 CW claim and of conversations with >=1 CW claim.
+
+    Returns:
+        list: One dict per CW array column.
+    """
+    rows = []
+    for col in CW_ARRAY_COLUMNS:
+        claims = data.claim_counts[col]
+        cw = data.cw_counts[col]
+        total_facts = int(claims.sum())
+        cw_facts = int(cw.sum())
+        utterances_with_cw = int((cw > 0).sum())
+        conversations_with_cw = int((data.per_conversation(cw) > 0).sum())
+        rows.append({
+            'column': col,
+            'total_facts': total_facts,
+            'cw_facts': cw_facts,
+            'pct_cw_facts': _pct(cw_facts, total_facts),
+            'utterances': data.num_rows,
+            'utterances_with_cw': utterances_with_cw,
+            'pct_utterances_with_cw': _pct(utterances_with_cw, data.num_rows),
+            'conversations': data.num_conversations,
+            'conversations_with_cw': conversations_with_cw,
+            'pct_conversations_with_cw': _pct(conversations_with_cw, data.num_conversations),
+        })
+    return rows
+
+
+def prevalence_breakdown(data, group_by='Task_Classification'):
+    """
+    Prevalence of check-worthy claims within each value of an utterance attribute (Task_Classification or
+    Selected_Agent_Column), computed with segment reductions: claim -> utterance (CSR row sums), then
+    utterance -> (group, conversation) pairs. A conversation counts for every group it has an utterance in,
+    and has a CW claim in a group if one of its utterances in that group does.
+
+    Returns:
+        list: One dict per (group value, CW array column); groups by decreasing number of utterances.
+    """
+    group_codes, group_names = _codes_in_order(data.group_labels[group_by])
+    num_groups = len(group_names)
+    utterances = np.bincount(group_codes, minlength=num_groups)
+    # One key per (group, conversation) pair
+    pair_keys = group_codes * max(data.num_conversations, 1) + data.conversation_codes
+    segments = _segments(pair_keys)
+    pair_groups = segments[1] // max(data.num_conversations, 1)
+    conversations = np.bincount(pair_groups, minlength=num_groups)
+
+    per_column = {}
+    for col in CW_ARRAY_COLUMNS:
+        has_cw = data.cw_counts[col] > 0
+        pair_has_cw = _segment_any(segments, has_cw)
+        per_column[col] = {
+            'total_facts': np.bincount(group_codes, weights=data.claim_counts[col], minlength=num_groups),
+            'cw_facts': np.bincount(group_codes, weights=data.cw_counts[col], minlength=num_groups),
+            'utterances_with_cw': np.bincount(group_codes, weights=has_cw, minlength=num_groups),
+            'conversations_with_cw': np.bincount(pair_groups[pair_has_cw], minlength=num_groups),
+        }
+
+    rows = []
+    for g in np.argsort(-utterances, kind='stable'):
+        for col in CW_ARRAY_COLUMNS:
+            counts = {name: int(values[g]) for name, values in per_column[col].items()}
+            rows.append({
+                group_by: group_names[g],
+                'column': col,
+                'total_facts': counts['total_facts'],
+                'cw_facts': counts['cw_facts'],
+                'pct_cw_facts': _pct(counts['cw_facts'], counts['total_facts']),
+                'utterances': int(utterances[g]),
+                'utterances_with_cw': counts['utterances_with_cw'],
+                'pct_utterances_with_cw': _pct(counts['utterances_with_cw'], int(utterances[g])),
+                'conversations': int(conversations[g]),
+                'conversations_with_cw': counts['conversations_with_cw'],
+                'pct_conversations_with_cw': _pct(counts['conversations_with_cw'], int(conversations[g])),
+            })
+    return rows
+
+
+def binary_agreement(predictions, gold):
+    """Confusion counts, precision/recall/F1 and Cohen's kappa of two boolean arrays."""
+    total = len(gold)
+    true_positives = int(np.sum(predictions & gold))
+    false_positives = int(np.sum(predictions & ~gold))
+    false_negatives = int(np.sum(~predictions & gold))
+    true_negatives = int(np.sum(~predictions & ~gold))
+    precision, recall, f1 = calculate_precision_recall_f1(true_positives, false_positives, false_negatives)
+    observed_agreement = (true_positives + true_negatives) / total if total > 0 else 0
+    pred_true_rate = (true_positives + false_positives) / total if total > 0 else 0
+    gold_true_rate = (true_positives + false_negatives) / total if total > 0 else 0
+    expected_agreement = (pred_true_rate * gold_true_rate) + ((1 - pred_true_rate) * (1 - gold_true_rate))
+    return {
+        'tp': true_positives,
+        'fp': false_positives,
+        'fn': false_negatives,
+        'tn': true_negatives,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'kappa': calculate_kappa(observed_agreement, expected_agreement),
+    }
+
+
+def annotator_agreement(annotations):
+    """
+    Share of check-worthy labels and Cohen's kappa between annotators, per claim extraction method
+    (statistics_human_annotations.py).
+
+    Returns:
+        list: One dict per method.
+    """
+    rows = []
+    for method in annotations.methods:
+        mask = annotations.method_mask(method)
+        human1 = annotations.labels['Human1_CW'][mask]
+        human2 = annotations.labels['Human2_CW'][mask]
+        gold = annotations.labels['Gold'][mask]
+        total = int(mask.sum())
+        rows.append({
+            'method': method,
+            'rows': total,
+            'human1_cw_true': int(human1.sum()),
+            'pct_human1_cw': _pct(int(human1.sum()), total),
+            'human2_cw_true': int(human2.sum()),
+            'pct_human2_cw': _pct(int(human2.sum()), total),
+            'gold_true': int(gold.sum()),
+            'pct_gold': _pct(int(gold.sum()), total),
+            'kappa_human1_gold': binary_agreement(human1, gold)['kappa'],
+            'kappa_human1_human2': binary_agreement(human1, human2)['kappa'],
+        })
+    return rows
+
+
+def claim_label_agreement(annotations):
+    """
+    Agreement between annotators on the 3-way NFS/UFS/CFS claim labels, per claim extraction method.
+
+    Returns:
+        tuple: (one summary dict per method, one dict per (method, label) with per-class agreement).
+    """
+    summaries, per_class = [], []
+    for method in annotations.methods:
+        report = agreement_report(annotations.claim_labels[annotations.method_mask(method)], CLAIM_LABELS)
+        for row in report.pop('per_class'):
+            per_class.append({'method': method, **row})
+        coincidences = report.pop('coincidence_matrix')
+        summaries.append({'method': method, **report, 'coincidence_matrix': json.dumps(coincidences)})
+    return summaries, per_class
+
+
+def classifier_effectiveness(annotations, bootstrap=0, confidence=0.95, seed=42):
+    """
+    Precision, recall, F1 and kappa of the automatic CW labels against Gold, per claim extraction method
+    (effectiveness_automatic_check_worthiness.py). The confusion matrices of all four columns are counted
+    in one pass per method.
+
+    Args:
+        bootstrap (int): Number of bootstrap resamples for confidence intervals (0 = point estimates only).
+        confidence (float): Confidence level of the intervals.
+
+    Returns:
+        list: One dict per (method, column); with bootstrap, `<metric>_ci_low`/`<metric>_ci_high` are added.
+    """
+    rows = []
+    for method in annotations.methods:
+        mask = annotations.method_mask(method)
+        gold = annotations.labels['Gold'][mask]
+        predictions = np.vstack([annotations.labels[column][mask] for column in BINARY_COLUMNS])
+        counts = confusion_matrices(predictions, gold)
+        metrics = metrics_from_counts(*counts.T)
+        intervals = bootstrap_metrics(predictions, gold, bootstrap, confidence, seed) if bootstrap else None
+        for i, column in enumerate(BINARY_COLUMNS):
+            row = {'method': method, 'column': column, 'rows': int(mask.sum())}
+            row.update(zip(['tp', 'fp', 'fn', 'tn'], (int(c) for c in counts[i])))
+            row.update({metric: float(metrics[metric][i]) for metric in METRICS})
+            if intervals is not None:
+                for metric in METRICS:
+                    row[f'{metric}_ci_low'] = float(intervals[metric][i, 1])
+                    row[f'{metric}_ci_high'] = float(intervals[metric][i, 2])
+            rows.append(row)
+    return rows
+
+
+def classifier_significance(annotations, metric='f1', num_permutations=10000, seed=42):
+    """
+    Paired McNemar and permutation tests between every two of the automatic CW labels, per claim
+    extraction method.
+
+    Returns:
+        list: One dict per (method, pair of columns).
+    """
+    rows = []
+    for method in annotations.methods:
+        mask = annotations.method_mask(method)
+        predictions = np.vstack([annotations.labels[column][mask] for column in BINARY_COLUMNS])
+        for row in pairwise_tests(predictions, BINARY_COLUMNS, annotations.labels['Gold'][mask], metric=metric,
+                                  num_permutations=num_permutations, seed=seed):
+            rows.append({'method': method, **row})
+    return rows
+
+
+def compute_all_tables(analysis_csv=ANALYSIS_CSV, human_annotations_csv=HUMAN_ANNOTATIONS_CSV, cache=False, bootstrap=0):
+    """
+    Loads each annotation file once and computes every table.
+    With `bootstrap` resamples, classifier effectiveness gets confidence intervals and significance tests.
+
+    Returns:
+        dict: Table name -> list of row dicts. Tables of a missing input file are left out.
+    """
+    tables = {}
+    if os.path.exists(analysis_csv):
+        data = load_analysis_data(analysis_csv, cache=cache)
+        conversation = conversation_statistics(data)
+        tables['dataset_summary'] = [dataset_summary(data)]
+        tables['task_distribution'] = conversation.pop('task_distribution')
+        tables['conversation_statistics'] = [conversation]
+        tables['extraction_statistics'] = extraction_statistics(data)
+        tables['prevalence'] = prevalence_statistics(data)
+        for group_by, table_name in PREVALENCE_GROUPS.items():
+            tables[table_name] = prevalence_breakdown(data, group_by)
+    else:
+        print(f"⚠️ {analysis_csv} not found; skipping utterance-level tables")
+    if os.path.exists(human_annotations_csv):
+        annotations = load_human_annotations(human_annotations_csv)
+        tables['annotator_agreement'] = annotator_agreement(annotations)
+        tables['claim_label_agreement'], tables['claim_label_agreement_per_class'] = claim_label_agreement(annotations)
+        tables['classifier_effectiveness'] = classifier_effectiveness(annotations, bootstrap=bootstrap)
+        if bootstrap:
+            tables['classifier_significance'] = classifier_significance(annotations, num_permutations=bootstrap)
+    else:
+        print(f"⚠️ {human_annotations_csv} not found; skipping human annotation tables")
+    return tables
+
+
+def write_tables(tables, output_dir, formats=('json', 'csv')):
+    """Writes all tables to `output_dir`: one tables.json and/or one CSV per table. Returns the paths written."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    if 'json' in formats:
+        path = os.path.join(output_dir, 'tables.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(tables, f, indent=2, ensure_ascii=False)
+        paths.append(path)
+    if 'csv' in formats:
+        for name, rows in tables.items():
+            path = os.path.join(output_dir, f'{name}.csv')
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else [])
+                writer.writeheader()
+                writer.writerows(rows)
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute every analysis table from the annotation files in one pass.")
+    parser.add_argument('--analysis_csv', default=ANALYSIS_CSV, help='Utterance-level annotations (default: annotations/analysis.csv)')
+    parser.add_argument('--human_annotations_csv', default=HUMAN_ANNOTATIONS_CSV, help='Human annotations (default: annotations/human_annotations.csv)')
+    parser.add_argument('--output_dir', default='tables', help='Where to write the tables (default: tables)')
+    parser.add_argument('--format', nargs='+', default=['json', 'csv'], choices=['json', 'csv'], help='Output formats (default: json csv)')
+    parser.add_argument('--cache', action='store_true', help='Keep the parsed CW arrays in a bit-packed .npz next to analysis.csv')
+    parser.add_argument('--bootstrap', type=int, default=0, help='Bootstrap resamples / permutations for classifier CIs and tests (e.g. 10000; default: 0 = off)')
+    args = parser.parse_args()
+
+    tables = compute_all_tables(args.analysis_csv, args.human_annotations_csv, cache=args.cache, bootstrap=args.bootstrap)
+    for path in write_tables(tables, args.output_dir, args.format):
+        print(f"💾 {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Compact encoding for the per-claim check-worthiness arrays of analysis.csv (FHuo_Hassan, FSong_Majer, ...).
+
+Each column is stored CSR-style: one flat uint8 array with the labels of every claim of every utterance,
+and an offsets array where row i spans values[offsets[i]:offsets[i + 1]]. Cells are parsed with a
+vectorized byte scan instead of `ast.literal_eval`, and per-row statistics become array reductions.
+"""
+
+import os
+import re
+import ast
+
+import numpy as np
+import pandas as pd
+
+
+# A well-formed cell: "[]", "[True]", "[True, False, ...]" (what pandas/str(list) writes)
+_BOOL_LIST_PATTERN = r'\[[ \t]*(?:(?:True|False)[ \t]*(?:,[ \t]*(?:True|False)[ \t]*)*,?[ \t]*)?\]'
+_SEPARATOR = ord('\n')
+_TRUE = ord('T')
+_FALSE = ord('F')
+
+
+def parse_array_string(array_str):
+    """Parse array string representation to actual list."""
+    if not isinstance(array_str, str) or array_str.strip() == '' or array_str == 'nan':
+        return []
+    try:
+        parsed = ast.literal_eval(array_str.strip())
+    except (ValueError, SyntaxError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+class RaggedBoolArray:
+    """
+    A column of variable-length boolean arrays, one per row.
+
+    Attributes:
+        values (np.ndarray): uint8 (0/1) labels of all rows, concatenated.
+        offsets (np.ndarray): int64, length num_rows + 1; row i is values[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, values, offsets):
+        self.values = np.asarray(values, dtype=np.uint8)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return [bool(v) for v in self.values[self.offsets[i]:self.offsets[i + 1]]]
+
+    def lengths(self):
+        """Number of claims per row."""
+        return np.diff(self.offsets)
+
+    def row_sums(self):
+        """Number of True labels per row (segment sum over the flat values)."""
+        cumulative = np.concatenate(([0], np.cumsum(self.values, dtype=np.int64)))
+        return cumulative[self.offsets[1:]] - cumulative[self.offsets[:-1]]
+
+    def row_any(self):
+        """Whether each row has at least one True label."""
+        return self.row_sums() > 0
+
+    def row_ids(self):
+        """Row index of every value (length len(values))."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths())
+
+    def to_lists(self):
+        return [self[i] for i in range(len(self))]
+
+    @classmethod
+    def from_lists(cls, arrays):
+        lengths = np.fromiter((len(a) for a in arrays), dtype=np.int64, count=len(arrays))
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        values = np.fromiter((1 if e else 0 for a in arrays for e in a), dtype=np.uint8, count=int(offsets[-1]))
+        return cls(values, offsets)
+
+
+def _parse_well_formed(cells):
+    """Vectorized parse of cells known to be "[True, False, ...]" lists: returns (values, lengths)."""
+    buffer = np.frombuffer('\n'.join(cells).encode('ascii'), dtype=np.uint8)
+    separators = np.flatnonzero(buffer == _SEPARATOR)
+    # Every label starts with a capital T or F, and no other capital letters can occur in a valid cell
+    label_positions = np.flatnonzero((buffer == _TRUE) | (buffer == _FALSE))
+    values = (buffer[label_positions] == _TRUE).astype(np.uint8)
+    rows = np.searchsorted(separators, label_positions)
+    lengths = np.bincount(rows, minlength=len(cells)).astype(np.int64)
+    return values, lengths
+
+
+def parse_bool_arrays(cells):
+    """
+    Parses a column of array strings into a RaggedBoolArray.
+
+    Well-formed True/False lists go through the vectorized byte scan; empty cells and 'nan' become empty
+    rows; anything else (e.g. "[1, 0]") falls back to `parse_array_string` and is binarized by truthiness.
+    """
+    cells = pd.Series(cells, dtype=object).fillna('')
+    stripped = cells.astype(str).str.strip()
+    empty = ((stripped == '') | (stripped == 'nan')).to_numpy()
+    fast = stripped.str.fullmatch(_BOOL_LIST_PATTERN).to_numpy(dtype=bool) & ~empty
+    slow = ~fast & ~empty
+
+    lengths = np.zeros(len(cells), dtype=np.int64)
+    fast_values, lengths[fast] = _parse_well_formed(stripped[fast].tolist())
+    slow_arrays = [parse_array_string(cell) for cell in cells[slow]]
+    lengths[slow] = [len(a) for a in slow_arrays]
+
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    if not slow.any():
+        return RaggedBoolArray(fast_values, offsets)
+    values = np.empty(int(offsets[-1]), dtype=np.uint8)
+    from_fast = np.repeat(fast, lengths)
+    values[from_fast] = fast_values
+    values[~from_fast] = RaggedBoolArray.from_lists(slow_arrays).values
+    return RaggedBoolArray(values, offsets)
+
+
+# Text of one label in a formatted cell, by (first in row, last in row, value): "[True, ", "False]", ...
+_PIECES = [('[' if first else '') + ('True' if value else 'False') + (']' if last else ', ')
+           for first in (0, 1) for last in (0, 1) for value in (0, 1)]
+_PIECE_BYTES = np.frombuffer(''.join(_PIECES).encode('ascii'), dtype=np.uint8)
+_PIECE_LENGTHS = np.array([len(piece) for piece in _PIECES], dtype=np.int64)
+_PIECE_STARTS = np.concatenate(([0], np.cumsum(_PIECE_LENGTHS)[:-1]))
+
+
+def format_bool_arrays(array):
+    """
+    Inverse of `parse_bool_arrays`: the "[True, False, ...]" cell of every row of a RaggedBoolArray.
+
+    Each label maps to one of eight pieces ("[True, ", "False]", ...), which are gathered into a single
+    byte buffer with array indexing; every row is then one slice of the decoded text.
+    """
+    lengths = array.lengths()
+    nonempty = lengths > 0
+    codes = (array.values > 0).astype(np.int64)
+    codes[array.offsets[:-1][nonempty]] += 4
+    codes[array.offsets[1:][nonempty] - 1] += 2
+    piece_lengths = _PIECE_LENGTHS[codes]
+    piece_ends = np.cumsum(piece_lengths)
+    total = int(piece_ends[-1]) if len(piece_ends) else 0
+    gather = np.repeat(_PIECE_STARTS[codes] - (piece_ends - piece_lengths), piece_lengths) + np.arange(total)
+    text = _PIECE_BYTES[gather].tobytes().decode('ascii')
+    char_offsets = np.concatenate(([0], piece_ends))[array.offsets].tolist()
+    return [text[start:end] if end > start else '[]' for start, end in zip(char_offsets[:-1], char_offsets[1:])]
+
+
+def save_bool_arrays(path, columns):
+    """Saves {column name: RaggedBoolArray} to an .npz file, bit-packing the labels (1 bit per claim)."""
+    payload = {}
+    for name, array in columns.items():
+        payload[f'{name}.bits'] = np.packbits(array.values)
+        payload[f'{name}.offsets'] = array.offsets
+    np.savez_compressed(path, **payload)
+
+
+def load_bool_arrays(path):
+    """Loads the columns written by `save_bool_arrays`."""
+    columns = {}
+    with np.load(path) as npz:
+        for key in npz.files:
+            name, part = key.rsplit('.', 1)
+            if part != 'offsets':
+                continue
+            offsets = npz[key]
+            values = np.unpackbits(npz[f'{name}.bits'], count=int(offsets[-1]))
+            columns[name] = RaggedBoolArray(values, offsets)
+    return columns
+
+
+def cache_path_for(csv_path):
+    """analysis.csv -> analysis.cw_arrays.npz (next to the CSV)."""
+    return re.sub(r'\.csv$', '', csv_path) + '.cw_arrays.npz'
+
+
+def cache_is_fresh(cache_path, csv_path, columns):
+    """True if the cache exists, is newer than the CSV and holds every requested column."""
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(csv_path):
+        return False
+    with np.load(cache_path) as npz:
+        return all(f'{col}.offsets' in npz.files for col in columns)
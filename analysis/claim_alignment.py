@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Claim-level alignment of two claim extraction methods (FHuo and FSong by default) within each agent
+utterance: which claim of one method corresponds to which claim of the other, and which claims only
+one method extracted.
+
+All claims are embedded at once as L2-normalized TF-IDF vectors over word uni/bi-grams (sparse), the
+cosine similarity of every cross-method pair in the same utterance is computed with one sparse row-wise
+product, and each utterance is solved as an optimal one-to-one assignment (Hungarian algorithm).
+"""
+
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment
+
+
+CLAIMS_CSV = '../annotations/claims.csv'
+METHODS = ['FHuo', 'FSong']
+TOKEN_PATTERN = r'\w+'
+
+
+def load_claims(claim_csvs, methods=METHODS):
+    """
+    Claims of the two methods as one DataFrame (Method, Conversation_Hash, Utterance_Key, Statement_Index,
+    Individual_Statement), without empty claims.
+
+    Entries of `claim_csvs` may be 'METHOD=path' for files without a Claim_Extr_Method column (the exploded
+    outputs of f_huo_method.py / f_song.py). Utterances are keyed by Turn_Num, or by Selected_Agent_Utterance
+    when a file has no Turn_Num.
+    """
+    frames = []
+    for entry in claim_csvs:
+        method, separator, path = entry.partition('=')
+        if not separator or not method.isidentifier():
+            method, path = None, entry
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        if 'Claim_Extr_Method' not in df.columns:
+            if method is None:
+                raise ValueError(f"{path}: no Claim_Extr_Method column; pass the file as METHOD=path (e.g. FHuo=FHuo_exploded_statements.csv)")
+            df['Claim_Extr_Method'] = method
+        key_column = 'Turn_Num' if 'Turn_Num' in df.columns else 'Selected_Agent_Utterance'
+        frames.append(pd.DataFrame({
+            'Method': df['Claim_Extr_Method'],
+            'Conversation_Hash': df['Conversation_Hash'],
+            'Utterance_Key': df[key_column].str.strip(),
+            'Statement_Index': df['Statement_Index'] if 'Statement_Index' in df.columns else df.groupby(['Conversation_Hash', key_column]).cumcount().astype(str),
+            'Individual_Statement': df['Individual_Statement'],
+        }))
+    claims = pd.concat(frames, ignore_index=True)
+    claims = claims[claims['Method'].isin(methods) & (claims['Individual_Statement'].str.strip() != '')]
+    return claims.reset_index(drop=True)
+
+
+def tfidf_matrix(texts):
+    """
+    L2-normalized TF-IDF matrix (CSR, float32) over lowercased word unigrams and bigrams, with sublinear
+    term frequency and smoothed idf. The vocabulary is built by factorizing all n-grams at once.
+    """
+    tokens = pd.Series(texts, dtype=object).str.lower().str.findall(TOKEN_PATTERN)
+    lengths = tokens.str.len().to_numpy()
+    flat = tokens.explode().dropna().to_numpy(dtype=object)
+    doc_ids = np.repeat(np.arange(len(tokens)), lengths)
+    # Bigrams: consecutive tokens of the same claim
+    same_doc = doc_ids[1:] == doc_ids[:-1]
+    bigrams = pd.Series(flat[:-1][same_doc]) + ' ' + pd.Series(flat[1:][same_doc])
+    terms = np.concatenate((flat, bigrams.to_numpy(dtype=object)))
+    term_docs = np.concatenate((doc_ids, doc_ids[:-1][same_doc]))
+    term_ids, vocabulary = pd.factorize(terms, sort=False)
+
+    counts = sparse.csr_matrix((np.ones(len(term_ids), dtype=np.float32), (term_docs, term_ids)),
+                               shape=(len(tokens), len(vocabulary)))
+    counts.sum_duplicates()
+    counts.data = 1 + np.log(counts.data)
+    document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+    idf = (np.log((1 + len(tokens)) / (1 + document_frequency)) + 1).astype(np.float32)
+    matrix = counts @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+
+
+def align_claims(claims, methods=METHODS, threshold=0.4):
+    """
+    Optimal one-to-one alignment of the claims of methods[0] and methods[1] within each utterance.
+
+    Args:
+        claims (pd.DataFrame): Output of `load_claims`.
+        threshold (float): Minimum cosine similarity for an assigned pair to count as aligned.
+
+    Returns:
+        pd.DataFrame: One row per aligned pair and per unaligned claim, with the claim of each method
+        (empty for method-unique claims) and the Similarity of the pair.
+    """
+    a_name, b_name = methods
+    utterance_codes = pd.factorize(pd.MultiIndex.from_arrays([claims['Conversation_Hash'], claims['Utterance_Key']]))[0]
+    vectors = tfidf_matrix(claims['Individual_Statement'].to_numpy(dtype=object))
+    is_a = (claims['Method'] == a_name).to_numpy()
+    a_rows, b_rows = np.flatnonzero(is_a), np.flatnonzero(~is_a)
+
+    # Every cross-method pair of the same utterance, ordered by utterance, then A claim, then B claim
+    pairs = pd.DataFrame({'utterance': utterance_codes[a_rows], 'a': a_rows}).merge(
+        pd.DataFrame({'utterance': utterance_codes[b_rows], 'b': b_rows}), on='utterance', sort=False)
+    pairs = pairs.sort_values(['utterance', 'a', 'b'], kind='stable').reset_index(drop=True)
+    similarity = np.asarray(vectors[pairs['a'].to_numpy()].multiply(vectors[pairs['b'].to_numpy()]).sum(axis=1)).ravel()
+    pairs['similarity'] = similarity
+
+    # Utterances where one method has a single claim: the assignment is the best-scoring pair
+    sizes = pairs.groupby('utterance', sort=False).agg(num_a=('a', 'nunique'), num_b=('b', 'nunique'), num_pairs=('a', 'size'))
+    simple = sizes.index[(sizes['num_a'] == 1) | (sizes['num_b'] == 1)]
+    simple_pairs = pairs[pairs['utterance'].isin(simple)]
+    assigned = [simple_pairs.loc[simple_pairs.groupby('utterance', sort=False)['similarity'].idxmax()]]
+    # The others are solved with the Hungarian algorithm on their (num_a x num_b) similarity block
+    general = sizes[~sizes.index.isin(simple)]
+    if len(general):
+        starts = np.concatenate(([0], np.cumsum(sizes['num_pairs'].to_numpy())))
+        block_start = dict(zip(sizes.index, starts[:-1]))
+        chosen = []
+        for utterance, num_a, num_b in zip(general.index, general['num_a'], general['num_b']):
+            start = block_start[utterance]
+            block = similarity[start:start + num_a * num_b].reshape(num_a, num_b)
+            rows, cols = linear_sum_assignment(block, maximize=True)
+            chosen.append(start + rows * num_b + cols)
+        assigned.append(pairs.iloc[np.concatenate(chosen)])
+    matched = pd.concat(assigned)
+    matched = matched[matched['similarity'] >= threshold]
+
+    def claim_columns(rows, name):
+        return {
+            f'{name}_Statement_Index': claims['Statement_Index'].to_numpy()[rows],
+            f'{name}_Statement': claims['Individual_Statement'].to_numpy()[rows],
+        }
+
+    def utterance_columns(rows):
+        return {
+            '_utterance': utterance_codes[rows],
+            'Conversation_Hash': claims['Conversation_Hash'].to_numpy()[rows],
+            'Utterance_Key': claims['Utterance_Key'].to_numpy()[rows],
+        }
+
+    matched_a, matched_b = matched['a'].to_numpy(), matched['b'].to_numpy()
+    frames = [pd.DataFrame({
+        **utterance_columns(matched_a),
+        **claim_columns(matched_a, a_name),
+        **claim_columns(matched_b, b_name),
+        'Similarity': matched['similarity'].to_numpy(),
+        'Status': 'aligned',
+    })]
+    for rows, matched_rows, name, other in ((a_rows, matched_a, a_name, b_name), (b_rows, matched_b, b_name, a_name)):
+        rows = np.setdiff1d(rows, matched_rows)
+        frames.append(pd.DataFrame({
+            **utterance_columns(rows),
+            **claim_columns(rows, name),
+            f'{other}_Statement_Index': '',
+            f'{other}_Statement': '',
+            'Similarity': np.nan,
+            'Status': f'{name}_only',
+        }))
+    alignment = pd.concat(frames, ignore_index=True)[
+        ['_utterance', 'Conversation_Hash', 'Utterance_Key', f'{a_name}_Statement_Index', f'{a_name}_Statement',
+         f'{b_name}_Statement_Index', f'{b_name}_Statement', 'Similarity', 'Status']]
+    # Utterances in input order
+    return alignment.sort_values('_utterance', kind='stable').drop(columns='_utterance').reset_index(drop=True)
+
+
+def alignment_summary(claims, alignment, methods=METHODS):
+    """
+    Coverage and overlap of the two methods.
+
+    Returns:
+        dict: Per method: claims, aligned claims, coverage (share of its claims with a counterpart in the
+        other method) and method-unique claims; overall: aligned pairs, overlap (aligned pairs over the
+        union of claims), mean similarity of aligned pairs and utterance counts.
+    """
+    a_name, b_name = methods
+    utterance_codes = pd.factorize(pd.MultiIndex.from_arrays([claims['Conversation_Hash'], claims['Utterance_Key']]))[0]
+    has_a = np.bincount(utterance_codes, weights=(claims['Method'] == a_name).to_numpy()) > 0
+    has_b = np.bincount(utterance_codes, weights=(claims['Method'] == b_name).to_numpy()) > 0
+    aligned = alignment[alignment['Status'] == 'aligned']
+    summary = {'aligned_pairs': int(len(aligned))}
+    for name in methods:
+        total = int((claims['Method'] == name).sum())
+        summary[name] = {
+            'claims': total,
+            'aligned': int(len(aligned)),
+            'coverage': len(aligned) / total if total else 0,
+            'unique': int((alignment['Status'] == f'{name}_only').sum()),
+        }
+    union = summary[a_name]['claims'] + summary[b_name]['claims'] - len(aligned)
+    summary['overlap'] = len(aligned) / union if union else 0
+    summary['mean_similarity'] = float(aligned['Similarity'].mean()) if len(aligned) else 0
+    summary['utterances'] = {
+        'both': int(np.sum(has_a & has_b)),
+        f'{a_name}_only': int(np.sum(has_a & ~has_b)),
+        f'{b_name}_only': int(np.sum(~has_a & has_b)),
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim-level alignment of two claim extraction methods per utterance.")
+    parser.add_argument('--claims_csv', nargs='+', default=[CLAIMS_CSV],
+                        help='Claim CSVs; use METHOD=path for exploded outputs without Claim_Extr_Method (default: ../annotations/claims.csv)')
+    parser.add_argument('--methods', nargs=2, default=METHODS, help='The two methods to align (default: FHuo FSong)')
+    parser.add_argument('--threshold', type=float, default=0.4, help='Minimum TF-IDF cosine similarity of aligned claims (default: 0.4)')
+    parser.add_argument('--output_csv', default=None, help='Save the alignment (one row per pair or unique claim)')
+    parser.add_argument('--output_json', default=None, help='Save the summary as JSON')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    claims = load_claims(args.claims_csv, args.methods)
+    print(f"📄 Loaded {len(claims)} claims in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    alignment = align_claims(claims, args.methods, threshold=args.threshold)
+    print(f"⏱️ Aligned in {time.perf_counter() - start:.1f}s")
+    summary = alignment_summary(claims, alignment, args.methods)
+
+    a_name, b_name = args.methods
+    print(f"=== {a_name} vs {b_name} (cosine >= {args.threshold}) ===")
+    print(f"Utterances with claims of both methods: {summary['utterances']['both']} "
+          f"({a_name} only: {summary['utterances'][f'{a_name}_only']}, {b_name} only: {summary['utterances'][f'{b_name}_only']})")
+    print(f"Aligned claim pairs: {summary['aligned_pairs']} (mean similarity {summary['mean_similarity']:.3f})")
+    for name in args.methods:
+        method = summary[name]
+        print(f"   - {name}: {method['claims']} claims, {method['coverage'] * 100:.2f}% aligned, {method['unique']} unique")
+    print(f"Overlap (aligned pairs / all distinct claims): {summary['overlap'] * 100:.2f}%")
+    if args.output_csv:
+        alignment.to_csv(args.output_csv, index=False)
+        print(f"💾 Alignment saved to: {args.output_csv}")
+    if args.output_json:
+        with open(args.output_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Summary saved to: {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
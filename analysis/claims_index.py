@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite table of individual claims for fast filtered lookups and aggregates, e.g. "all CW claims
+of Creative Writing turns extracted by FSong", without rescanning the claim CSVs.
+
+The index is built from annotations/claims.csv and/or the claim-level outputs of the generation pipeline
+(cw.py), optionally joined with task labels from analysis.csv or a task_classification.py output.
+"""
+
+import os
+import sys
+import csv
+import time
+import numbers
+import sqlite3
+import argparse
+
+import pandas as pd
+
+
+CLAIMS_CSV = '../annotations/claims.csv'
+ANALYSIS_CSV = '../annotations/analysis.csv'
+CW_COLUMNS = {'Hassan': 'hassan_cw', 'Majer': 'majer_cw', 'Intersection': 'intersection_cw', 'Union': 'union_cw'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    claim_id INTEGER PRIMARY KEY,
+    conversation_hash TEXT NOT NULL,
+    turn_num INTEGER,
+    statement_index INTEGER,
+    claim_extr_method TEXT NOT NULL,
+    task_classification TEXT,
+    individual_statement TEXT,
+    selected_agent_utterance TEXT,
+    hassan TEXT,
+    majer TEXT,
+    hassan_cw INTEGER,
+    majer_cw INTEGER,
+    intersection_cw INTEGER,
+    union_cw INTEGER,
+    source TEXT
+)
+"""
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_claims_conversation ON claims (conversation_hash, turn_num)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_task ON claims (task_classification)",
+    "CREATE INDEX IF NOT EXISTS idx_claims_method ON claims (claim_extr_method)",
+    *[f"CREATE INDEX IF NOT EXISTS idx_claims_{column} ON claims ({column})" for column in CW_COLUMNS.values()],
+    # Covering index for the common method + task + CW filters and for the aggregates over them
+    "CREATE INDEX IF NOT EXISTS idx_claims_method_task_cw ON claims "
+    "(claim_extr_method, task_classification, hassan_cw, majer_cw, intersection_cw, union_cw, conversation_hash)",
+]
+
+FILTER_COLUMNS = {
+    'conversation_hash': 'conversation_hash',
+    'turn_num': 'turn_num',
+    'method': 'claim_extr_method',
+    'task': 'task_classification',
+}
+GROUP_COLUMNS = {
+    'method': 'claim_extr_method',
+    'task': 'task_classification',
+    'conversation': 'conversation_hash',
+    'turn': 'turn_num',
+}
+
+
+def is_check_worthy(labels):
+    """
+    CW flag per claim: True for boolean outputs (claims.csv) and for CFS labels (cw.py outputs);
+    None where the claim has no label.
+    """
+    labels = labels.fillna('').astype(str).str.strip().str.upper()
+    flags = labels.isin(['TRUE', '1']) | labels.str.contains('CFS', regex=False)
+    return flags.astype('boolean').mask(labels == '')
+
+
+def _task_lookup(tasks_csv):
+    """(hash, turn) -> task and (hash, agent utterance) -> task, from analysis.csv or a task classification CSV."""
+    df = pd.read_csv(tasks_csv, dtype=str, keep_default_na=False)
+    by_turn, by_utterance = {}, {}
+    if 'Turn_Num' in df.columns:
+        by_turn = dict(zip(zip(df['Conversation_Hash'], df['Turn_Num'].str.strip()), df['Task_Classification']))
+    if 'Selected_Agent_Utterance' in df.columns:
+        by_utterance = dict(zip(zip(df['Conversation_Hash'], df['Selected_Agent_Utterance']), df['Task_Classification']))
+    return by_turn, by_utterance
+
+
+def _sql_value(value):
+    """Plain Python value for sqlite3 (None for missing, int for NumPy/pandas integers and booleans)."""
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (bool, numbers.Integral)):
+        return int(value)
+    return value
+
+
+def _to_int(series):
+    return pd.to_numeric(series, errors='coerce').astype('Int64')
+
+
+def _claim_rows(chunk, method, tasks, source):
+    """Normalizes one chunk of a claim-level CSV to the `claims` columns."""
+    n = len(chunk)
+    empty = pd.Series([None] * n, index=chunk.index, dtype=object)
+    hashes = chunk['Conversation_Hash'].astype(str)
+    turns = chunk['Turn_Num'].astype(str).str.strip() if 'Turn_Num' in chunk.columns else empty
+    utterances = chunk['Selected_Agent_Utterance'] if 'Selected_Agent_Utterance' in chunk.columns else empty
+    if 'Task_Classification' in chunk.columns:
+        task = chunk['Task_Classification']
+    elif tasks is not None:
+        by_turn, by_utterance = tasks
+        task = pd.Series([by_turn.get((h, t)) or by_utterance.get((h, u))
+                          for h, t, u in zip(hashes, turns, utterances)], index=chunk.index, dtype=object)
+    else:
+        task = empty
+    methods = chunk['Claim_Extr_Method'] if 'Claim_Extr_Method' in chunk.columns else pd.Series(method, index=chunk.index)
+    if methods.isna().any() or (methods == '').any():
+        raise ValueError(f"{source}: no Claim_Extr_Method column; pass the file as METHOD=path (e.g. FSong=claims_cw.csv)")
+    hassan = chunk['Hassan'] if 'Hassan' in chunk.columns else empty
+    majer = chunk['Majer'] if 'Majer' in chunk.columns else empty
+    hassan_cw, majer_cw = is_check_worthy(hassan), is_check_worthy(majer)
+    both_labelled = hassan_cw.notna() & majer_cw.notna()
+    frame = pd.DataFrame({
+        'conversation_hash': hashes,
+        'turn_num': _to_int(turns),
+        'statement_index': _to_int(chunk['Statement_Index']) if 'Statement_Index' in chunk.columns else empty,
+        'claim_extr_method': methods,
+        'task_classification': task.replace('', None),
+        'individual_statement': chunk.get('Individual_Statement', empty),
+        'selected_agent_utterance': utterances,
+        'hassan': hassan.replace('', None),
+        'majer': majer.replace('', None),
+        'hassan_cw': hassan_cw,
+        'majer_cw': majer_cw,
+        'intersection_cw': (hassan_cw & majer_cw).mask(~both_labelled),
+        'union_cw': (hassan_cw | majer_cw).mask(~both_labelled),
+        'source': os.path.basename(source),
+    })
+    return [tuple(_sql_value(v) for v in row) for row in frame.astype(object).itertuples(index=False, name=None)]
+
+
+def build_index(db_path, claim_csvs, tasks_csv=None, chunksize=50000):
+    """
+    (Re)builds the SQLite claims index.
+
+    Args:
+        db_path (str): Output .sqlite file (replaced if it exists).
+        claim_csvs (list): Claim-level CSVs; entries may be 'METHOD=path' for files without a
+            Claim_Extr_Method column (the cw.py outputs).
+        tasks_csv (str): Optional CSV with Task_Classification per (Conversation_Hash, Turn_Num) or
+            (Conversation_Hash, Selected_Agent_Utterance), e.g. analysis.csv.
+
+    Returns:
+        int: Number of claims indexed.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    tasks = _task_lookup(tasks_csv) if tasks_csv else None
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    # Bulk load: no journal, indexes built once at the end
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(SCHEMA)
+    columns = ('conversation_hash, turn_num, statement_index, claim_extr_method, task_classification, individual_statement, '
+               'selected_agent_utterance, hassan, majer, hassan_cw, majer_cw, intersection_cw, union_cw, source')
+    insert = f"INSERT INTO claims ({columns}) VALUES ({', '.join('?' * 14)})"
+    total = 0
+    for entry in claim_csvs:
+        method, separator, path = entry.partition('=')
+        if not separator or not method.isidentifier():
+            method, path = None, entry
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize):
+            rows = _claim_rows(chunk, method, tasks, path)
+            conn.executemany(insert, rows)
+            total += len(rows)
+        print(f"📄 Indexed {path}")
+    for statement in INDEXES:
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    print(f"✅ Indexed {total} claims in {time.perf_counter() - start:.1f}s → {db_path}")
+    return total
+
+
+class ClaimsIndex:
+    """Read-only query API over a claims index built by `build_index`."""
+
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"No claims index at {db_path}; run `claims_index.py build` first.")
+        self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _where(filters, cw=None):
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            clauses.append(f"{FILTER_COLUMNS[name]} = ?")
+            params.append(value)
+        if cw is not None:
+            if cw not in CW_COLUMNS:
+                raise ValueError(f"Unknown CW label: {cw} (use one of {', '.join(CW_COLUMNS)})")
+            clauses.append(f"{CW_COLUMNS[cw]} = 1")
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def claims(self, conversation_hash=None, turn_num=None, method=None, task=None, cw=None, limit=None):
+        """
+        Claims matching every given filter.
+
+        Args:
+            cw (str): Only claims labelled check-worthy by Hassan, Majer, Intersection or Union.
+
+        Returns:
+            list: One dict per claim, in index order.
+        """
+        where, params = self._where(
+            {'conversation_hash': conversation_hash, 'turn_num': turn_num, 'method': method, 'task': task}, cw)
+        sql = f"SELECT * FROM claims{where} ORDER BY claim_id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def aggregate(self, group_by=('method',), conversation_hash=None, method=None, task=None, cw=None):
+        """
+        Claim counts and CW counts per group (any of: method, task, conversation, turn).
+
+        Returns:
+            list: One dict per group with `claims`, `<label>_cw` counts and the number of conversations.
+        """
+        group_columns = [GROUP_COLUMNS[g] for g in group_by]
+        where, params = self._where({'conversation_hash': conversation_hash, 'method': method, 'task': task}, cw)
+        select = ', '.join(group_columns + [
+            'COUNT(*) AS claims',
+            *[f'SUM({column}) AS {column}' for column in CW_COLUMNS.values()],
+            'COUNT(DISTINCT conversation_hash) AS conversations',
+        ])
+        group = f" GROUP BY {', '.join(group_columns)} ORDER BY claims DESC" if group_columns else ''
+        return [dict(row) for row in self.conn.execute(f"SELECT {select} FROM claims{where}{group}", params)]
+
+
+def _print_rows(rows, columns=None):
+    if not rows:
+        print("(no rows)")
+        return
+    writer = csv.DictWriter(sys.stdout, fieldnames=columns or list(rows[0].keys()), extrasaction='ignore', delimiter='\t')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite index over individual claims for filtered lookups and aggregates.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the index from claim-level CSVs')
+    build_parser.add_argument('--db', default='claims.sqlite', help='Index file (default: claims.sqlite)')
+    build_parser.add_argument('--claims_csv', nargs='+', default=[CLAIMS_CSV],
+                              help='Claim CSVs; use METHOD=path for cw.py outputs without Claim_Extr_Method (default: ../annotations/claims.csv)')
+    build_parser.add_argument('--tasks_csv', default=None,
+                              help='Task labels per turn/utterance, e.g. ../annotations/analysis.csv or a task_classification.py output')
+    build_parser.add_argument('--chunksize', type=int, default=50000, help='Rows per chunk (default: 50000)')
+
+    for name, help_text in [('query', 'List matching claims'), ('stats', 'Aggregate claim and CW counts')]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--db', default='claims.sqlite', help='Index file (default: claims.sqlite)')
+        sub.add_argument('--conversation_hash', default=None)
+        sub.add_argument('--method', default=None, help='Claim extraction method (FHuo or FSong)')
+        sub.add_argument('--task', default=None, help='Task_Classification value, e.g. "Creative Writing"')
+        sub.add_argument('--cw', default=None, choices=list(CW_COLUMNS), help='Only claims this CW labelling marks check-worthy')
+        if name == 'query':
+            sub.add_argument('--turn_num', type=int, default=None)
+            sub.add_argument('--limit', type=int, default=20, help='Max claims to print (default: 20, 0 = all)')
+        else:
+            sub.add_argument('--group_by', nargs='*', default=['method'], choices=list(GROUP_COLUMNS),
+                             help='Grouping columns (default: method)')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build_index(args.db, args.claims_csv, tasks_csv=args.tasks_csv, chunksize=args.chunksize)
+        return
+
+    index = ClaimsIndex(args.db)
+    start = time.perf_counter()
+    if args.command == 'query':
+        rows = index.claims(conversation_hash=args.conversation_hash, turn_num=args.turn_num, method=args.method,
+                            task=args.task, cw=args.cw, limit=args.limit)
+        _print_rows(rows, ['claim_id', 'conversation_hash', 'turn_num', 'claim_extr_method', 'task_classification',
+                           'hassan', 'majer', 'individual_statement'])
+    else:
+        rows = index.aggregate(group_by=args.group_by, conversation_hash=args.conversation_hash, method=args.method,
+                               task=args.task, cw=args.cw)
+        _print_rows(rows)
+    print(f"⏱️ {len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
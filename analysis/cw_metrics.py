@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Vectorized effectiveness metrics for binary check-worthiness classifiers against a gold standard:
+confusion matrices of many classifiers in one pass, bootstrap confidence intervals and paired
+significance tests (McNemar, permutation) between classifiers.
+"""
+
+import math
+
+import numpy as np
+
+
+METRICS = ['precision', 'recall', 'f1', 'kappa']
+# Resampled items held in memory at once (rows x items) while bootstrapping
+_MAX_BLOCK_CELLS = 4_000_000
+
+
+def confusion_matrices(predictions, gold):
+    """
+    Confusion counts of several classifiers at once.
+
+    Args:
+        predictions (np.ndarray): bool, shape (num_classifiers, num_items).
+        gold (np.ndarray): bool, shape (num_items,).
+
+    Returns:
+        np.ndarray: int64, shape (num_classifiers, 4) with columns TP, FP, FN, TN.
+    """
+    predictions = np.atleast_2d(np.asarray(predictions, dtype=bool))
+    gold = np.asarray(gold, dtype=bool)
+    # Cell index per (classifier, item): 0=TP, 1=FP, 2=FN, 3=TN
+    cells = 2 * (~predictions) + (~gold)
+    offsets = 4 * np.arange(len(predictions))[:, None]
+    return np.bincount((cells + offsets).ravel(), minlength=4 * len(predictions)).reshape(-1, 4)
+
+
+def metrics_from_counts(tp, fp, fn, tn):
+    """
+    Precision, recall, F1 and Cohen's kappa from confusion counts (scalars or arrays of any shape),
+    with the conventions of the analysis scripts: undefined ratios are 0 and kappa is 1 when chance
+    agreement is 1.
+
+    Returns:
+        dict: metric name -> float64 array (shape of the inputs).
+    """
+    tp, fp, fn, tn = (np.asarray(x, dtype=np.float64) for x in (tp, fp, fn, tn))
+    total = tp + fp + fn + tn
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * (precision * recall) / (precision + recall), 0.0)
+        observed = np.where(total > 0, (tp + tn) / total, 0.0)
+        pred_rate = np.where(total > 0, (tp + fp) / total, 0.0)
+        gold_rate = np.where(total > 0, (tp + fn) / total, 0.0)
+        expected = pred_rate * gold_rate + (1 - pred_rate) * (1 - gold_rate)
+        kappa = np.where(expected == 1, 1.0, (observed - expected) / (1 - expected))
+    return {'precision': precision, 'recall': recall, 'f1': f1, 'kappa': kappa}
+
+
+def _resampled_counts(predictions, gold, indices):
+    """Confusion counts of every classifier on every resample; indices has shape (num_resamples, num_items)."""
+    gold_r = gold[indices]
+    pred_r = predictions[:, indices]
+    tp = np.sum(pred_r & gold_r, axis=-1)
+    fp = np.sum(pred_r & ~gold_r, axis=-1)
+    fn = np.sum(~pred_r & gold_r, axis=-1)
+    tn = indices.shape[1] - tp - fp - fn
+    return tp, fp, fn, tn
+
+
+def bootstrap_metrics(predictions, gold, num_resamples=10000, confidence=0.95, seed=42):
+    """
+    Percentile bootstrap confidence intervals for every metric of every classifier.
+
+    Items are resampled with replacement; all classifiers are evaluated on the same resamples, so their
+    intervals are comparable. Resamples are processed in blocks of an index matrix, vectorized over
+    resamples and classifiers.
+
+    Returns:
+        dict: metric name -> float64 array (num_classifiers, 3) with estimate, CI low, CI high.
+    """
+    predictions = np.atleast_2d(np.asarray(predictions, dtype=bool))
+    gold = np.asarray(gold, dtype=bool)
+    num_items = len(gold)
+    rng = np.random.default_rng(seed)
+    block = max(1, _MAX_BLOCK_CELLS // max(num_items * len(predictions), 1))
+    samples = {metric: [] for metric in METRICS}
+    for start in range(0, num_resamples, block):
+        indices = rng.integers(0, num_items, size=(min(block, num_resamples - start), num_items))
+        for metric, values in metrics_from_counts(*_resampled_counts(predictions, gold, indices)).items():
+            samples[metric].append(values)
+
+    point = metrics_from_counts(*confusion_matrices(predictions, gold).T)
+    tail = (1 - confidence) / 2 * 100
+    results = {}
+    for metric in METRICS:
+        values = np.concatenate(samples[metric], axis=1)
+        low, high = np.percentile(values, [tail, 100 - tail], axis=1)
+        results[metric] = np.column_stack([point[metric], low, high])
+    return results
+
+
+def mcnemar_test(predictions_a, predictions_b, gold):
+    """
+    McNemar's test on the items exactly one of two classifiers gets right.
+
+    Uses the exact binomial test when fewer than 25 items are discordant, otherwise the chi-square
+    statistic with continuity correction.
+
+    Returns:
+        dict: discordant counts (a_only, b_only), statistic and two-sided p-value.
+    """
+    correct_a = np.asarray(predictions_a, dtype=bool) == np.asarray(gold, dtype=bool)
+    correct_b = np.asarray(predictions_b, dtype=bool) == np.asarray(gold, dtype=bool)
+    a_only = int(np.sum(correct_a & ~correct_b))
+    b_only = int(np.sum(~correct_a & correct_b))
+    discordant = a_only + b_only
+    if discordant == 0:
+        return {'a_only': 0, 'b_only': 0, 'statistic': 0.0, 'p_value': 1.0, 'exact': True}
+    if discordant < 25:
+        k = min(a_only, b_only)
+        p_value = min(1.0, 2 * sum(math.comb(discordant, i) for i in range(k + 1)) / 2 ** discordant)
+        return {'a_only': a_only, 'b_only': b_only, 'statistic': float(k), 'p_value': p_value, 'exact': True}
+    statistic = (abs(a_only - b_only) - 1) ** 2 / discordant
+    # Chi-square with 1 degree of freedom: P(X > x) = erfc(sqrt(x / 2))
+    p_value = math.erfc(math.sqrt(statistic / 2))
+    return {'a_only': a_only, 'b_only': b_only, 'statistic': statistic, 'p_value': p_value, 'exact': False}
+
+
+def permutation_test(predictions_a, predictions_b, gold, metric='f1', num_permutations=10000, seed=42):
+    """
+    Paired permutation test of the difference in `metric` between two classifiers.
+
+    Under the null hypothesis the two predictions of each item are exchangeable, so each permutation
+    swaps them on a random subset of items. All permutations of a block are evaluated at once.
+
+    Returns:
+        dict: observed difference (a - b) and two-sided p-value.
+    """
+    predictions = np.vstack([predictions_a, predictions_b]).astype(bool)
+    gold = np.asarray(gold, dtype=bool)
+    counts = confusion_matrices(predictions, gold).T
+    observed = metrics_from_counts(*counts)[metric]
+    observed_diff = float(observed[0] - observed[1])
+
+    rng = np.random.default_rng(seed)
+    num_items = len(gold)
+    block = max(1, _MAX_BLOCK_CELLS // max(2 * num_items, 1))
+    at_least_as_extreme = 0
+    for start in range(0, num_permutations, block):
+        swap = rng.random((min(block, num_permutations - start), num_items)) < 0.5
+        permuted_a = np.where(swap, predictions[1], predictions[0])
+        permuted_b = np.where(swap, predictions[0], predictions[1])
+        diffs = []
+        for permuted in (permuted_a, permuted_b):
+            tp = np.sum(permuted & gold, axis=1)
+            fp = np.sum(permuted & ~gold, axis=1)
+            fn = np.sum(~permuted & gold, axis=1)
+            diffs.append(metrics_from_counts(tp, fp, fn, num_items - tp - fp - fn)[metric])
+        at_least_as_extreme += int(np.sum(np.abs(diffs[0] - diffs[1]) >= abs(observed_diff) - 1e-12))
+    return {'metric': metric, 'difference': observed_diff, 'p_value': (at_least_as_extreme + 1) / (num_permutations + 1)}
+
+
+def pairwise_tests(predictions, names, gold, metric='f1', num_permutations=10000, seed=42):
+    """
+    McNemar and permutation tests for every pair of classifiers.
+
+    Returns:
+        list: One dict per pair (a, b).
+    """
+    predictions = np.atleast_2d(np.asarray(predictions, dtype=bool))
+    rows = []
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            mcnemar = mcnemar_test(predictions[i], predictions[j], gold)
+            permutation = permutation_test(predictions[i], predictions[j], gold, metric=metric,
+                                           num_permutations=num_permutations, seed=seed)
+            rows.append({
+                'a': names[i],
+                'b': names[j],
+                'mcnemar_a_only': mcnemar['a_only'],
+                'mcnemar_b_only': mcnemar['b_only'],
+                'mcnemar_p': mcnemar['p_value'],
+                f'{metric}_difference': permutation['difference'],
+                'permutation_p': permutation['p_value'],
+            })
+    return rows
@@ -3,129 +3,60 @@
 Script to compute precision, recall, F1, and kappa for binary columns in relation to Gold standard.
 """
 
-import csv
-from collections import defaultdict
-import math
+import argparse
 
-def calculate_kappa(observed_agreement, expected_agreement):
-    """Calculate Cohen's kappa coefficient."""
-    if expected_agreement == 1:
-        return 1.0  # Perfect agreement
-    return (observed_agreement - expected_agreement) / (1 - expected_agreement)
-
-def calculate_precision_recall_f1(true_positives, false_positives, false_negatives):
-    """Calculate precision, recall, and F1 score."""
-    precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-    recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-    return precision, recall, f1
+from analysis_engine import (
+    load_human_annotations,
+    classifier_effectiveness,
+    classifier_significance,
+)
 
 def main():
-    csv_file_path = '../annotations/human_annotations.csv'
+    parser = argparse.ArgumentParser(description="Effectiveness of the automatic check-worthiness labels against Gold.")
+    parser.add_argument('--bootstrap', type=int, default=0, help='Bootstrap resamples for confidence intervals (e.g. 10000; default: 0 = off)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the intervals (default: 0.95)')
+    parser.add_argument('--tests', action='store_true', help='Also run paired McNemar and permutation tests between the columns')
+    parser.add_argument('--permutations', type=int, default=10000, help='Permutations for the paired test (default: 10000)')
+    args = parser.parse_args()
     
     print("Loading data from human_annotations.csv...")
+    annotations = load_human_annotations()
     
-    # Initialize data structures
-    claim_methods = defaultdict(lambda: {
-        'total_rows': 0,
-        'gold_values': [],
-        'Hassan_Binary_values': [],
-        'Majer_Binary_values': [],
-        'intersection_values': [],
-        'union_values': []
-    })
-    
-    total_rows = 0
+    print(f"Total rows in dataset: {annotations.num_rows}")
+    print(f"Number of claim extraction methods: {len(annotations.methods)}")
+    print()
     
-    # Read the CSV file
-    with open(csv_file_path, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
+    # Analyze each claim extraction method: Hassan_Binary, Majer_Binary, Intersection, Union vs Gold
+    current_method = None
+    for row in classifier_effectiveness(annotations, bootstrap=args.bootstrap, confidence=args.confidence):
+        if row['method'] != current_method:
+            current_method = row['method']
+            print(f"=== Analysis for {current_method} ===")
+            print(f"Total rows: {row['rows']}")
+            print()
         
-        for row in reader:
-            total_rows += 1
-            
-            # Extract data
-            claim_method = row['Claim_Extr_Method']
-            gold = row['Gold']
-            majer_binary = row['Majer_Binary']
-            hassan_binary = row['Hassan_Binary']
-            intersection = row['Intersection']
-            union = row['Union']
-            
-            # Replace siqing with FHou and veriscore with FSong in claim_extr_method
-            # if claim_method == 'siqing':
-            #     claim_method = 'FHou'
-            # elif claim_method == 'veriscore':
-            #     claim_method = 'FSong'
-            
-            # Update counters for this claim method
-            claim_methods[claim_method]['total_rows'] += 1
-            
-            # Convert to boolean values (case-insensitive)
-            gold_is_true = gold.upper() == 'TRUE'
-            majer_is_true = majer_binary.upper() == 'TRUE'
-            hassan_is_true = hassan_binary.upper() == 'TRUE'
-            intersection_is_true = intersection.upper() == 'TRUE'
-            union_is_true = union.upper() == 'TRUE'
-            
-            # Store values
-            claim_methods[claim_method]['gold_values'].append(gold_is_true)
-            claim_methods[claim_method]['Majer_Binary_values'].append(majer_is_true)
-            claim_methods[claim_method]['Hassan_Binary_values'].append(hassan_is_true)
-            claim_methods[claim_method]['intersection_values'].append(intersection_is_true)
-            claim_methods[claim_method]['union_values'].append(union_is_true)
-    
-    print(f"Total rows in dataset: {total_rows}")
-    print(f"Number of claim extraction methods: {len(claim_methods)}")
-    print()
+        print(f"--- {row['column']} vs Gold ---")
+        print(f"Precision: {row['precision']:.4f}")
+        print(f"Recall: {row['recall']:.4f}")
+        print(f"F1 Score: {row['f1']:.4f}")
+        print(f"Kappa: {row['kappa']:.4f}")
+        if args.bootstrap:
+            level = f"{args.confidence * 100:g}% CI"
+            for metric, label in [('precision', 'Precision'), ('recall', 'Recall'), ('f1', 'F1 Score'), ('kappa', 'Kappa')]:
+                print(f"{label} {level}: [{row[f'{metric}_ci_low']:.4f}, {row[f'{metric}_ci_high']:.4f}]")
+        print()
     
-    # Analyze each claim extraction method
-    for method, data in claim_methods.items():
-        print(f"=== Analysis for {method} ===")
-        print(f"Total rows: {data['total_rows']}")
+    if args.tests:
+        current_method = None
+        for row in classifier_significance(annotations, num_permutations=args.permutations):
+            if row['method'] != current_method:
+                current_method = row['method']
+                print(f"=== Paired tests for {current_method} ===")
+            print(f"{row['a']} vs {row['b']}: McNemar p={row['mcnemar_p']:.4f} ({row['mcnemar_a_only']}/{row['mcnemar_b_only']} discordant), "
+                  f"F1 diff={row['f1_difference']:+.4f}, permutation p={row['permutation_p']:.4f}")
         print()
-        
-        # Define the columns to analyze
-        columns_to_analyze = [
-            ('Hassan_Binary', data['Hassan_Binary_values']),
-            ('Majer_Binary', data['Majer_Binary_values']),
-            ('Intersection', data['intersection_values']),
-            ('Union', data['union_values'])
-        ]
-        
-        gold_values = data['gold_values']
-        
-        for column_name, column_values in columns_to_analyze:
-            print(f"--- {column_name} vs Gold ---")
-            
-            # Calculate confusion matrix
-            true_positives = sum(1 for pred, gold in zip(column_values, gold_values) if pred and gold)
-            false_positives = sum(1 for pred, gold in zip(column_values, gold_values) if pred and not gold)
-            false_negatives = sum(1 for pred, gold in zip(column_values, gold_values) if not pred and gold)
-            true_negatives = sum(1 for pred, gold in zip(column_values, gold_values) if not pred and not gold)
-            
-            # Calculate precision, recall, F1
-            precision, recall, f1 = calculate_precision_recall_f1(true_positives, false_positives, false_negatives)
-            
-            # Calculate Kappa
-            observed_agreement = (true_positives + true_negatives) / data['total_rows']
-            
-            # Expected agreement
-            pred_true_rate = sum(column_values) / len(column_values) if len(column_values) > 0 else 0
-            pred_false_rate = 1 - pred_true_rate
-            gold_true_rate = sum(gold_values) / len(gold_values) if len(gold_values) > 0 else 0
-            gold_false_rate = 1 - gold_true_rate
-            
-            expected_agreement = (pred_true_rate * gold_true_rate) + (pred_false_rate * gold_false_rate)
-            kappa = calculate_kappa(observed_agreement, expected_agreement)
-            
-            print(f"Precision: {precision:.4f}")
-            print(f"Recall: {recall:.4f}")
-            print(f"F1 Score: {f1:.4f}")
-            print(f"Kappa: {kappa:.4f}")
-            print()
     
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Embedding cache and approximate nearest-neighbour index for claims (Individual_Statement) and agent
+utterances (Selected_Agent_Utterance).
+
+Vectors are computed once, in batches, on CPU, and appended to a memory-mapped float16 matrix keyed by
+claim/utterance id, so later runs only embed what is new. The nearest-neighbour index (HNSW via hnswlib
+when installed, otherwise an inverted-file index in NumPy) covers the rows of the store and is updated
+incrementally.
+
+Encoders: a sentence-transformers model when the package is installed, otherwise a dependency-free
+hashing encoder (signed feature hashing of word uni/bi-grams, projected to `dim` dimensions).
+"""
+
+import os
+import json
+import zlib
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # optional; the hashing encoder needs only NumPy
+    SentenceTransformer = None
+
+try:
+    import hnswlib
+except ImportError:  # optional; IVFIndex is used instead
+    hnswlib = None
+
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+# The method keeps FHuo and FSong claims of the same utterance and index apart in a shared store
+ID_COLUMNS = {
+    'Individual_Statement': ['Claim_Extr_Method', 'Conversation_Hash', 'Turn_Num', 'Statement_Index'],
+    'Selected_Agent_Utterance': ['Conversation_Hash', 'Turn_Num'],
+}
+
+
+def row_ids(df, text_column='Individual_Statement', method=None):
+    """
+    Ids of the rows of a pipeline CSV (method_hash_turn_index for claims, hash_turn for utterances).
+
+    `method` fills Claim_Extr_Method for files without that column (the exploded outputs of
+    f_huo_method.py / f_song.py). Files without Turn_Num (annotations/claims.csv) key the utterance by
+    a hash of Selected_Agent_Utterance, as claim_alignment.load_claims does, and number the claims of an
+    utterance in file order when Statement_Index is missing too.
+    """
+    keys = pd.DataFrame(index=df.index)
+    if 'Claim_Extr_Method' in df.columns:
+        keys['Claim_Extr_Method'] = df['Claim_Extr_Method']
+    elif method is not None:
+        keys['Claim_Extr_Method'] = method
+    if 'Conversation_Hash' not in df.columns:
+        raise ValueError("Missing required column: Conversation_Hash")
+    keys['Conversation_Hash'] = df['Conversation_Hash']
+    if 'Turn_Num' in df.columns:
+        keys['Turn_Num'] = df['Turn_Num']
+    elif 'Selected_Agent_Utterance' in df.columns:
+        utterances = df['Selected_Agent_Utterance'].astype(str).str.strip()
+        keys['Turn_Num'] = 'u' + utterances.map(lambda text: f"{zlib.crc32(text.encode('utf-8')):08x}")
+    else:
+        raise ValueError("Missing column Turn_Num (or Selected_Agent_Utterance to key the utterances by)")
+    columns = ID_COLUMNS[text_column]
+    if 'Claim_Extr_Method' in columns and 'Claim_Extr_Method' not in keys.columns:
+        raise ValueError("No Claim_Extr_Method column; pass the file as METHOD=path (e.g. FHuo=FHuo_exploded_statements.csv)")
+    if 'Statement_Index' in columns:
+        if 'Statement_Index' in df.columns:
+            keys['Statement_Index'] = df['Statement_Index']
+        else:
+            keys['Statement_Index'] = keys.groupby(['Claim_Extr_Method', 'Conversation_Hash', 'Turn_Num']).cumcount()
+    return keys[columns].astype(str).apply(lambda col: col.str.strip()).agg('_'.join, axis=1).to_numpy(dtype=object)
+
+
+class HashingEncoder:
+    """
+    Stateless text encoder: every word unigram and bigram is hashed to `nnz` dimensions with random
+    signs, weighted by 1 + log(count), and the sum is L2-normalized. The same text always gets the same
+    vector, so cached vectors never go stale.
+    """
+
+    def __init__(self, dim=384, nnz=4):
+        self.dim = dim
+        self.nnz = nnz
+        self.name = f'hashing-{dim}'
+
+    def _term_slots(self, terms):
+        """(dims, signs) of shape (len(terms), nnz) from a stable hash of each distinct term."""
+        digests = np.array([zlib.crc32(term.encode('utf-8')) for term in terms], dtype=np.uint64)
+        slots = np.empty((len(terms), self.nnz), dtype=np.uint64)
+        state = digests
+        with np.errstate(over='ignore'):
+            for j in range(self.nnz):
+                state = state * np.uint64(6364136223846793005) + np.uint64(1442695040888963407)
+                slots[:, j] = state >> np.uint64(33)
+        return (slots % np.uint64(self.dim)).astype(np.int64), np.where((slots >> np.uint64(20)) & np.uint64(1), 1.0, -1.0)
+
+    def encode(self, texts):
+        tokens = pd.Series(texts, dtype=object).fillna('').astype(str).str.lower().str.findall(r'\w+')
+        lengths = tokens.str.len().to_numpy()
+        flat = tokens.explode().dropna().to_numpy(dtype=object)
+        doc_ids = np.repeat(np.arange(len(tokens)), lengths)
+        same_doc = doc_ids[1:] == doc_ids[:-1]
+        bigrams = (pd.Series(flat[:-1][same_doc]) + ' ' + pd.Series(flat[1:][same_doc])).to_numpy(dtype=object)
+        terms = np.concatenate((flat, bigrams))
+        term_docs = np.concatenate((doc_ids, doc_ids[:-1][same_doc]))
+        term_codes, unique_terms = pd.factorize(terms, sort=False)
+        # Term frequencies per (document, term), then 1 + log(tf)
+        pair_keys, counts = np.unique(term_docs * len(unique_terms) + term_codes, return_counts=True)
+        docs, term_codes = pair_keys // max(len(unique_terms), 1), pair_keys % max(len(unique_terms), 1)
+        dims, signs = self._term_slots(unique_terms.tolist())
+        weights = (1 + np.log(counts))[:, None] * signs[term_codes]
+        flat_index = (docs[:, None] * self.dim + dims[term_codes]).ravel()
+        vectors = np.bincount(flat_index, weights=weights.ravel(), minlength=len(tokens) * self.dim)
+        vectors = vectors.reshape(len(tokens), self.dim).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class SentenceTransformerEncoder:
+    """A sentence-transformers model on CPU, with normalized outputs."""
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=256):
+        if SentenceTransformer is None:
+            raise ImportError("sentence-transformers is not installed; use the hashing encoder or `pip install sentence-transformers`")
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def encode(self, texts):
+        return self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False).astype(np.float32)
+
+
+def get_encoder(model='auto', dim=384):
+    """'hashing', a sentence-transformers model name, or 'auto' (the default model if installed, else hashing)."""
+    if model == 'hashing' or (model == 'auto' and SentenceTransformer is None):
+        return HashingEncoder(dim=dim)
+    return SentenceTransformerEncoder(DEFAULT_MODEL if model == 'auto' else model)
+
+
+class EmbeddingStore:
+    """
+    Append-only float16 vectors in a memory-mapped file, keyed by id.
+
+    Files in `directory`: vectors.f16 (capacity x dim, grown by doubling), ids.txt (one id per row) and
+    store.json (encoder, dim, number of rows). store.json is written last, so an interrupted add leaves
+    the store at its previous size.
+    """
+
+    def __init__(self, directory, encoder_name=None, dim=None):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'store.json')
+        self.vectors_path = os.path.join(directory, 'vectors.f16')
+        self.ids_path = os.path.join(directory, 'ids.txt')
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                self.meta = json.load(f)
+            if encoder_name and encoder_name != self.meta['encoder']:
+                raise ValueError(f"{directory} holds {self.meta['encoder']} vectors, not {encoder_name}")
+        else:
+            if dim is None:
+                raise ValueError(f"No embedding store in {directory}; pass the encoder dimension to create one")
+            os.makedirs(directory, exist_ok=True)
+            self.meta = {'encoder': encoder_name, 'dim': int(dim), 'size': 0, 'capacity': 0, 'ids_bytes': 0}
+            open(self.vectors_path, 'wb').close()
+            open(self.ids_path, 'w').close()
+        with open(self.ids_path, 'rb') as f:
+            self.ids = f.read(self.meta['ids_bytes']).decode('utf-8').splitlines()
+        self.row_of = {key: row for row, key in enumerate(self.ids)}
+
+    @property
+    def dim(self):
+        return self.meta['dim']
+
+    def __len__(self):
+        return self.meta['size']
+
+    def vectors(self):
+        """Read-only memory map of all stored vectors (size x dim float16)."""
+        if not len(self):
+            return np.zeros((0, self.dim), dtype=np.float16)
+        return np.memmap(self.vectors_path, dtype=np.float16, mode='r', shape=(self.meta['capacity'], self.dim))[:len(self)]
+
+    def rows(self, ids):
+        """Row of every id (-1 if not stored)."""
+        return np.array([self.row_of.get(key, -1) for key in ids], dtype=np.int64)
+
+    def get(self, ids):
+        """float32 vectors of the given ids (all must be stored)."""
+        rows = self.rows(ids)
+        if (rows < 0).any():
+            raise KeyError(f"{int((rows < 0).sum())} ids are not in the store")
+        return self.vectors()[rows].astype(np.float32)
+
+    def add(self, ids, vectors):
+        """Appends vectors for new ids (ids already stored, or repeated in the batch, are skipped). Returns their rows."""
+        vectors = np.asarray(vectors, dtype=np.float16)
+        new = {}
+        for i, key in enumerate(ids):
+            if key not in self.row_of and key not in new:
+                new[key] = i
+        if not new:
+            return np.zeros(0, dtype=np.int64)
+        start, end = len(self), len(self) + len(new)
+        if end > self.meta['capacity']:
+            self.meta['capacity'] = max(end, 2 * self.meta['capacity'])
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(self.meta['capacity'] * self.dim * 2)
+        matrix = np.memmap(self.vectors_path, dtype=np.float16, mode='r+', shape=(self.meta['capacity'], self.dim))
+        matrix[start:end] = vectors[list(new.values())]
+        matrix.flush()
+        del matrix
+        with open(self.ids_path, 'r+b') as f:
+            # Ids past the committed size are left over from an interrupted add
+            f.seek(self.meta['ids_bytes'])
+            f.truncate()
+            f.write(''.join(f'{key}\n' for key in new).encode('utf-8'))
+            self.meta['ids_bytes'] = f.tell()
+        for row, key in enumerate(new, start):
+            self.ids.append(key)
+            self.row_of[key] = row
+        self.meta['size'] = end
+        _write_json(self.meta_path, self.meta)
+        return np.arange(start, end)
+
+
+def _write_json(path, payload):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def embed(store, encoder, ids, texts, batch_size=10000):
+    """
+    Embeds the texts whose ids are not in the store yet, `batch_size` texts at a time. A repeated id
+    (an utterance listed once per claim) is embedded once, from its first text.
+
+    Returns:
+        int: Number of texts embedded.
+    """
+    ids = list(ids)
+    texts = list(texts)
+    missing = []
+    seen = set()
+    for i, key in enumerate(ids):
+        if key not in store.row_of and key not in seen:
+            seen.add(key)
+            missing.append(i)
+    start = time.perf_counter()
+    for begin in range(0, len(missing), batch_size):
+        batch = missing[begin:begin + batch_size]
+        store.add([ids[i] for i in batch], encoder.encode([texts[i] for i in batch]))
+    elapsed = time.perf_counter() - start
+    if missing:
+        print(f"✅ Embedded {len(missing)} new texts in {elapsed:.1f}s ({len(missing) / elapsed if elapsed > 0 else 0:.0f} texts/s)")
+    print(f"📦 Store has {len(store)} vectors ({len(ids) - len(missing)} of {len(ids)} reused)")
+    return len(missing)
+
+
+class IVFIndex:
+    """
+    Inverted-file index in NumPy: vectors are assigned to the nearest of `nlist` spherical k-means
+    centroids, and a query scores only the vectors of its `nprobe` nearest lists. New rows are assigned
+    to the existing centroids (no retraining).
+    """
+
+    def __init__(self, centroids, assignments):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self._sort()
+
+    def _sort(self):
+        self.order = np.argsort(self.assignments, kind='stable')
+        self.bounds = np.searchsorted(self.assignments[self.order], np.arange(len(self.centroids) + 1))
+
+    def __len__(self):
+        return len(self.assignments)
+
+    @classmethod
+    def train(cls, vectors, nlist=None, iterations=10, points_per_list=64, seed=42):
+        """Spherical k-means on a sample of `points_per_list` vectors per list (nlist defaults to sqrt(n))."""
+        nlist = nlist or max(1, int(np.sqrt(len(vectors))))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(vectors), size=min(points_per_list * nlist, len(vectors)), replace=False))
+        training = np.asarray(vectors[sample], dtype=np.float32)
+        centroids = training[rng.choice(len(training), size=min(nlist, len(training)), replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(training @ centroids.T, axis=1)
+            counts = np.bincount(nearest, minlength=len(centroids))
+            order = np.argsort(nearest, kind='stable')
+            sums = centroids.copy()  # empty lists keep their centroid
+            starts = np.cumsum(counts) - counts
+            sums[counts > 0] = np.add.reduceat(training[order], starts[counts > 0], axis=0)
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        return cls(centroids, np.zeros(0, dtype=np.int32))
+
+    def add(self, vectors, block=50000):
+        parts = [np.argmax(np.asarray(vectors[i:i + block], dtype=np.float32) @ self.centroids.T, axis=1)
+                 for i in range(0, len(vectors), block)]
+        self.assignments = np.concatenate([self.assignments] + [p.astype(np.int32) for p in parts])
+        self._sort()
+
+    def search(self, vectors, queries, k=10, nprobe=16):
+        """Top-k rows and cosine scores for each query; `vectors` are the indexed rows (e.g. the store memmap)."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        rows_out = np.full((len(queries), k), -1, dtype=np.int64)
+        scores_out = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            candidates = np.sort(np.concatenate([self.order[self.bounds[c]:self.bounds[c + 1]] for c in lists]))
+            if len(candidates) == 0:
+                continue
+            scores = np.asarray(vectors[candidates], dtype=np.float32) @ queries[q]
+            top = np.argsort(-scores)[:k]
+            rows_out[q, :len(top)] = candidates[top]
+            scores_out[q, :len(top)] = scores[top]
+        return rows_out, scores_out
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, assignments=self.assignments)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            return cls(npz['centroids'], npz['assignments'])
+
+
+class HNSWIndex:
+    """hnswlib HNSW graph over the store rows (cosine space); grows with resize_index on add."""
+
+    def __init__(self, dim, index=None, M=16, ef_construction=100):
+        self.dim = dim
+        if index is None:
+            index = hnswlib.Index(space='cosine', dim=dim)
+            index.init_index(max_elements=1024, ef_construction=ef_construction, M=M)
+        self.index = index
+
+    def __len__(self):
+        return self.index.get_current_count()
+
+    def add(self, vectors, start):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        needed = start + len(vectors)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+        self.index.add_items(vectors, np.arange(start, needed))
+
+    def search(self, vectors, queries, k=10, ef=64):
+        self.index.set_ef(max(ef, k))
+        labels, distances = self.index.knn_query(np.atleast_2d(np.asarray(queries, dtype=np.float32)), k=min(k, len(self)))
+        return labels.astype(np.int64), (1 - distances).astype(np.float32)
+
+    def save(self, path):
+        self.index.save_index(path)
+
+    @classmethod
+    def load(cls, path, dim):
+        index = hnswlib.Index(space='cosine', dim=dim)
+        index.load_index(path)
+        return cls(dim, index)
+
+
+class VectorIndex:
+    """
+    Nearest-neighbour index over an EmbeddingStore, saved next to it. `update()` adds the store rows that
+    are not indexed yet, so the index follows the store incrementally.
+    """
+
+    def __init__(self, store, backend='auto'):
+        self.store = store
+        self.meta_path = os.path.join(store.directory, 'index.json')
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                self.meta = json.load(f)
+            backend = self.meta['backend']
+        elif backend == 'auto':
+            backend = 'hnsw' if hnswlib is not None else 'ivf'
+        if backend == 'hnsw' and hnswlib is None:
+            raise ImportError("hnswlib is not installed; use --backend ivf or `pip install hnswlib`")
+        self.backend = backend
+        self.path = os.path.join(store.directory, 'index.hnsw' if backend == 'hnsw' else 'index.ivf.npz')
+        self.index = None
+        if os.path.exists(self.meta_path):
+            self.index = HNSWIndex.load(self.path, store.dim) if backend == 'hnsw' else IVFIndex.load(self.path)
+
+    def update(self, block=100000):
+        """Indexes the store rows added since the last update. Returns the number of rows added."""
+        vectors = self.store.vectors()
+        indexed = len(self.index) if self.index is not None else 0
+        if indexed == len(vectors):
+            return 0
+        start = time.perf_counter()
+        if self.index is None:
+            self.index = HNSWIndex(self.store.dim) if self.backend == 'hnsw' else IVFIndex.train(vectors)
+        for begin in range(indexed, len(vectors), block):
+            chunk = vectors[begin:begin + block]
+            if self.backend == 'hnsw':
+                self.index.add(chunk, begin)
+            else:
+                self.index.add(chunk)
+        self.index.save(self.path)
+        _write_json(self.meta_path, {'backend': self.backend, 'size': len(vectors)})
+        print(f"✅ Indexed {len(vectors) - indexed} vectors ({self.backend}) in {time.perf_counter() - start:.1f}s")
+        return len(vectors) - indexed
+
+    def search(self, queries, k=10, **options):
+        """
+        Approximate k nearest stored vectors of each query vector (options: nprobe for IVF, ef for HNSW).
+
+        Returns:
+            list: One list of (id, cosine similarity) per query.
+        """
+        if self.index is None:
+            raise RuntimeError("The index is empty; call update() first")
+        rows, scores = self.index.search(self.store.vectors(), queries, k=k, **options)
+        return [[(self.store.ids[r], float(s)) for r, s in zip(row, score) if r >= 0] for row, score in zip(rows, scores)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding cache and nearest-neighbour index for claims and utterances.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    embed_parser = subparsers.add_parser('embed', help='Embed the new rows of a CSV and update the index')
+    embed_parser.add_argument('--input_csv', required=True,
+                              help='Claim- or utterance-level CSV; use METHOD=path for exploded claims without Claim_Extr_Method (e.g. FHuo=FHuo_exploded_statements.csv)')
+    embed_parser.add_argument('--text_column', default='Individual_Statement', choices=list(ID_COLUMNS))
+    embed_parser.add_argument('--store_dir', required=True, help='Embedding store directory (created if missing)')
+    embed_parser.add_argument('--model', default='auto', help=f"'hashing', a sentence-transformers model, or 'auto' ({DEFAULT_MODEL} if installed)")
+    embed_parser.add_argument('--dim', type=int, default=384, help='Dimension of the hashing encoder (default: 384)')
+    embed_parser.add_argument('--batch_size', type=int, default=10000, help='Texts per encoder batch (default: 10000)')
+    embed_parser.add_argument('--backend', default='auto', choices=['auto', 'hnsw', 'ivf'], help='Index type for a new index (default: hnsw if installed)')
+
+    search_parser = subparsers.add_parser('search', help='Nearest stored texts of a query text or of a stored id')
+    search_parser.add_argument('--store_dir', required=True)
+    search_parser.add_argument('--model', default='auto', help='Same encoder as used for embedding')
+    search_parser.add_argument('--dim', type=int, default=384)
+    query = search_parser.add_mutually_exclusive_group(required=True)
+    query.add_argument('--query', help='Query text')
+    query.add_argument('--id', help='Id of a stored claim/utterance')
+    search_parser.add_argument('-k', type=int, default=10, help='Number of neighbours (default: 10)')
+
+    args = parser.parse_args()
+    encoder = get_encoder(args.model, args.dim) if args.command == 'embed' or args.query else None
+    if args.command == 'embed':
+        method, separator, path = args.input_csv.partition('=')
+        if not separator or not method.isidentifier():
+            method, path = None, args.input_csv
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df = df[df[args.text_column].str.strip() != '']
+        ids = row_ids(df, args.text_column, method)
+        print(f"📄 {len(df)} texts in {path}")
+        store = EmbeddingStore(args.store_dir, encoder.name, encoder.dim)
+        embed(store, encoder, ids, df[args.text_column].to_numpy(dtype=object), batch_size=args.batch_size)
+        VectorIndex(store, backend=args.backend).update()
+        return
+
+    store = EmbeddingStore(args.store_dir, encoder.name if encoder else None)
+    vectors = encoder.encode([args.query]) if args.query else store.get([args.id])
+    start = time.perf_counter()
+    results = VectorIndex(store).search(vectors, k=args.k)[0]
+    for key, score in results:
+        print(f"{score:.4f}\t{key}")
+    print(f"⏱️ {len(results)} neighbours in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
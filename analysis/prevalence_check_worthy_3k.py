@@ -3,123 +3,47 @@
 Script to analyze array columns and compute statistics for True values.
 """
 
-import csv
-import ast
-from collections import defaultdict
+import argparse
 
-def parse_array_string(array_str):
-    """Parse array string representation to actual list."""
-    if not array_str or array_str.strip() == '' or array_str == 'nan':
-        return []
-    
-    # Handle case where array_str is already an integer or other non-string type
-    if not isinstance(array_str, str):
-        return []
-    
-    try:
-        # Remove any extra whitespace and parse as Python literal
-        parsed = ast.literal_eval(array_str.strip())
-        # Ensure we return a list
-        if isinstance(parsed, list):
-            return parsed
-        else:
-            return []
-    except (ValueError, SyntaxError):
-        # If parsing fails, return empty list
-        return []
+from analysis_engine import load_analysis_data, dataset_summary, prevalence_statistics, prevalence_breakdown, PREVALENCE_GROUPS
 
 def main():
-    csv_file_path = '../annotations/analysis.csv'
+    parser = argparse.ArgumentParser(description="Prevalence of check-worthy claims in analysis.csv.")
+    parser.add_argument('--by', nargs='+', default=[], choices=list(PREVALENCE_GROUPS),
+                        help='Also break the prevalence down by these utterance attributes')
+    args = parser.parse_args()
     
     print("Loading data from analysis.csv...")
+    data = load_analysis_data()
+    summary = dataset_summary(data)
     
-    # Define columns to analyze in the requested order
-    columns_to_analyze = [
-        'FHuo_Hassan',
-        'FHuo_Majer',
-        'FHuo_Intersection',
-        'FHuo_Union',
-        'FSong_Hassan',
-        'FSong_Majer',
-        'FSong_Intersection',
-        'FSong_Union'
-    ]
-    
-    # Initialize data structures
-    column_data = {col: [] for col in columns_to_analyze}
-    conversation_data = defaultdict(lambda: {col: [] for col in columns_to_analyze})
-    selected_agent_column_data = defaultdict(lambda: {col: [] for col in columns_to_analyze})
-    
-    total_rows = 0
-    
-    # Read the CSV file
-    with open(csv_file_path, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        
-        for row in reader:
-            total_rows += 1
-            
-            # Extract data
-            conversation_hash = row['Conversation_Hash']
-            selected_agent_column = row['Selected_Agent_Column']
-            
-            # Parse arrays for each column
-            for col in columns_to_analyze:
-                array_str = row[col]
-                array = parse_array_string(array_str)
-                column_data[col].append(array)
-                conversation_data[conversation_hash][col].append(array)
-                selected_agent_column_data[selected_agent_column][col].append(array)
-    
-    print(f"Total rows in dataset: {total_rows}")
-    print(f"Total conversations: {len(conversation_data)}")
-    print(f"Total Selected_Agent_Column values: {len(selected_agent_column_data)}")
+    print(f"Total rows in dataset: {summary['utterances']}")
+    print(f"Total conversations: {summary['conversations']}")
+    print(f"Total Selected_Agent_Column values: {summary['selected_agent_columns']}")
     print()
     
-    # Analyze each column
-    for col in columns_to_analyze:
-        print(f"=== Analysis for {col} ===")
-        
-        # 1. % of True in all elements
-        all_elements = []
-        for array in column_data[col]:
-            all_elements.extend(array)
-        
-        total_elements = len(all_elements)
-        true_elements = sum(1 for elem in all_elements if elem)
-        pct_true_elements = (true_elements / total_elements) * 100 if total_elements > 0 else 0
-        
-        print(f"1. % of CW in all facts: {pct_true_elements:.2f}% ({true_elements}/{total_elements})")
-        
-        # 2. % of rows (utterances) have at least one True
-        rows_with_at_least_one_true = 0
-        
-        for array in column_data[col]:
-            if any(elem for elem in array):
-                rows_with_at_least_one_true += 1
-        
-        pct_rows_with_at_least_one_true = (rows_with_at_least_one_true / total_rows) * 100 if total_rows > 0 else 0
-        print(f"2. % of rows (utterances) have at least one CW fact: {pct_rows_with_at_least_one_true:.2f}% ({rows_with_at_least_one_true}/{total_rows})")
-        
-        # 3. % of conversations have at least one True
-        conversations_with_true = 0
-        total_conversations = len(conversation_data)
-        
-        for conv_hash, data in conversation_data.items():
-            # Check if any turn in this conversation has at least one True
-            has_true = False
-            for array in data[col]:
-                if any(elem for elem in array):
-                    has_true = True
-                    break
-            if has_true:
-                conversations_with_true += 1
-        
-        pct_conversations_with_true = (conversations_with_true / total_conversations) * 100 if total_conversations > 0 else 0
-        print(f"3. % of conversations have at least one CW fact: {pct_conversations_with_true:.2f}% ({conversations_with_true}/{total_conversations})")
-        
+    # FHuo_Hassan, FHuo_Majer, FHuo_Intersection, FHuo_Union, then the same for FSong
+    for stats in prevalence_statistics(data):
+        print(f"=== Analysis for {stats['column']} ===")
+        print(f"1. % of CW in all facts: {stats['pct_cw_facts']:.2f}% ({stats['cw_facts']}/{stats['total_facts']})")
+        print(f"2. % of rows (utterances) have at least one CW fact: {stats['pct_utterances_with_cw']:.2f}% ({stats['utterances_with_cw']}/{stats['utterances']})")
+        print(f"3. % of conversations have at least one CW fact: {stats['pct_conversations_with_cw']:.2f}% ({stats['conversations_with_cw']}/{stats['conversations']})")
         print()
     
+    # Same three numbers within each task type / agent turn
+    for group_by in args.by:
+        rows = prevalence_breakdown(data, group_by)
+        for col in dict.fromkeys(row['column'] for row in rows):
+            print(f"=== {col} by {group_by} ===")
+            for stats in rows:
+                if stats['column'] != col:
+                    continue
+                print(f"   - {stats[group_by]}: "
+                      f"facts {stats['pct_cw_facts']:.2f}% ({stats['cw_facts']}/{stats['total_facts']}), "
+                      f"utterances {stats['pct_utterances_with_cw']:.2f}% ({stats['utterances_with_cw']}/{stats['utterances']}), "
+                      f"conversations {stats['pct_conversations_with_cw']:.2f}% ({stats['conversations_with_cw']}/{stats['conversations']})")
+            print()
+    
 
 if __name__ == "__main__":
     main()
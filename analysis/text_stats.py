@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Streaming text statistics for utterance-level CSVs of any size (analysis.csv, or the exploded_system.csv
+written by the generation pipeline for a full WildChat dump).
+
+The CSV is read in chunks; word counts are computed per chunk into int64 arrays and folded
+into fixed-size accumulators (count, mean, standard deviation, min/max and a histogram for quantiles),
+overall and per task type, so memory does not grow with the corpus.
+"""
+
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+ANALYSIS_CSV = '../annotations/analysis.csv'
+TEXT_COLUMNS = ['Corresponding_User_Question', 'Selected_Agent_Utterance']
+
+def count_words_array(texts):
+    """
+    Word counts of a chunk of texts as an int64 array, identical to count_words (`len(text.split())`;
+    empty values and the string 'nan' count as 0).
+
+    str.split runs in C and measured faster than a NumPy scan over the code points of the whole chunk,
+    so each text is split once and only the counts are kept.
+    """
+    return np.fromiter(
+        (len(text.split()) if isinstance(text, str) and text != 'nan' else 0 for text in texts),
+        dtype=np.int64, count=len(texts),
+    )
+
+
+class StreamingStats:
+    """
+    Constant-memory summary of a stream of non-negative integers (word counts, turns, ...).
+
+    Values below `exact_limit` are counted exactly in a histogram; larger values go to power-of-two
+    buckets, so quantiles are exact up to `exact_limit` and within a factor of two beyond it.
+    """
+
+    def __init__(self, exact_limit=4096):
+        self.exact_limit = exact_limit
+        self.exact = np.zeros(exact_limit, dtype=np.int64)
+        self.overflow = np.zeros(64, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.min = None
+        self.max = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.int64)
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_squares += float(np.square(values, dtype=np.float64).sum())
+        self.min = int(values.min()) if self.min is None else min(self.min, int(values.min()))
+        self.max = int(values.max()) if self.max is None else max(self.max, int(values.max()))
+        small = values < self.exact_limit
+        self.exact += np.bincount(values[small], minlength=self.exact_limit)
+        if not small.all():
+            buckets = np.floor(np.log2(values[~small])).astype(np.int64)
+            self.overflow += np.bincount(buckets, minlength=64)
+        return self
+
+    def merge(self, other):
+        """Adds another accumulator (e.g. from a different worker or file)."""
+        self.exact += other.exact
+        self.overflow += other.overflow
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        for attr, pick in (('min', min), ('max', max)):
+            values = [v for v in (getattr(self, attr), getattr(other, attr)) if v is not None]
+            setattr(self, attr, pick(values) if values else None)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    @property
+    def std(self):
+        if not self.count:
+            return 0
+        return float(np.sqrt(max(self.total_squares / self.count - self.mean ** 2, 0.0)))
+
+    def quantile(self, q):
+        """Smallest value v with at least a share q of the values <= v (upper bucket edge beyond exact_limit)."""
+        if not self.count:
+            return 0
+        rank = max(1, int(np.ceil(q * self.count)))
+        cumulative = np.cumsum(self.exact)
+        if cumulative[-1] >= rank:
+            return int(np.searchsorted(cumulative, rank))
+        overflow_cumulative = cumulative[-1] + np.cumsum(self.overflow)
+        bucket = int(np.searchsorted(overflow_cumulative, rank))
+        return min(2 ** (bucket + 1) - 1, self.max)
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        result = {'count': self.count, 'mean': self.mean, 'std': self.std, 'min': self.min, 'max': self.max}
+        for q in quantiles:
+            result[f'p{q * 100:g}'] = self.quantile(q)
+        return result
+
+
+class GroupedStreamingStats:
+    """One StreamingStats per group label (e.g. Task_Classification), updated chunk by chunk."""
+
+    def __init__(self, exact_limit=4096):
+        self.exact_limit = exact_limit
+        self.groups = {}
+
+    def update(self, values, labels):
+        values = np.asarray(values, dtype=np.int64)
+        codes, uniques = pd.factorize(pd.Series(labels, dtype=object).fillna(''), sort=False)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        for code, label in enumerate(uniques):
+            if label not in self.groups:
+                self.groups[label] = StreamingStats(self.exact_limit)
+            self.groups[label].update(values[order[bounds[code]:bounds[code + 1]]])
+        return self
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        ordered = sorted(self.groups.items(), key=lambda item: -item[1].count)
+        return {label: stats.summary(quantiles) for label, stats in ordered}
+
+
+class ConversationStats:
+    """
+    Turns per conversation and average turn number, streamed over rows that are grouped by conversation
+    (as analysis.csv and the exploded pipeline outputs are). Only the conversation that spans a chunk
+    boundary is carried over, so memory stays constant.
+    """
+
+    def __init__(self):
+        self.turns_per_conversation = StreamingStats()
+        self.conversations = 0
+        self.total_avg_turn = 0.0
+        self._pending = None  # (hash, number of turns, sum of turn numbers)
+
+    def _close(self, num_turns, turn_sum):
+        self.turns_per_conversation.update([num_turns])
+        self.conversations += 1
+        self.total_avg_turn += turn_sum / num_turns
+
+    def update(self, conversation_hashes, turn_nums):
+        hashes = pd.Series(conversation_hashes, dtype=object).reset_index(drop=True)
+        turns = pd.Series(turn_nums, dtype=str).reset_index(drop=True).str.strip()
+        # Rows whose Turn_Num is not an integer are skipped, as in statistics_3k_conversation.py
+        valid = turns.str.fullmatch(r'[+-]?\d+')
+        hashes, turns = hashes[valid], turns[valid].astype(np.int64)
+        if hashes.empty:
+            return self
+        # Runs of equal consecutive hashes are the conversations of this chunk
+        run_starts = np.flatnonzero(np.concatenate(([True], hashes.to_numpy()[1:] != hashes.to_numpy()[:-1])))
+        run_hashes = hashes.to_numpy()[run_starts]
+        run_sizes = np.diff(np.concatenate((run_starts, [len(hashes)])))
+        run_sums = np.add.reduceat(turns.to_numpy(), run_starts)
+        if self._pending is not None:
+            if self._pending[0] == run_hashes[0]:
+                run_sizes[0] += self._pending[1]
+                run_sums[0] += self._pending[2]
+            else:
+                self._close(self._pending[1], self._pending[2])
+        # Every run but the last is complete
+        self.turns_per_conversation.update(run_sizes[:-1])
+        self.conversations += len(run_sizes) - 1
+        self.total_avg_turn += float((run_sums[:-1] / run_sizes[:-1]).sum())
+        self._pending = (run_hashes[-1], int(run_sizes[-1]), int(run_sums[-1]))
+        return self
+
+    def finish(self):
+        if self._pending is not None:
+            self._close(self._pending[1], self._pending[2])
+            self._pending = None
+        return self
+
+    def summary(self):
+        single_turn = int(self.turns_per_conversation.exact[1])
+        return {
+            'conversations': self.conversations,
+            'single_turn_conversations': single_turn,
+            'pct_single_turn': single_turn / self.conversations * 100 if self.conversations else 0,
+            'multi_turn_conversations': self.conversations - single_turn,
+            'pct_multi_turn': (self.conversations - single_turn) / self.conversations * 100 if self.conversations else 0,
+            'avg_turn_num': self.total_avg_turn / self.conversations if self.conversations else 0,
+            'turns_per_conversation': self.turns_per_conversation.summary(),
+        }
+
+
+def text_statistics(csv_path, text_columns=TEXT_COLUMNS, group_by='Task_Classification', chunksize=100000):
+    """
+    Streams an utterance-level CSV once and returns word-count statistics per text column (overall and
+    per `group_by` value, if that column exists) and conversation statistics.
+    """
+    overall = {col: StreamingStats() for col in text_columns}
+    grouped = {col: GroupedStreamingStats() for col in text_columns}
+    conversations = ConversationStats()
+    rows = 0
+    has_groups = False
+    for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunksize):
+        rows += len(chunk)
+        has_groups = group_by in chunk.columns if group_by else False
+        for col in text_columns:
+            word_counts = count_words_array(chunk[col])
+            overall[col].update(word_counts)
+            if has_groups:
+                grouped[col].update(word_counts, chunk[group_by])
+        if 'Conversation_Hash' in chunk.columns and 'Turn_Num' in chunk.columns:
+            conversations.update(chunk['Conversation_Hash'], chunk['Turn_Num'])
+    conversations.finish()
+    return {
+        'rows': rows,
+        'conversations': conversations.summary(),
+        'words': {col: overall[col].summary() for col in text_columns},
+        **({f'words_by_{group_by}': {col: grouped[col].summary() for col in text_columns}} if has_groups else {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constant-memory word count and conversation statistics of an utterance-level CSV.")
+    parser.add_argument('--input_csv', default=ANALYSIS_CSV, help='Utterance-level CSV (default: ../annotations/analysis.csv)')
+    parser.add_argument('--text_columns', nargs='+', default=TEXT_COLUMNS, help='Text columns to count words in')
+    parser.add_argument('--group_by', default='Task_Classification', help='Per-group breakdown column (default: Task_Classification)')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Rows per chunk (default: 100000)')
+    parser.add_argument('--output_json', default=None, help='Also save the statistics as JSON')
+    args = parser.parse_args()
+
+    stats = text_statistics(args.input_csv, args.text_columns, args.group_by, args.chunksize)
+    print(f"Rows: {stats['rows']}")
+    conv = stats['conversations']
+    print(f"Conversations: {conv['conversations']} "
+          f"(single-turn {conv['pct_single_turn']:.2f}%, multi-turn {conv['pct_multi_turn']:.2f}%), "
+          f"average turn_num {conv['avg_turn_num']:.2f}")
+    for col, summary in stats['words'].items():
+        print(f"=== Words in {col} ===")
+        print(f"   - mean {summary['mean']:.2f} (std {summary['std']:.2f}), median {summary['p50']}, "
+              f"p90 {summary['p90']}, p99 {summary['p99']}, max {summary['max']}")
+        for label, group in stats.get(f'words_by_{args.group_by}', {}).get(col, {}).items():
+            print(f"   - {label}: mean {group['mean']:.2f}, median {group['p50']}, p90 {group['p90']} ({group['count']} rows)")
+        print()
+    if args.output_json:
+        with open(args.output_json, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2, ensure_ascii=False)
+        print(f"💾 Statistics saved to: {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
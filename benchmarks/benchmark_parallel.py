@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark of the --workers option of the local generation stages.
+
+Times utterance explosion, context strings and FHuo request writing for 1, 2, 4, ... N worker processes
+on a raw conversation CSV (by default a synthetic one from synthetic_data.py), reports the speedup over
+one worker and checks that every run writes byte-identical files.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import filecmp
+
+from synthetic_data import write_dataset
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BENCHMARKS_DIR, '..', 'generation'))
+from parallel_utils import resolve_workers
+from preprocess_files_for_pipeline import explode_all_system_utterances_with_all_columns, generate_context_string
+from f_huo_method import make_FHuo_batch_request_file
+
+
+def _time_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_stages(input_csv, output_dir, workers):
+    """
+    Runs the CPU-bound local stages once with the given number of workers and returns their timings.
+    """
+    timings = {}
+    exploded_csv, timings['explode'] = _time_call(
+        explode_all_system_utterances_with_all_columns, input_csv, output_dir, workers=workers
+    )
+    context_csv, timings['context'] = _time_call(generate_context_string, exploded_csv, output_dir, workers=workers)
+    _, timings['FHuo_requests'] = _time_call(make_FHuo_batch_request_file, context_csv, output_dir, workers=workers)
+    return timings
+
+
+def benchmark(input_csv, max_workers, output_dir=None):
+    """
+    Times the local stages for 1, 2, 4, ... up to max_workers processes and checks that every run
+    writes byte-identical outputs to the single-worker run.
+
+    Returns:
+        list: One dict per worker count with per-stage seconds and the speedup over 1 worker.
+    """
+    max_workers = resolve_workers(max_workers)
+    worker_counts = []
+    n = 1
+    while n < max_workers:
+        worker_counts.append(n)
+        n *= 2
+    worker_counts.append(max_workers)
+
+    base_dir = output_dir or tempfile.mkdtemp(prefix="wildclaims_bench_")
+    results = []
+    baseline_dir = None
+    baseline_total = None
+    for workers in worker_counts:
+        run_dir = os.path.join(base_dir, f"workers_{workers}")
+        os.makedirs(run_dir, exist_ok=True)
+        timings = run_stages(input_csv, run_dir, workers)
+        total = sum(timings.values())
+        identical = True
+        if baseline_dir is None:
+            baseline_dir, baseline_total = run_dir, total
+        else:
+            for name in ["exploded_system.csv", "context_system.csv", "FHuo_batch_requests.jsonl"]:
+                identical &= filecmp.cmp(os.path.join(baseline_dir, name), os.path.join(run_dir, name), shallow=False)
+        results.append({
+            'workers': workers,
+            **{stage: round(seconds, 3) for stage, seconds in timings.items()},
+            'total': round(total, 3),
+            'speedup': round(baseline_total / total, 2) if total > 0 else 0,
+            'identical_output': identical,
+        })
+    if output_dir is None:
+        shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the --workers option of the local pipeline stages.")
+    parser.add_argument('--input_csv', default=None,
+                        help='Raw conversation CSV (Conversation_Hash, Utterance-N (User/Agent) columns; default: a synthetic dataset)')
+    parser.add_argument('--conversations', type=int, default=3000, help='Size of the synthetic dataset when no --input_csv is given (default: 3000)')
+    parser.add_argument('--max_workers', type=int, default=0, help='Largest worker count to try (default: 0 = all cores)')
+    parser.add_argument('--output_dir', default=None, help='Keep per-run outputs here (default: temporary directory)')
+    args = parser.parse_args()
+
+    dataset_dir = None
+    input_csv = args.input_csv
+    if input_csv is None:
+        dataset_dir = tempfile.mkdtemp(prefix="wildclaims_bench_data_")
+        print(f"📦 Generating synthetic dataset ({args.conversations} conversations)...")
+        input_csv = write_dataset(dataset_dir, args.conversations)['conversations']
+    try:
+        results = benchmark(input_csv, args.max_workers, args.output_dir)
+    finally:
+        if dataset_dir:
+            shutil.rmtree(dataset_dir, ignore_errors=True)
+    print("\n📊 Scaling results:")
+    header = list(results[0].keys())
+    print(" | ".join(header))
+    for row in results:
+        print(" | ".join(str(row[col]) for col in header))
+
+
+if __name__ == "__main__":
+    main()
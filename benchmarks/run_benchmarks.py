@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmarks of the generation pipeline and the analysis scripts on synthetic data.
+
+Every stage (preprocessing, explosion, request building, result mapping, each analysis script) runs in a
+fresh process on a synthetic WildChat-shaped dataset (synthetic_data.py) with canned batch outputs, so no
+API calls are made. Wall time and peak RSS are recorded per stage and compared against the stored
+baselines (baselines.json, keyed by scale) as the median of several runs; stages slower or larger than
+the baseline by more than the relative tolerance and an absolute floor are flagged and the script exits
+with status 1.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import statistics
+import resource
+import argparse
+import importlib
+import traceback
+import contextlib
+import multiprocessing
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from synthetic_data import write_dataset
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCHMARKS_DIR, '..'))
+GENERATION_DIR = os.path.join(REPO_DIR, 'generation')
+ANALYSIS_DIR = os.path.join(REPO_DIR, 'analysis')
+BASELINES_JSON = os.path.join(BENCHMARKS_DIR, 'baselines.json')
+
+# Differences below these are noise, whatever the relative change (--min_seconds_delta / --min_memory_delta_mb)
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 16
+
+# group: 'generation' or 'analysis' (the script directory the stage runs in); module: imported before
+# the clock starts; setup (optional): untimed preparation in the parent; run(module, paths): the timed call
+Stage = namedtuple('Stage', ['group', 'module', 'run', 'setup'], defaults=[None])
+
+
+def _fsong_mapping_setup(paths):
+    # map_FSong_claims_to_csv looks rows up by the lowercase WildChat columns
+    df = pd.read_csv(paths['context_csv'])
+    df['conversation_hash'] = df['Conversation_Hash']
+    df['turn_num'] = df['Turn_Num']
+    df.to_csv(paths['FSong_input_csv'], index=False)
+
+
+def _clear(path):
+    def setup(paths):
+        shutil.rmtree(paths[path], ignore_errors=True)
+    return setup
+
+
+def _human_annotation_tables(engine, paths):
+    annotations = engine.load_human_annotations(paths['human_annotations_csv'])
+    return engine.annotator_agreement(annotations), engine.claim_label_agreement(annotations)
+
+
+def _prevalence_tables(engine, paths):
+    data = engine.load_analysis_data(paths['analysis_csv'])
+    return [engine.prevalence_statistics(data)] + [engine.prevalence_breakdown(data, by) for by in engine.PREVALENCE_GROUPS]
+
+
+def _embed_claims(embeddings, paths):
+    encoder = embeddings.HashingEncoder()
+    store = embeddings.EmbeddingStore(paths['embedding_store'], encoder.name, encoder.dim)
+    num_claims = 0
+    # Both methods share one store; their claims must not reuse each other's vectors
+    for method, path in (('FHuo', paths['FHuo_exploded']), ('FSong', paths['FSong_exploded'])):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        df = df[df['Individual_Statement'].str.strip() != '']
+        num_claims += len(df)
+        embeddings.embed(store, encoder, embeddings.row_ids(df, 'Individual_Statement', method),
+                         df['Individual_Statement'].to_numpy(dtype=object))
+    if len(store) != num_claims:
+        raise AssertionError(f"{num_claims - len(store)} claim ids were reused across FHuo and FSong")
+    embeddings.VectorIndex(store, backend='ivf').update()
+
+
+STAGES = {
+    # Generation pipeline, in pipeline order (later stages read the outputs of earlier ones)
+    'preprocess_explode': Stage('generation', 'preprocess_files_for_pipeline', lambda m, p: m.explode_all_system_utterances_with_all_columns(p['conversations'], p['generation_dir'])),
+    'preprocess_context': Stage('generation', 'preprocess_files_for_pipeline', lambda m, p: m.generate_context_string(p['exploded_csv'], p['generation_dir'])),
+    'labeling_explode': Stage('generation', 'labeling_math_and_code', lambda m, p: m.explode_all_user_utterances_with_all_columns(p['conversations'], p['labeling_dir'])),
+    'labeling_requests': Stage('generation', 'labeling_math_and_code', lambda m, p: m.make_openai_batch_request_file(p['labeling_exploded'], p['labeling_dir'])),
+    'labeling_mapping': Stage('generation', 'labeling_math_and_code', lambda m, p: m.map_batch_results_to_csv(p['labeling_results'], p['labeling_exploded'], p['labeling_dir'])),
+    'task_explode': Stage('generation', 'task_classification', lambda m, p: m.explode_all_user_utterances_with_all_columns(p['conversations'], p['task_dir'])),
+    'task_requests': Stage('generation', 'task_classification', lambda m, p: m.make_task_classification_batch_request_file(p['task_exploded'], p['task_requests'])),
+    'task_mapping': Stage('generation', 'task_classification', lambda m, p: m.map_task_classification_results_to_csv(p['task_exploded'], p['task_results'], p['task_mapped'])),
+    'FHuo_requests': Stage('generation', 'f_huo_method', lambda m, p: m.make_FHuo_batch_request_file(p['context_csv'], p['FHuo_dir'])),
+    'FHuo_mapping': Stage('generation', 'f_huo_method', lambda m, p: m.map_FHuo_results_to_csv(p['FHuo_results'], p['context_csv'], p['FHuo_dir'])),
+    'FHuo_explode': Stage('generation', 'f_huo_method', lambda m, p: m.explode_FHuo_factual_statements(p['FHuo_mapped'], p['FHuo_dir'])),
+    'FSong_requests': Stage('generation', 'f_song', lambda m, p: m.batch_generate_jsonl_from_new_format(p['context_csv'], p['FSong_requests_dir']),
+                            setup=_clear('FSong_requests_dir')),
+    'FSong_mapping': Stage('generation', 'f_song', lambda m, p: m.map_FSong_claims_to_csv(p['FSong_dir'], p['FSong_input_csv'], p['FSong_mapped']),
+                           setup=_fsong_mapping_setup),
+    'FSong_explode': Stage('generation', 'f_song', lambda m, p: m.explode_FSong_claims(p['FSong_mapped'], p['FSong_exploded'])),
+    'claim_dedup': Stage('generation', 'claim_dedup', lambda m, p: m.dedup_claims_csv(p['FSong_exploded'], p['FSong_clustered'])),
+    'CW_requests': Stage('generation', 'cw', lambda m, p: m.make_claim_batch_request_file(p['FSong_exploded'], p['CW_requests'], prompt_mode='Majer')),
+    'CW_mapping': Stage('generation', 'cw', lambda m, p: m.add_CW_predictions_to_csv(p['FSong_exploded'], p['FSong_Majer_results'], p['CW_mapped'], 'Majer')),
+    # Analysis scripts: the engine call behind each script, on the synthetic annotation files
+    'statistics_3k_conversation': Stage('analysis', 'analysis_engine', lambda m, p: m.conversation_statistics(m.load_analysis_data(p['analysis_csv']))),
+    'statistics_fact_claim_extraction_3k': Stage('analysis', 'analysis_engine', lambda m, p: m.extraction_statistics(m.load_analysis_data(p['analysis_csv']))),
+    'prevalence_check_worthy_3k': Stage('analysis', 'analysis_engine', _prevalence_tables),
+    'statistics_human_annotations': Stage('analysis', 'analysis_engine', _human_annotation_tables),
+    'effectiveness_automatic_check_worthiness': Stage('analysis', 'analysis_engine', lambda m, p: m.classifier_effectiveness(m.load_human_annotations(p['human_annotations_csv']))),
+    'analysis_engine': Stage('analysis', 'analysis_engine', lambda m, p: m.write_tables(m.compute_all_tables(p['analysis_csv'], p['human_annotations_csv']), p['tables_dir'])),
+    'text_stats': Stage('analysis', 'text_stats', lambda m, p: m.text_statistics(p['analysis_csv'])),
+    'claims_index': Stage('analysis', 'claims_index', lambda m, p: m.build_index(p['claims_db'], [p['claims_csv']], tasks_csv=p['analysis_csv'])),
+    'claim_alignment': Stage('analysis', 'claim_alignment', lambda m, p: m.align_claims(m.load_claims([p['claims_csv']]))),
+    'embeddings': Stage('analysis', 'embeddings', _embed_claims, setup=_clear('embedding_store')),
+}
+
+
+def work_paths(work_dir, dataset):
+    """Dataset files plus every intermediate file the stages read or write."""
+    generation_dir = os.path.join(work_dir, 'generation')
+    paths = dict(dataset)
+    paths.update({
+        'generation_dir': generation_dir,
+        'exploded_csv': os.path.join(generation_dir, 'exploded_system.csv'),
+        'context_csv': os.path.join(generation_dir, 'context_system.csv'),
+        'labeling_dir': os.path.join(generation_dir, 'labeling'),
+        'labeling_exploded': os.path.join(generation_dir, 'labeling', 'exploded.csv'),
+        'task_dir': os.path.join(generation_dir, 'task'),
+        'task_exploded': os.path.join(generation_dir, 'task', 'exploded_user_utterances.csv'),
+        'task_requests': os.path.join(generation_dir, 'task', 'task_batch_requests.jsonl'),
+        'task_mapped': os.path.join(generation_dir, 'task', 'task_classified.csv'),
+        'FHuo_dir': os.path.join(generation_dir, 'FHuo'),
+        'FHuo_mapped': os.path.join(generation_dir, 'FHuo', 'FHuo_with_factual_statements.csv'),
+        'FHuo_exploded': os.path.join(generation_dir, 'FHuo', 'FHuo_exploded_statements.csv'),
+        'FSong_requests_dir': os.path.join(generation_dir, 'FSong', 'requests'),
+        'FSong_input_csv': os.path.join(generation_dir, 'FSong', 'context_system_lowercase.csv'),
+        'FSong_mapped': os.path.join(generation_dir, 'FSong', 'FSong_with_claims.csv'),
+        'FSong_exploded': os.path.join(generation_dir, 'FSong', 'FSong_exploded_statements.csv'),
+        'FSong_clustered': os.path.join(generation_dir, 'FSong', 'FSong_exploded_statements_clustered.csv'),
+        'CW_requests': os.path.join(generation_dir, 'CW', 'FSong_Majer_batch_requests.jsonl'),
+        'CW_mapped': os.path.join(generation_dir, 'CW', 'FSong_Majer.csv'),
+        'tables_dir': os.path.join(work_dir, 'analysis', 'tables'),
+        'claims_db': os.path.join(work_dir, 'analysis', 'claims.sqlite'),
+        'embedding_store': os.path.join(work_dir, 'analysis', 'embeddings'),
+    })
+    for name in ('labeling_dir', 'task_dir', 'FHuo_dir', 'FSong_requests_dir', 'tables_dir'):
+        os.makedirs(paths[name], exist_ok=True)
+    for name in ('FSong_mapped', 'CW_requests', 'claims_db'):
+        os.makedirs(os.path.dirname(paths[name]), exist_ok=True)
+    return paths
+
+
+def _stage_worker(name, paths, connection):
+    """Child process body: imports the stage module, then times the stage call with stdout silenced."""
+    try:
+        stage = STAGES[name]
+        directory = GENERATION_DIR if stage.group == 'generation' else ANALYSIS_DIR
+        # The scripts import each other flatly and resolve some defaults relative to their directory
+        os.chdir(directory)
+        sys.path.insert(0, directory)
+        module = importlib.import_module(stage.module)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            stage.run(module, paths)
+            seconds = time.perf_counter() - start
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        connection.send({'seconds': seconds, 'peak_rss_mb': peak_mb})
+    except Exception:
+        connection.send({'error': traceback.format_exc()})
+    finally:
+        connection.close()
+
+
+def run_stage(name, paths, repeats=1):
+    """
+    Runs one stage `repeats` times, each in a new process.
+
+    Returns:
+        dict: Median seconds and peak RSS in MB over the repeats, or {'error': traceback}. The median
+        of an odd number of runs ignores one slow outlier (a busy machine) as well as one lucky run.
+    """
+    stage = STAGES[name]
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for _ in range(repeats):
+        if stage.setup:
+            stage.setup(paths)
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_stage_worker, args=(name, paths, sender))
+        process.start()
+        sender.close()
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = None
+        process.join()
+        if result is None:
+            result = {'error': f'stage process exited with code {process.exitcode}'}
+        if 'error' in result:
+            return result
+        runs.append(result)
+    return {
+        'seconds': round(statistics.median(run['seconds'] for run in runs), 4),
+        'peak_rss_mb': round(statistics.median(run['peak_rss_mb'] for run in runs), 1),
+    }
+
+
+def compare(results, baseline, tolerance=0.25, memory_tolerance=0.25,
+            min_seconds_delta=MIN_SECONDS_DELTA, min_memory_delta_mb=MIN_MEMORY_DELTA_MB):
+    """
+    Flags the stages whose time or peak memory exceeds the baseline by more than the tolerance and by
+    more than the absolute floor (min_seconds_delta / min_memory_delta_mb), so that stages of a few
+    milliseconds are not flagged for scheduler jitter.
+
+    Returns:
+        list: (stage, metric, baseline value, new value) per regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or 'error' in result:
+            continue
+        if (result['seconds'] > base['seconds'] * (1 + tolerance)
+                and result['seconds'] - base['seconds'] > min_seconds_delta):
+            regressions.append((name, 'seconds', base['seconds'], result['seconds']))
+        if (result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + memory_tolerance)
+                and result['peak_rss_mb'] - base['peak_rss_mb'] > min_memory_delta_mb):
+            regressions.append((name, 'peak_rss_mb', base['peak_rss_mb'], result['peak_rss_mb']))
+    return regressions
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'cpus': os.cpu_count(),
+    }
+
+
+def load_baselines(path=BASELINES_JSON):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results, scale, stats, path=BASELINES_JSON):
+    """Stores the results as the baseline of this scale (other scales are kept)."""
+    baselines = load_baselines(path)
+    baselines[str(scale)] = {
+        'created': datetime.now(timezone.utc).strftime('%Y-%m-%d'),
+        'machine': machine_info(),
+        'dataset': stats,
+        'stages': {name: result for name, result in results.items() if 'error' not in result},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2)
+        f.write('\n')
+
+
+def prepare_dataset(work_dir, conversations, seed):
+    """Generates the synthetic dataset in work_dir/dataset, reusing it if it was made with the same settings."""
+    dataset_dir = os.path.join(work_dir, 'dataset')
+    marker = os.path.join(dataset_dir, 'dataset.json')
+    if os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as f:
+            dataset = json.load(f)
+        if dataset['stats']['conversations'] == conversations and dataset.get('seed') == seed:
+            return dataset
+        shutil.rmtree(dataset_dir)
+    print(f"📦 Generating synthetic dataset ({conversations} conversations)...")
+    start = time.perf_counter()
+    dataset = write_dataset(dataset_dir, conversations, seed)
+    dataset['seed'] = seed
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(dataset, f, indent=2)
+    print(f"⏱️ Generated in {time.perf_counter() - start:.1f}s")
+    return dataset
+
+
+def select_stages(names):
+    """Stage names in pipeline order; `names` may contain stage names and the groups 'generation'/'analysis'."""
+    if not names:
+        return list(STAGES)
+    unknown = [name for name in names if name not in STAGES and name not in ('generation', 'analysis')]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown} (use {list(STAGES)}, 'generation' or 'analysis')")
+    return [name for name, stage in STAGES.items() if name in names or stage.group in names]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory benchmarks of the pipeline and analysis stages on synthetic data.")
+    parser.add_argument('--conversations', type=int, default=300, help='Synthetic dataset size (default: 300; the 3k sample is 3000)')
+    parser.add_argument('--seed', type=int, default=42, help='Dataset seed (default: 42)')
+    parser.add_argument('--stages', nargs='+', default=None,
+                        help="Stages to run (default: all); 'generation' / 'analysis' select a group. "
+                             "Stages read the outputs of earlier ones, so run the full pipeline once per work_dir first")
+    parser.add_argument('--repeats', type=int, default=3, help='Runs per stage; the median is reported (default: 3)')
+    parser.add_argument('--work_dir', default=os.path.join(BENCHMARKS_DIR, 'work'),
+                        help='Where the dataset and intermediate files go (default: benchmarks/work)')
+    parser.add_argument('--baselines', default=BASELINES_JSON, help='Baseline file (default: benchmarks/baselines.json)')
+    parser.add_argument('--save_baseline', action='store_true', help='Store this run as the baseline of its scale')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown over the baseline (default: 0.25 = 25%%)')
+    parser.add_argument('--memory_tolerance', type=float, default=0.25, help='Allowed peak RSS increase over the baseline (default: 0.25)')
+    parser.add_argument('--min_seconds_delta', type=float, default=MIN_SECONDS_DELTA,
+                        help=f'Slowdowns smaller than this many seconds are never regressions (default: {MIN_SECONDS_DELTA})')
+    parser.add_argument('--min_memory_delta_mb', type=float, default=MIN_MEMORY_DELTA_MB,
+                        help=f'Peak RSS increases smaller than this many MB are never regressions (default: {MIN_MEMORY_DELTA_MB})')
+    parser.add_argument('--output_json', default=None, help='Also save the results as JSON')
+    args = parser.parse_args()
+
+    stages = select_stages(args.stages)
+    dataset = prepare_dataset(args.work_dir, args.conversations, args.seed)
+    stats = dataset['stats']
+    print(f"📊 {stats['conversations']} conversations, {stats['agent_utterances']} agent utterances, "
+          f"{stats['FHuo_claims']} FHuo and {stats['FSong_claims']} FSong claims")
+    paths = work_paths(args.work_dir, dataset)
+    baseline = load_baselines(args.baselines).get(str(args.conversations), {}).get('stages', {})
+
+    results = {}
+    print(f"{'stage':<42} {'seconds':>9} {'peak MB':>9} {'vs baseline':>12}")
+    for name in stages:
+        result = run_stage(name, paths, args.repeats)
+        results[name] = result
+        if 'error' in result:
+            print(f"{name:<42} ❌ failed\n{result['error']}")
+            continue
+        base = baseline.get(name)
+        change = f"{(result['seconds'] / base['seconds'] - 1) * 100:+.1f}%" if base and base['seconds'] else '-'
+        print(f"{name:<42} {result['seconds']:>9.3f} {result['peak_rss_mb']:>9.1f} {change:>12}")
+
+    failed = [name for name, result in results.items() if 'error' in result]
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance,
+                          args.min_seconds_delta, args.min_memory_delta_mb)
+    if not baseline:
+        print(f"⚠️ No baseline for {args.conversations} conversations in {args.baselines}")
+    for name, metric, before, after in regressions:
+        print(f"⚠️ Regression in {name}: {metric} {before} -> {after} ({(after / before - 1) * 100:+.1f}%)")
+    if baseline and not regressions and not failed:
+        print("✅ No regressions")
+    if args.save_baseline:
+        save_baseline(results, args.conversations, stats, args.baselines)
+        print(f"💾 Baseline for {args.conversations} conversations saved to: {args.baselines}")
+    if args.output_json:
+        with open(args.output_json, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine_info(), 'dataset': stats, 'stages': results, 'regressions': regressions}, f, indent=2)
+        print(f"💾 Results saved to: {args.output_json}")
+    if failed or (regressions and not args.save_baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
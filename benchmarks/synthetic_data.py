@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Synthetic WildChat-shaped data for the benchmarks.
+
+Generates, at any scale, the files the pipeline and the analysis scripts read:
+- a raw conversation CSV (`Conversation_Hash`, `Utterance-N (User)` / `Utterance-N (Agent)` columns) with
+  the turn and length distributions of the 3k sample (57% single-turn, ~2.5 agent utterances per
+  conversation, ~96 words per user and ~220 words per agent utterance);
+- canned OpenAI Batch API outputs for every LLM stage (math/code labeling, task classification, FHuo,
+  the per-utterance FSong claim files and the four CW runs), keyed by the custom_ids the request
+  builders produce, so the result-mapping stages run without the API;
+- annotations-shaped files (analysis.csv, claims.csv and a copy of human_annotations.csv) whose claims
+  and labels match the canned outputs (~4 FHuo and ~12 FSong claims per agent utterance).
+
+The text is random pseudo-words with Zipf-distributed frequencies, so the files have realistic sizes
+and token statistics but no meaning.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import zlib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HUMAN_ANNOTATIONS_CSV = os.path.join(REPO_DIR, 'annotations', 'human_annotations.csv')
+
+# Task labels as written in analysis.csv / human_annotations.csv, with their share in the human annotations
+TASK_CATEGORIES = {
+    'Information seeking': 0.31, 'Creative Writing': 0.27, 'Editing': 0.165, 'Others': 0.075,
+    'Reasoning': 0.055, 'Role playing': 0.04, 'Coding & Debugging': 0.03, 'Brainstorming': 0.02,
+    'Advice seeking': 0.01, 'Data Analysis': 0.01, 'Math': 0.01, 'Planning': 0.005,
+}
+LABELING_CATEGORIES = {'Math': 'Math', 'Coding & Debugging': 'Coding'}
+CW_LABELS = ['CFS', 'UFS', 'NFS']
+CW_LABEL_PROBABILITIES = [0.35, 0.2, 0.45]
+EXTRACTION_METHODS = ['FHuo', 'FSong']
+CW_METHODS = ['Hassan', 'Majer']
+
+# Distributions of the 3k sample
+SINGLE_TURN_SHARE = 0.57
+MULTI_TURN_EXTRA_P = 1 / 3.56          # multi-turn: 2 + (geometric - 1) agent utterances, mean ~4.6
+USER_WORDS = (95.7, 1.2)               # (mean, lognormal sigma)
+AGENT_WORDS = (219.0, 0.8)
+CLAIMS_PER_UTTERANCE = {'FHuo': 4.1, 'FSong': 12.0}
+# Share of FSong claims that paraphrase an FHuo claim of the same utterance, and that restate another
+# FSong claim of the utterance (near-duplicates for claim_dedup.py)
+FSONG_PARAPHRASE_SHARE = 0.3
+FSONG_DUPLICATE_SHARE = 0.05
+
+# File names inside the dataset directory
+DATASET_FILES = {
+    'conversations': 'conversations.csv',
+    'labeling_results': 'batch_outputs/labeling_results.jsonl',
+    'task_results': 'batch_outputs/task_classification_results.jsonl',
+    'FHuo_results': 'batch_outputs/FHuo_results.jsonl',
+    'FSong_dir': 'batch_outputs/FSong',
+    **{f'{extraction}_{cw}_results': f'batch_outputs/{extraction}_{cw}_results.jsonl'
+       for extraction in EXTRACTION_METHODS for cw in CW_METHODS},
+    'analysis_csv': 'annotations/analysis.csv',
+    'claims_csv': 'annotations/claims.csv',
+    'human_annotations_csv': 'annotations/human_annotations.csv',
+}
+
+_CONSONANTS = list('bcdfghjklmnprstvwz') + ['ch', 'sh', 'th', 'st', 'tr', 'br']
+_VOWELS = ['a', 'e', 'i', 'o', 'u', 'ai', 'ea', 'ou']
+_VERBS = ['is', 'was', 'has', 'contains', 'produces', 'supports', 'requires', 'reached', 'founded',
+          'covers', 'includes', 'uses', 'became', 'remains', 'introduced', 'measures']
+_PREPOSITIONS = ['in', 'since', 'before', 'after', 'around', 'during']
+
+
+class TextSampler:
+    """Random pseudo-word text and claim sentences with a Zipf-distributed vocabulary."""
+
+    def __init__(self, rng, vocabulary_size=8000, zipf_exponent=1.15):
+        self.rng = rng
+        words = set()
+        while len(words) < vocabulary_size:
+            syllables = rng.integers(1, 4)
+            words.add(''.join(_CONSONANTS[rng.integers(len(_CONSONANTS))] + _VOWELS[rng.integers(len(_VOWELS))]
+                              for _ in range(syllables)))
+        self.words = np.array(sorted(words, key=len), dtype=object)
+        self.sentence_ends = np.array([word + '.' for word in self.words], dtype=object)
+        self.zipf_exponent = zipf_exponent
+
+    def _word_indices(self, n):
+        return (self.rng.zipf(self.zipf_exponent, size=n) - 1) % len(self.words)
+
+    def lengths(self, n, mean, sigma, minimum=1):
+        """Lognormal word counts with the given mean."""
+        mu = np.log(mean) - sigma ** 2 / 2
+        return np.maximum(np.round(self.rng.lognormal(mu, sigma, size=n)).astype(np.int64), minimum)
+
+    def texts(self, lengths, sentence_length=16):
+        """One text per entry of `lengths` (word counts), split into sentences of ~`sentence_length` words."""
+        total = int(lengths.sum())
+        indices = self._word_indices(total)
+        ends = self.rng.random(total) < 1 / sentence_length
+        ends[np.cumsum(lengths) - 1] = True
+        tokens = np.where(ends, self.sentence_ends[indices], self.words[indices])
+        return [' '.join(chunk).capitalize() for chunk in np.split(tokens, np.cumsum(lengths)[:-1])]
+
+    def claims(self, n):
+        """`n` short factual-sounding sentences ("Subject verb object in year.")."""
+        subjects = self.words[self._word_indices(2 * n)].reshape(n, 2) if n else np.zeros((0, 2), dtype=object)
+        object_lengths = self.rng.integers(2, 7, size=n)
+        objects = np.split(self.words[self._word_indices(int(object_lengths.sum()))], np.cumsum(object_lengths)[:-1]) if n else []
+        verbs = self.rng.choice(_VERBS, size=n)
+        prepositions = self.rng.choice(_PREPOSITIONS, size=n)
+        years = self.rng.integers(1800, 2024, size=n)
+        return [f"{s1.capitalize()} {s2.capitalize()} {verb} {' '.join(obj)} {prep} {year}."
+                for (s1, s2), verb, obj, prep, year in zip(subjects, verbs, objects, prepositions, years)]
+
+    def paraphrase(self, claims):
+        """Copies of `claims` with one word replaced, as a second extraction method would phrase them."""
+        paraphrased = []
+        for claim in claims:
+            words = claim.split(' ')
+            position = self.rng.integers(2, max(len(words) - 1, 3))
+            if position < len(words) - 1:
+                words[position] = self.words[self._word_indices(1)[0]]
+            paraphrased.append(' '.join(words))
+        return paraphrased
+
+
+def conversation_hash(salt, index):
+    """32-character hex id, like WildChat's conversation_hash."""
+    return hashlib.md5(f'{salt}-{index}'.encode()).hexdigest()
+
+
+def generate_turns(num_conversations, sampler, max_turns=40):
+    """
+    Long-form conversations: one row per (Conversation_Hash, Turn) with the user and agent text.
+
+    Turn t is stored in columns Utterance-{2t} (User) and Utterance-{2t+1} (Agent) of the raw CSV.
+    """
+    rng = sampler.rng
+    multi_turn = rng.random(num_conversations) >= SINGLE_TURN_SHARE
+    turns_per_conversation = np.where(multi_turn, 1 + rng.geometric(MULTI_TURN_EXTRA_P, size=num_conversations), 1)
+    turns_per_conversation = np.minimum(turns_per_conversation, max_turns)
+    salt = int(rng.integers(2 ** 31))
+    hashes = [conversation_hash(salt, i) for i in range(num_conversations)]
+    num_turns = int(turns_per_conversation.sum())
+    turns = pd.DataFrame({
+        'Conversation_Hash': np.repeat(np.array(hashes, dtype=object), turns_per_conversation),
+        'Turn': np.concatenate([np.arange(n) for n in turns_per_conversation]) if num_turns else np.zeros(0, dtype=np.int64),
+    })
+    turns['User'] = sampler.texts(sampler.lengths(num_turns, *USER_WORDS))
+    turns['Agent'] = sampler.texts(sampler.lengths(num_turns, *AGENT_WORDS))
+    # One task per user turn; follow-up turns mostly keep the task of the conversation
+    categories = list(TASK_CATEGORIES)
+    weights = np.array(list(TASK_CATEGORIES.values()))
+    tasks = rng.choice(len(categories), size=num_turns, p=weights / weights.sum())
+    first = turns['Turn'].to_numpy() == 0
+    keep = ~first & (rng.random(num_turns) < 0.8)
+    conversation_task = pd.Series(np.where(first, tasks, -1)).replace(-1, np.nan).ffill().astype(int).to_numpy()
+    turns['Task_Classification'] = np.array(categories, dtype=object)[np.where(keep, conversation_task, tasks)]
+    return turns
+
+
+def conversations_csv_frame(turns):
+    """Wide WildChat-shaped frame: one row per conversation, Utterance-N columns in conversation order."""
+    max_turns = int(turns['Turn'].max()) + 1 if len(turns) else 0
+    wide = turns.pivot(index='Conversation_Hash', columns='Turn', values=['User', 'Agent'])
+    wide = wide.reindex(turns['Conversation_Hash'].drop_duplicates())
+    df = pd.DataFrame({'Conversation_Hash': wide.index, 'conversation_hash': wide.index})
+    for t in range(max_turns):
+        df[f'Utterance-{2 * t} (User)'] = wide[('User', t)].to_numpy()
+        df[f'Utterance-{2 * t + 1} (Agent)'] = wide[('Agent', t)].to_numpy()
+    return df.reset_index(drop=True)
+
+
+def generate_claims(turns, sampler):
+    """
+    Claims and CW labels per agent utterance.
+
+    Returns:
+        pd.DataFrame: one row per claim with Claim_Extr_Method, Conversation_Hash, Turn (conversation turn),
+        Statement_Index, Individual_Statement, Hassan and Majer (NFS/UFS/CFS labels).
+    """
+    rng = sampler.rng
+    frames = []
+    fhuo_counts = rng.poisson(CLAIMS_PER_UTTERANCE['FHuo'], size=len(turns))
+    fsong_counts = rng.poisson(CLAIMS_PER_UTTERANCE['FSong'], size=len(turns))
+    fhuo_claims = sampler.claims(int(fhuo_counts.sum()))
+    # FSong restates part of the FHuo claims of the utterance and adds its own, finer-grained ones
+    fhuo_offsets = np.concatenate(([0], np.cumsum(fhuo_counts)))
+    paraphrased_counts = np.minimum(rng.binomial(fsong_counts, FSONG_PARAPHRASE_SHARE), fhuo_counts)
+    paraphrase_sources = [fhuo_claims[start:start + count] for start, count in zip(fhuo_offsets[:-1], paraphrased_counts)]
+    paraphrased = sampler.paraphrase([claim for claims in paraphrase_sources for claim in claims])
+    fresh = sampler.claims(int((fsong_counts - paraphrased_counts).sum()))
+    paraphrased_offsets = np.concatenate(([0], np.cumsum(paraphrased_counts)))
+    fresh_offsets = np.concatenate(([0], np.cumsum(fsong_counts - paraphrased_counts)))
+    duplicate = rng.random(len(fresh)) < FSONG_DUPLICATE_SHARE
+    fsong_claims = []
+    for i in range(len(turns)):
+        utterance_claims = paraphrased[paraphrased_offsets[i]:paraphrased_offsets[i + 1]]
+        for j in range(fresh_offsets[i], fresh_offsets[i + 1]):
+            # A restatement differs only in case and punctuation
+            utterance_claims.append(utterance_claims[-1].lower().rstrip('.') if duplicate[j] and utterance_claims else fresh[j])
+        fsong_claims.extend(utterance_claims)
+
+    for method, counts, claims in (('FHuo', fhuo_counts, fhuo_claims), ('FSong', fsong_counts, fsong_claims)):
+        total = int(counts.sum())
+        hassan = rng.choice(len(CW_LABELS), size=total, p=CW_LABEL_PROBABILITIES)
+        # Majer agrees with Hassan on most claims
+        agree = rng.random(total) < 0.7
+        majer = np.where(agree, hassan, rng.choice(len(CW_LABELS), size=total, p=CW_LABEL_PROBABILITIES))
+        frames.append(pd.DataFrame({
+            'Claim_Extr_Method': method,
+            'Conversation_Hash': np.repeat(turns['Conversation_Hash'].to_numpy(), counts),
+            'Turn': np.repeat(turns['Turn'].to_numpy(), counts),
+            'Statement_Index': np.concatenate([np.arange(n) for n in counts]) if total else np.zeros(0, dtype=np.int64),
+            'Individual_Statement': claims,
+            'Hassan': np.array(CW_LABELS, dtype=object)[hassan],
+            'Majer': np.array(CW_LABELS, dtype=object)[majer],
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def batch_output_record(custom_id, content, model='gpt-4.1-2025-04-14', prompt_tokens=0, completion_tokens=0):
+    """One line of an OpenAI Batch API output file for a successful chat completion."""
+    digest = format(zlib.crc32(custom_id.encode()), '08x')
+    return {
+        'id': f'batch_req_{digest}',
+        'custom_id': custom_id,
+        'response': {
+            'status_code': 200,
+            'request_id': digest,
+            'body': {
+                'id': f'chatcmpl-{digest}',
+                'object': 'chat.completion',
+                'created': 0,
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': int(prompt_tokens), 'completion_tokens': int(completion_tokens),
+                          'total_tokens': int(prompt_tokens) + int(completion_tokens)},
+            },
+        },
+        'error': None,
+    }
+
+
+def _approx_tokens(text):
+    return int(len(text.split()) * 1.3) + 1
+
+
+def write_batch_outputs(path, custom_ids, contents, prompt_tokens, model):
+    """Writes a canned Batch API output JSONL (one successful completion per custom_id)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for custom_id, content, tokens in zip(custom_ids, contents, prompt_tokens):
+            record = batch_output_record(custom_id, content, model, tokens, _approx_tokens(content))
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return path
+
+
+def write_FSong_claim_files(directory, turns, claims):
+    """Writes the per-utterance claims_{hash}_{turn}.jsonl files that run_FSong leaves in FSong_dir."""
+    fsong = claims[claims['Claim_Extr_Method'] == 'FSong']
+    by_utterance = fsong.groupby(['Conversation_Hash', 'Turn'], sort=False)['Individual_Statement'].agg(list)
+    for conv_hash, turn, user, agent in zip(turns['Conversation_Hash'], turns['Turn'], turns['User'], turns['Agent']):
+        turn_num = 2 * turn + 1
+        row_folder = os.path.join(directory, conv_hash)
+        os.makedirs(row_folder, exist_ok=True)
+        record = {'question': f'User: {user}', 'response': agent, 'all_claims': by_utterance.get((conv_hash, turn), [])}
+        with open(os.path.join(row_folder, f'claims_{conv_hash}_{turn_num}.jsonl'), 'w', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def analysis_csv_frame(turns, claims):
+    """analysis.csv-shaped frame: one row per agent utterance with the CW arrays of every method."""
+    df = pd.DataFrame({
+        'Conversation_Hash': turns['Conversation_Hash'],
+        'Turn_Num': turns['Turn'] + 1,
+        'Corresponding_User_Question': turns['User'],
+        'Selected_Agent_Utterance': turns['Agent'],
+        'Selected_Agent_Column': [f'Utterance-{2 * t + 1} (Agent)' for t in turns['Turn']],
+        'Task_Classification': turns['Task_Classification'],
+        'Use': True,
+    })
+    keys = pd.MultiIndex.from_frame(turns[['Conversation_Hash', 'Turn']])
+    for method in EXTRACTION_METHODS:
+        method_claims = claims[claims['Claim_Extr_Method'] == method]
+        hassan = method_claims['Hassan'] == 'CFS'
+        majer = method_claims['Majer'] == 'CFS'
+        group = [method_claims['Conversation_Hash'], method_claims['Turn']]
+        for cw, flags in (('Hassan', hassan), ('Majer', majer), ('Intersection', hassan & majer), ('Union', hassan | majer)):
+            arrays = flags.groupby(group, sort=False).agg(lambda values: str(list(values))).reindex(keys, fill_value='[]')
+            df[f'{method}_{cw}'] = arrays.to_numpy()
+            df[f'{method}_{cw}_Fact_Num'] = flags.groupby(group, sort=False).sum().reindex(keys, fill_value=0).to_numpy()
+        df[f'{method}_Fact_Total'] = method_claims.groupby(group, sort=False).size().reindex(keys, fill_value=0).to_numpy()
+    return df
+
+
+def claims_csv_frame(turns, claims):
+    """claims.csv-shaped frame: one row per claim with its utterance and boolean Hassan/Majer outputs."""
+    utterances = turns.set_index(['Conversation_Hash', 'Turn'])['Agent']
+    agent = utterances.reindex(pd.MultiIndex.from_frame(claims[['Conversation_Hash', 'Turn']])).to_numpy()
+    return pd.DataFrame({
+        'Selected_Agent_Utterance': agent,
+        'Conversation_Hash': claims['Conversation_Hash'],
+        'Claim_Extr_Method': claims['Claim_Extr_Method'],
+        'Individual_Statement': claims['Individual_Statement'],
+        'Hassan': claims['Hassan'] == 'CFS',
+        'Majer': claims['Majer'] == 'CFS',
+    })
+
+
+def write_dataset(output_dir, num_conversations=1000, seed=42, model='gpt-4.1-2025-04-14'):
+    """
+    Generates a complete synthetic dataset in `output_dir` (see DATASET_FILES for the layout).
+
+    Args:
+        output_dir (str): Dataset directory (created if missing).
+        num_conversations (int): Number of conversations; the 3k sample is 3000.
+        seed (int): Random seed; the same seed and scale always give the same files.
+
+    Returns:
+        dict: DATASET_FILES name -> absolute path, plus 'stats' with the row counts.
+    """
+    rng = np.random.default_rng(seed)
+    sampler = TextSampler(rng)
+    paths = {name: os.path.abspath(os.path.join(output_dir, file)) for name, file in DATASET_FILES.items()}
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    turns = generate_turns(num_conversations, sampler)
+    claims = generate_claims(turns, sampler)
+    conversations_csv_frame(turns).to_csv(paths['conversations'], index=False)
+
+    # custom_ids as built by the request files: hash (labeling), hash_turnnum (task, FHuo), hash_turnnum_index (CW)
+    first_turns = turns[turns['Turn'] == 0]
+    write_batch_outputs(
+        paths['labeling_results'], first_turns['Conversation_Hash'],
+        [f"[[{LABELING_CATEGORIES.get(task, 'Others')}]]" for task in first_turns['Task_Classification']],
+        [_approx_tokens(user) + _approx_tokens(agent) for user, agent in zip(first_turns['User'], first_turns['Agent'])],
+        model,
+    )
+    utterance_ids = turns['Conversation_Hash'] + '_' + (2 * turns['Turn'] + 1).astype(str)
+    write_batch_outputs(
+        paths['task_results'], turns['Conversation_Hash'] + '_' + (2 * turns['Turn']).astype(str),
+        turns['Task_Classification'], [_approx_tokens(user) + 400 for user in turns['User']], model,
+    )
+    fhuo = claims[claims['Claim_Extr_Method'] == 'FHuo']
+    fhuo_lists = fhuo.groupby(['Conversation_Hash', 'Turn'], sort=False)['Individual_Statement'].agg(list)
+    keys = pd.MultiIndex.from_frame(turns[['Conversation_Hash', 'Turn']])
+    write_batch_outputs(
+        paths['FHuo_results'], utterance_ids,
+        [json.dumps(statements if isinstance(statements, list) else [], ensure_ascii=False)
+         for statements in fhuo_lists.reindex(keys)],
+        [_approx_tokens(user) + _approx_tokens(agent) + 300 for user, agent in zip(turns['User'], turns['Agent'])],
+        model,
+    )
+    write_FSong_claim_files(paths['FSong_dir'], turns, claims)
+    for method in EXTRACTION_METHODS:
+        method_claims = claims[claims['Claim_Extr_Method'] == method]
+        claim_ids = (method_claims['Conversation_Hash'] + '_' + (2 * method_claims['Turn'] + 1).astype(str)
+                     + '_' + method_claims['Statement_Index'].astype(str))
+        prompt_tokens = [_approx_tokens(claim) + 600 for claim in method_claims['Individual_Statement']]
+        for cw in CW_METHODS:
+            write_batch_outputs(paths[f'{method}_{cw}_results'], claim_ids, method_claims[cw], prompt_tokens, model)
+
+    analysis_csv_frame(turns, claims).to_csv(paths['analysis_csv'], index=False)
+    claims_csv_frame(turns, claims).to_csv(paths['claims_csv'], index=False)
+    shutil.copyfile(HUMAN_ANNOTATIONS_CSV, paths['human_annotations_csv'])
+    paths['stats'] = {
+        'conversations': int(num_conversations),
+        'agent_utterances': int(len(turns)),
+        'FHuo_claims': int((claims['Claim_Extr_Method'] == 'FHuo').sum()),
+        'FSong_claims': int((claims['Claim_Extr_Method'] == 'FSong').sum()),
+    }
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic WildChat-shaped dataset with canned batch outputs.")
+    parser.add_argument('--output_dir', required=True, help='Dataset directory')
+    parser.add_argument('--conversations', type=int, default=1000, help='Number of conversations (default: 1000; the 3k sample is 3000)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    args = parser.parse_args()
+    paths = write_dataset(args.output_dir, args.conversations, args.seed)
+    stats = paths['stats']
+    print(f"✅ {stats['conversations']} conversations, {stats['agent_utterances']} agent utterances, "
+          f"{stats['FHuo_claims']} FHuo and {stats['FSong_claims']} FSong claims")
+    print(f"💾 Dataset saved to: {os.path.abspath(args.output_dir)}")
+
+
+if __name__ == "__main__":
+    main()
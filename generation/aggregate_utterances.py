@@ -0,0 +1,179 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from telemetry import instrumented, add_rows
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analysis'))
+from bool_arrays import RaggedBoolArray, format_bool_arrays, save_bool_arrays, cache_path_for
+
+
+EXTRACTION_METHODS = ['FHuo', 'FSong']
+CW_METHODS = ['Hassan', 'Majer', 'Intersection', 'Union']
+UTTERANCE_COLUMNS = [
+    'Conversation_Hash', 'Turn_Num', 'Corresponding_User_Question', 'Selected_Agent_Utterance',
+    'Selected_Agent_Column', 'Task_Classification', 'Use',
+]
+CLAIM_COLUMNS = ['Conversation_Hash', 'Turn_Num', 'Statement_Index', 'Hassan', 'Majer']
+# Claims read per chunk; only the key, index and label columns are kept, as ~18 bytes per claim
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def _utterance_index(conversation_hashes, turn_nums):
+    """(Conversation_Hash, Turn_Num) keys; turn numbers that are not integers become -1 and match nothing."""
+    turns = pd.to_numeric(pd.Series(np.asarray(turn_nums)), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    return pd.MultiIndex.from_arrays([np.asarray(conversation_hashes, dtype=object).astype(str), turns])
+
+
+@instrumented('aggregate_claims')
+def read_claim_labels(claims_csv, utterance_index, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Streams a claim-level CW output (cw.py run with --prompt_mode Hassan and Majer, or Joint) and keeps,
+    per claim, only its utterance row, Statement_Index and binarized labels (CFS = check-worthy).
+
+    Returns:
+        tuple: (rows int64, statement_index int64, hassan uint8, majer uint8), one entry per claim of a
+        known utterance; claims of other utterances are counted and dropped.
+    """
+    rows, statement_index, hassan, majer = [], [], [], []
+    num_claims = 0
+    num_unmatched = 0
+    for chunk in pd.read_csv(claims_csv, usecols=CLAIM_COLUMNS, dtype=str, keep_default_na=False, chunksize=chunksize):
+        num_claims += len(chunk)
+        chunk_rows = utterance_index.get_indexer(_utterance_index(chunk['Conversation_Hash'], chunk['Turn_Num']))
+        matched = chunk_rows >= 0
+        num_unmatched += int((~matched).sum())
+        chunk = chunk[matched]
+        rows.append(chunk_rows[matched].astype(np.int64))
+        statement_index.append(pd.to_numeric(chunk['Statement_Index'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64))
+        hassan.append(chunk['Hassan'].str.upper().str.contains('CFS', regex=False).to_numpy(dtype=np.uint8))
+        majer.append(chunk['Majer'].str.upper().str.contains('CFS', regex=False).to_numpy(dtype=np.uint8))
+    add_rows(num_claims)
+    print(f"📄 {claims_csv}: {num_claims} claims")
+    if num_unmatched:
+        print(f"⚠️ {num_unmatched} claims belong to utterances missing from the utterance CSV; skipped")
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty.astype(np.uint8), empty.astype(np.uint8)
+    return np.concatenate(rows), np.concatenate(statement_index), np.concatenate(hassan), np.concatenate(majer)
+
+
+def claim_arrays(rows, statement_index, hassan, majer, num_utterances):
+    """
+    Groups claim labels by utterance, ordered by Statement_Index within each utterance.
+
+    Returns:
+        dict: CW method (Hassan, Majer, Intersection, Union) -> RaggedBoolArray with one row per utterance.
+    """
+    order = np.lexsort((statement_index, rows))
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=num_utterances))))
+    hassan = hassan[order]
+    majer = majer[order]
+    labels = {'Hassan': hassan, 'Majer': majer, 'Intersection': hassan & majer, 'Union': hassan | majer}
+    return {method: RaggedBoolArray(values, offsets) for method, values in labels.items()}
+
+
+def load_utterances(utterances_csv, task_csv=None):
+    """
+    Agent utterance rows of the analysis (the context_system.csv of preprocess_files_for_pipeline.py).
+
+    Turn_Num stays the agent utterance index of the pipeline for matching claims; Task_Classification is
+    taken from the user utterance right before it in `task_csv` (task_classification.py output).
+    """
+    header = pd.read_csv(utterances_csv, nrows=0).columns
+    df = pd.read_csv(utterances_csv, dtype=str, keep_default_na=False,
+                     usecols=[col for col in UTTERANCE_COLUMNS if col in header])
+    add_rows(len(df))
+    for col in ('Conversation_Hash', 'Turn_Num', 'Selected_Agent_Utterance'):
+        if col not in df.columns:
+            raise ValueError(f"Missing required column in {utterances_csv}: {col}")
+    df = df.drop_duplicates(['Conversation_Hash', 'Turn_Num']).reset_index(drop=True)
+    if task_csv:
+        tasks = pd.read_csv(task_csv, usecols=['Conversation_Hash', 'Turn_Num', 'Task_Classification'],
+                            dtype=str, keep_default_na=False).drop_duplicates(['Conversation_Hash', 'Turn_Num'])
+        task_index = _utterance_index(tasks['Conversation_Hash'], tasks['Turn_Num'])
+        user_turns = pd.to_numeric(df['Turn_Num'], errors='coerce') - 1
+        positions = task_index.get_indexer(_utterance_index(df['Conversation_Hash'], user_turns))
+        df['Task_Classification'] = np.where(positions >= 0, tasks['Task_Classification'].to_numpy()[positions], '')
+        print(f"📊 Task classification found for {(positions >= 0).sum()}/{len(df)} utterances")
+    for col in UTTERANCE_COLUMNS:
+        if col not in df.columns:
+            # Not produced by the pipeline stages; every aggregated utterance counts as used
+            df[col] = True if col == 'Use' else ''
+    return df
+
+
+@instrumented('aggregate_utterances')
+def aggregate_utterances(utterances_csv, claims_csvs, output_csv, task_csv=None, chunksize=DEFAULT_CHUNKSIZE, cache=True):
+    """
+    Builds analysis.csv: one row per agent utterance with, per extraction method, the ordered CW label
+    array of its claims for Hassan, Majer and their Intersection/Union, the check-worthy counts
+    (*_Fact_Num) and the number of claims (*_Fact_Total).
+
+    Args:
+        utterances_csv (str): Agent utterance rows (context_system.csv).
+        claims_csvs (dict): Extraction method (FHuo, FSong) -> claim-level CSV labeled by cw.py.
+        task_csv (str): Optional task_classified.csv for the Task_Classification column.
+        chunksize (int): Claims read at a time; utterance rows are also written in chunks of this size.
+        cache (bool): Also save the arrays as the bit-packed .cw_arrays.npz that analysis_engine.py loads
+            instead of parsing the array columns.
+
+    Returns:
+        str: output_csv
+    """
+    df = load_utterances(utterances_csv, task_csv)
+    utterance_index = _utterance_index(df['Conversation_Hash'], df['Turn_Num'])
+    print(f"📄 {len(df)} agent utterances from {utterances_csv}")
+    columns = {}
+    for method in EXTRACTION_METHODS:
+        arrays = claim_arrays(*read_claim_labels(claims_csvs[method], utterance_index, chunksize), num_utterances=len(df))
+        for cw, array in arrays.items():
+            columns[f'{method}_{cw}'] = array
+        print(f"📊 {method}: {int(arrays['Hassan'].offsets[-1])} claims in {(arrays['Hassan'].lengths() > 0).sum()} utterances")
+
+    # analysis.csv numbers the turns of a conversation 1, 2, 3, ...; the pipeline uses the utterance index 1, 3, 5, ...
+    df['Turn_Num'] = (utterance_index.get_level_values(1).to_numpy() + 1) // 2
+    output_columns = list(UTTERANCE_COLUMNS)
+    for method in EXTRACTION_METHODS:
+        for cw in CW_METHODS:
+            output_columns += [f'{method}_{cw}', f'{method}_{cw}_Fact_Num']
+        output_columns.append(f'{method}_Fact_Total')
+    for start in range(0, max(len(df), 1), chunksize):
+        stop = min(start + chunksize, len(df))
+        chunk = df.iloc[start:stop][UTTERANCE_COLUMNS].copy()
+        for method in EXTRACTION_METHODS:
+            for cw in CW_METHODS:
+                array = columns[f'{method}_{cw}']
+                offsets = array.offsets[start:stop + 1]
+                rows = RaggedBoolArray(array.values[offsets[0]:offsets[-1]], offsets - offsets[0])
+                chunk[f'{method}_{cw}'] = format_bool_arrays(rows)
+                chunk[f'{method}_{cw}_Fact_Num'] = rows.row_sums()
+            chunk[f'{method}_Fact_Total'] = np.diff(offsets)
+        chunk[output_columns].to_csv(output_csv, index=False, mode='w' if start == 0 else 'a', header=start == 0)
+    print(f"✅ Utterance-level CW arrays saved to: {output_csv}")
+    if cache:
+        # Written after the CSV so analysis_engine.load_analysis_data(cache=True) sees a fresh cache
+        save_bool_arrays(cache_path_for(output_csv), columns)
+        print(f"💾 Bit-packed arrays saved to: {cache_path_for(output_csv)}")
+    return output_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate claim-level CW labels into the utterance-level analysis.csv.")
+    parser.add_argument('--utterances_csv', required=True, help='Agent utterance rows (context_system.csv of preprocess_files_for_pipeline.py)')
+    parser.add_argument('--FHuo_csv', required=True, help='FHuo claims labeled by cw.py (Hassan and Majer columns)')
+    parser.add_argument('--FSong_csv', required=True, help='FSong claims labeled by cw.py (Hassan and Majer columns)')
+    parser.add_argument('--task_csv', default=None, help='task_classified.csv of task_classification.py (fills Task_Classification)')
+    parser.add_argument('--output_csv', default='analysis.csv', help='Where to save the utterance-level CSV (default: analysis.csv)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help=f'Claims read per chunk (default: {DEFAULT_CHUNKSIZE})')
+    parser.add_argument('--no_cache', action='store_true', help='Do not write the .cw_arrays.npz next to the output CSV')
+    args = parser.parse_args()
+    aggregate_utterances(args.utterances_csv, {'FHuo': args.FHuo_csv, 'FSong': args.FSong_csv}, args.output_csv,
+                         task_csv=args.task_csv, chunksize=args.chunksize, cache=not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
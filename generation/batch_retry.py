@@ -0,0 +1,228 @@
+import os
+import json
+import argparse
+from collections import Counter
+
+from openai_batch_utils import errors_path_for
+from request_writer import request_shard_paths
+from telemetry import instrumented, add_rows
+
+
+# Why a request has no usable result yet
+RETRY_REASONS = ('failed', 'expired', 'cancelled', 'missing', 'unparseable')
+# Batch API error codes of requests that were never run
+ERROR_CODE_REASONS = {'batch_expired': 'expired', 'batch_cancelled': 'cancelled'}
+
+
+def read_jsonl(path):
+    """Yields the JSON objects of a JSONL file (nothing if the file does not exist); blank and broken lines are skipped."""
+    if not path or not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def response_content(output):
+    """The message content of one batch output line, or None if it has none."""
+    try:
+        return output['response']['body']['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def classify_output(output, validate=None):
+    """
+    Returns None if a batch output (or error file) line holds a usable answer, otherwise its retry reason.
+
+    Args:
+        output (dict): One line of a results or error file (None counts as missing).
+        validate (callable): Stage-specific check of the answer text; False marks it unparseable.
+    """
+    if output is None:
+        return 'missing'
+    if output.get('error'):
+        return ERROR_CODE_REASONS.get(output['error'].get('code'), 'failed')
+    response = output.get('response') or {}
+    if response.get('status_code') != 200:
+        return 'failed'
+    content = response_content(output)
+    if content is None or not content.strip():
+        return 'unparseable'
+    if validate is not None and not validate(content):
+        return 'unparseable'
+    return None
+
+
+@instrumented('retry_collect')
+def collect_retry_ids(requests_path, results_path, validate=None):
+    """
+    Finds the requests of a batch (all shards of its request file) that have no usable result: failed or
+    expired/cancelled items of the error file, requests absent from both files, and answers the stage
+    cannot parse.
+
+    Returns:
+        dict: custom_id -> reason (see RETRY_REASONS), in request file order.
+    """
+    reasons = {}
+    usable = set()
+    for output in read_jsonl(errors_path_for(results_path)):
+        reasons[output.get('custom_id')] = classify_output(output, validate)
+    for output in read_jsonl(results_path):
+        reason = classify_output(output, validate)
+        if reason is None:
+            usable.add(output.get('custom_id'))
+        else:
+            reasons[output.get('custom_id')] = reason
+    retry_ids = {}
+    num_requests = 0
+    for path in request_shard_paths(requests_path):
+        for request in read_jsonl(path):
+            num_requests += 1
+            custom_id = request.get('custom_id')
+            if custom_id not in usable:
+                retry_ids[custom_id] = reasons.get(custom_id) or 'missing'
+    add_rows(num_requests)
+    return retry_ids
+
+
+def write_retry_requests(requests_path, retry_ids, output_path):
+    """Writes the requests of `retry_ids` (and only those, from every shard) to a new request file; returns how many were written."""
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for path in request_shard_paths(requests_path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    if json.loads(line).get('custom_id') in retry_ids:
+                        out.write(line if line.endswith('\n') else line + '\n')
+                        count += 1
+    print(f"💾 Retry request file with {count} requests saved to: {output_path}")
+    return count
+
+
+def _write_jsonl(path, outputs):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for output in outputs:
+            f.write(json.dumps(output, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, path)
+
+
+@instrumented('retry_merge')
+def merge_retry_results(results_path, retry_results_path, validate=None):
+    """
+    Merges the results of a retry batch into the main results and error files. Usable answers replace
+    the failed or unparseable entries of the same custom_id; items that failed again keep their latest
+    error. Merging the same retry twice changes nothing.
+
+    Returns:
+        int: Number of items recovered by this merge.
+    """
+    merged = {output.get('custom_id'): output for output in read_jsonl(results_path)}
+    errors = {output.get('custom_id'): output for output in read_jsonl(errors_path_for(results_path))}
+    recovered = 0
+    retry_outputs = [(output, False) for output in read_jsonl(retry_results_path)]
+    retry_outputs += [(output, True) for output in read_jsonl(errors_path_for(retry_results_path))]
+    for output, from_error_file in retry_outputs:
+        custom_id = output.get('custom_id')
+        previous = merged.get(custom_id)
+        if classify_output(output, validate) is None:
+            if classify_output(previous, validate) is not None:
+                recovered += 1
+            merged[custom_id] = output
+            errors.pop(custom_id, None)
+        elif previous is None or classify_output(previous, validate) is not None:
+            if from_error_file:
+                errors[custom_id] = output
+            else:
+                merged[custom_id] = output
+    add_rows(len(retry_outputs))
+    _write_jsonl(results_path, merged.values())
+    _write_jsonl(errors_path_for(results_path), errors.values())
+    if recovered:
+        print(f"🔁 Merged {os.path.basename(retry_results_path)}: {recovered} items recovered")
+    return recovered
+
+
+def retry_paths(results_path, round_num):
+    """Request, metadata and results files of retry round `round_num` of a results file."""
+    root, ext = os.path.splitext(results_path)
+    prefix = f"{root}_retry_{round_num:02d}"
+    return {
+        'requests': f"{prefix}_requests{ext}",
+        'metadata': f"{prefix}_metadata{ext}",
+        'results': f"{prefix}_results{ext}",
+    }
+
+
+def retry_failed_items(backend, requests_path, results_path, validate=None, max_retries=3, description="batch run", metadata=None):
+    """
+    Brings a batch to full coverage by resubmitting only the requests without a usable result.
+
+    Each round writes a minimal request file with those requests, submits it to `backend` and merges
+    its results into `results_path`. Rounds already on disk (from earlier runs of the script) are fetched
+    and merged first, so rerunning a stage script resumes where it stopped. `metadata` (the prompt template
+    and version) is recorded with every retry batch, as with the original one.
+
+    Returns:
+        bool: True when the results are final (every request answered, or `max_retries` rounds used),
+        False while a retry batch is still running (rerun the script later).
+    """
+    round_num = 0
+    while os.path.exists(retry_paths(results_path, round_num + 1)['metadata']):
+        round_num += 1
+        paths = retry_paths(results_path, round_num)
+        if not os.path.exists(paths['results']) and not backend.fetch(paths['metadata'], paths['results']):
+            print(f"⏳ Retry round {round_num} is still running.")
+            return False
+        merge_retry_results(results_path, paths['results'], validate)
+    while True:
+        retry_ids = collect_retry_ids(requests_path, results_path, validate)
+        if not retry_ids:
+            print("✅ Every request has a usable result")
+            return True
+        print(f"⚠️ {len(retry_ids)} requests without a usable result: {dict(Counter(retry_ids.values()))}")
+        if round_num >= max_retries:
+            print(f"⚠️ No retries left (--max_retries {max_retries}); mapping the results as they are.")
+            return True
+        round_num += 1
+        paths = retry_paths(results_path, round_num)
+        write_retry_requests(requests_path, retry_ids, paths['requests'])
+        backend.submit(paths['requests'], paths['metadata'], paths['results'], description=f"{description} (retry {round_num})",
+                       metadata=metadata)
+        if not backend.fetch(paths['metadata'], paths['results']):
+            print(f"🚀 Retry round {round_num} submitted.")
+            return False
+        merge_retry_results(results_path, paths['results'], validate)
+
+
+def add_retry_arguments(parser):
+    """Adds the --max_retries option shared by the LLM stages."""
+    parser.add_argument('--max_retries', type=int, default=3,
+                        help='Rounds of resubmitting failed, expired, missing or unparseable requests before mapping (default: 3, 0 = never)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coverage report of a batch: requests without a usable result, by reason.")
+    parser.add_argument('--requests', required=True, help='Batch request JSONL')
+    parser.add_argument('--results', required=True, help='Batch results JSONL (the error file is read from *_errors.jsonl next to it)')
+    parser.add_argument('--output_requests', default=None, help='Also write a retry request file with only those requests')
+    args = parser.parse_args()
+
+    retry_ids = collect_retry_ids(args.requests, args.results)
+    print(f"📊 Requests without a usable result: {len(retry_ids)}")
+    for reason, count in Counter(retry_ids.values()).most_common():
+        print(f"  {reason}: {count}")
+    if args.output_requests and retry_ids:
+        write_retry_requests(args.requests, retry_ids, args.output_requests)
+
+
+if __name__ == "__main__":
+    main()
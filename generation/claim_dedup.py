@@ -0,0 +1,234 @@
+import re
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from telemetry import instrumented, add_rows
+
+
+CLUSTER_COLUMNS = ['Claim_Cluster', 'Cluster_Size', 'Cluster_Representative']
+# Rows whose claims may share a cluster: the same utterance (identical context, so one CW label is valid
+# for all of them) or the whole file
+SCOPES = {'utterance': ['Conversation_Hash', 'Turn_Num'], 'global': []}
+
+_WORD = re.compile(r'\w+')
+# Shingle hashes processed per MinHash block (block x num_perm uint64 values in memory)
+_BLOCK_SHINGLES = 1_000_000
+
+
+def normalize_claim(text):
+    """Lowercases a claim and drops punctuation and repeated whitespace, so trivial variants compare equal."""
+    if not isinstance(text, str):
+        return ''
+    return ' '.join(_WORD.findall(text.lower()))
+
+
+def shingle_hashes(texts, k=5):
+    """
+    64-bit hashes of the character k-grams of every text, computed for all texts at once.
+
+    The texts are joined into one byte buffer and a polynomial hash of every k-byte window is built with
+    k shifted array operations; windows that cross a text boundary are dropped. Texts shorter than k
+    bytes get a single shingle (the whole text).
+
+    Returns:
+        tuple: (hashes uint64, offsets int64) with the shingles of text i in hashes[offsets[i]:offsets[i + 1]].
+    """
+    encoded = [text.encode('utf-8').ljust(k) for text in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+    starts = np.concatenate(([0], np.cumsum(lengths)))
+    num_windows = max(len(buffer) - k + 1, 0)
+    hashes = np.zeros(num_windows, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(k):
+            hashes = hashes * np.uint64(1099511628211) + buffer[j:j + num_windows]
+        # Final avalanche (splitmix64) so neighbouring windows give unrelated hashes
+        hashes ^= hashes >> np.uint64(31)
+        hashes *= np.uint64(0xBF58476D1CE4E5B9)
+        hashes ^= hashes >> np.uint64(29)
+    # Text i has windows starts[i] .. starts[i] + lengths[i] - k; the others cross a boundary
+    shingles_per_text = lengths - k + 1
+    offsets = np.concatenate(([0], np.cumsum(shingles_per_text)))
+    keep = np.arange(offsets[-1]) + np.repeat(starts[:-1] - offsets[:-1], shingles_per_text)
+    return hashes[keep], offsets
+
+
+def minhash_signatures(hashes, offsets, num_perm=64, seed=42):
+    """
+    MinHash signature of every shingle set: for each of `num_perm` multiply-shift hash functions, the
+    minimum hash over the set. Returns uint32 (num_sets, num_perm).
+    """
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    increments = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    num_sets = len(offsets) - 1
+    signatures = np.empty((num_sets, num_perm), dtype=np.uint32)
+    # Blocks end on set boundaries so every set is reduced in one piece
+    bounds = np.unique(np.searchsorted(offsets, np.arange(0, offsets[-1], _BLOCK_SHINGLES // num_perm + 1)))
+    bounds = np.concatenate((bounds, [num_sets]))
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        if first == last:
+            continue
+        block = hashes[offsets[first]:offsets[last]]
+        with np.errstate(over='ignore'):
+            permuted = (block[None, :] * multipliers[:, None] + increments[:, None]) >> np.uint64(32)
+        signatures[first:last] = np.minimum.reduceat(permuted, offsets[first:last] - offsets[first], axis=1).T
+    return signatures
+
+
+def _connected_components(num_nodes, left, right):
+    """Component id (smallest member) of every node, by min-label propagation with pointer jumping."""
+    labels = np.arange(num_nodes)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, left, labels[right])
+        np.minimum.at(labels, right, labels[left])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def cluster_claims(texts, groups=None, threshold=0.8, num_perm=64, bands=16, k=5, seed=42):
+    """
+    Clusters near-duplicate claims with MinHash + LSH in near-linear time.
+
+    Identical normalized texts are merged first. The MinHash signature of each distinct text is cut into
+    `bands` bands; texts sharing a band (within the same group) are candidates, and each candidate is
+    linked to the first text of its bucket if their signatures agree on at least `threshold` of the
+    hash functions (estimated Jaccard similarity of the shingle sets). Clusters are the connected components.
+
+    Args:
+        texts (sequence): Claim texts.
+        groups (sequence): Optional group key per claim; claims of different groups are never clustered.
+        threshold (float): Minimum estimated Jaccard similarity of linked claims.
+
+    Returns:
+        np.ndarray: int64 cluster id per claim, numbered in order of first appearance; empty claims get
+        their own cluster.
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+    normalized = pd.Series([normalize_claim(text) for text in texts], dtype=object)
+    text_codes, unique_texts = pd.factorize(normalized, sort=False)
+    group_codes = pd.factorize(pd.Series(groups, dtype=object).astype(str), sort=False)[0] \
+        if groups is not None else np.zeros(len(normalized), dtype=np.int64)
+
+    # One node per distinct (group, text); identical claims of a group are one node
+    node_keys = group_codes.astype(np.int64) * max(len(unique_texts), 1) + text_codes
+    node_codes, node_key_values = pd.factorize(node_keys, sort=False)
+    node_groups = node_key_values // max(len(unique_texts), 1)
+    node_texts = node_key_values % max(len(unique_texts), 1)
+
+    hashes, offsets = shingle_hashes(list(unique_texts), k=k)
+    signatures = minhash_signatures(hashes, offsets, num_perm=num_perm, seed=seed)[node_texts]
+    non_empty = np.asarray([bool(text) for text in unique_texts], dtype=bool)[node_texts]
+
+    rows_per_band = num_perm // bands
+    weights = np.random.default_rng(seed + 1).integers(1, 2 ** 63, size=rows_per_band + 1, dtype=np.uint64) | np.uint64(1)
+    candidates = np.flatnonzero(non_empty)
+    left, right = [], []
+    for band in range(bands):
+        band_values = signatures[candidates, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        with np.errstate(over='ignore'):
+            bucket_keys = (band_values * weights[:-1]).sum(axis=1, dtype=np.uint64)
+            bucket_keys ^= node_groups[candidates].astype(np.uint64) * weights[-1]
+        bucket_codes, bucket_ids = pd.factorize(bucket_keys, sort=False)
+        # Leader of a bucket: its first candidate (assigning in reverse keeps the first occurrence)
+        first = np.empty(len(bucket_ids), dtype=np.int64)
+        first[bucket_codes[::-1]] = np.arange(len(candidates))[::-1]
+        leaders = candidates[first[bucket_codes]]
+        linked = (candidates != leaders) & (node_groups[candidates] == node_groups[leaders])
+        left.append(candidates[linked])
+        right.append(leaders[linked])
+    left = np.concatenate(left) if left else np.zeros(0, dtype=np.int64)
+    right = np.concatenate(right) if right else np.zeros(0, dtype=np.int64)
+    if len(left):
+        pairs = np.unique(left * len(node_key_values) + right)
+        left, right = pairs // len(node_key_values), pairs % len(node_key_values)
+        similarity = (signatures[left] == signatures[right]).mean(axis=1)
+        left, right = left[similarity >= threshold], right[similarity >= threshold]
+
+    clusters = _connected_components(len(node_key_values), left, right)[node_codes]
+    # Empty claims are never merged, not even with each other
+    empty = np.flatnonzero(normalized.to_numpy() == '')
+    clusters[empty] = -1 - empty
+    return pd.factorize(clusters, sort=False)[0].astype(np.int64)
+
+
+def add_claim_clusters(df, scope='utterance', threshold=0.8, num_perm=64, bands=16, k=5, seed=42):
+    """
+    Adds Claim_Cluster, Cluster_Size and Cluster_Representative (the first claim of each cluster) to an
+    exploded claim DataFrame. Returns the DataFrame.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown scope: {scope} (use one of {list(SCOPES)})")
+    group_columns = SCOPES[scope]
+    groups = df[group_columns].astype(str).agg('_'.join, axis=1) if group_columns else None
+    clusters = cluster_claims(df['Individual_Statement'].to_numpy(dtype=object), groups, threshold=threshold,
+                              num_perm=num_perm, bands=bands, k=k, seed=seed)
+    sizes = np.bincount(clusters)
+    representative = np.zeros(len(df), dtype=bool)
+    representative[np.unique(clusters, return_index=True)[1]] = True
+    df['Claim_Cluster'] = clusters
+    df['Cluster_Size'] = sizes[clusters]
+    df['Cluster_Representative'] = representative
+    return df
+
+
+def broadcast_cluster_labels(df, column):
+    """Copies the label of each cluster's representative to the other claims of the cluster where they have none."""
+    labels = df[column].where(df[column].notna() & (df[column].astype(str) != ''))
+    representative_labels = labels.where(df['Cluster_Representative'].astype(str).str.upper() == 'TRUE')
+    by_cluster = representative_labels.groupby(df['Claim_Cluster']).transform('first')
+    df[column] = labels.fillna(by_cluster).fillna('')
+    return df
+
+
+@instrumented('claim_dedup')
+def dedup_claims_csv(input_csv, output_csv=None, scope='utterance', threshold=0.8, num_perm=64, bands=16, k=5, seed=42):
+    """
+    Clusters the near-duplicate claims of an exploded claim CSV (FHuo_exploded_statements.csv,
+    FSong_exploded_statements.csv) and saves it with the cluster columns (in place by default).
+    """
+    output_csv = output_csv or input_csv
+    df = pd.read_csv(input_csv)
+    add_rows(len(df))
+    print(f"📄 Loading claims CSV with {len(df)} rows")
+    start = time.perf_counter()
+    df = add_claim_clusters(df, scope=scope, threshold=threshold, num_perm=num_perm, bands=bands, k=k, seed=seed)
+    elapsed = time.perf_counter() - start
+    num_clusters = int(df['Cluster_Representative'].sum())
+    duplicates = len(df) - num_clusters
+    print(f"📊 {num_clusters} clusters for {len(df)} claims (scope: {scope}, threshold: {threshold})")
+    print(f"📊 Near-duplicates: {duplicates} ({duplicates / len(df) * 100 if len(df) else 0:.2f}% fewer CW requests)")
+    print(f"⏱️ Clustered in {elapsed:.1f}s")
+    df.to_csv(output_csv, index=False)
+    print(f"💾 Clustered CSV saved to: {output_csv}")
+    return output_csv
+
+
+def add_dedup_arguments(parser):
+    """Adds the near-duplicate clustering options shared by the extraction and CW scripts."""
+    parser.add_argument('--dedup_scope', default='utterance', choices=list(SCOPES),
+                        help='Cluster claims within an utterance (same context) or across the whole file (default: utterance)')
+    parser.add_argument('--dedup_threshold', type=float, default=0.8,
+                        help='Minimum estimated Jaccard similarity of character 5-gram shingles (default: 0.8)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate claim clustering (MinHash + LSH).")
+    parser.add_argument('--input_csv', required=True, help='Exploded claim CSV with Individual_Statement')
+    parser.add_argument('--output_csv', default=None, help='Where to save the clustered CSV (default: overwrite the input)')
+    add_dedup_arguments(parser)
+    parser.add_argument('--num_perm', type=int, default=64, help='MinHash functions per claim (default: 64)')
+    parser.add_argument('--bands', type=int, default=16, help='LSH bands; must divide num_perm (default: 16)')
+    args = parser.parse_args()
+    dedup_claims_csv(args.input_csv, args.output_csv, scope=args.dedup_scope, threshold=args.dedup_threshold,
+                     num_perm=args.num_perm, bands=args.bands)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,93 +12,178 @@ from openai import OpenAI
 import numpy as np
 import argparse
 
-from openai_batch_utils import submit_openai_batch, get_batch_statuses_from_metadata, fetch_batch_output, split_jsonl_file
+from request_writer import write_batch_requests, add_shard_arguments
+from prompt_registry import get_prompt
+from inference_backends import add_backend_arguments, backend_from_args
+from claim_dedup import add_dedup_arguments, dedup_claims_csv, broadcast_cluster_labels
+from batch_retry import add_retry_arguments, retry_failed_items
+from label_logprobs import with_logprobs, label_probabilities, add_probability_columns
+from cw_cascade import CW_LABELS, CASCADE_MODEL, cascade_paths, select_escalations, write_escalation_requests, merge_cascade_results, cascade_report
+from telemetry import instrumented, add_rows, add_usage
 
 
+# --prompt_mode -> template in prompts/
+PROMPT_TEMPLATES = {"Majer": "Majer", "Hassan": "Hassan", "Joint": "Hassan_Majer"}
+CW_LABEL_PATTERN = re.compile(r"\b(NFS|UFS|CFS)\b")
+# Columns filled by one --prompt_mode Joint pass, in the order of the JSON answer
+JOINT_COLUMNS = ("Hassan", "Majer")
+JOINT_KEY_PATTERNS = {column: re.compile(rf'["\']?{column}["\']?\s*:') for column in JOINT_COLUMNS}
+JOINT_LABEL_PATTERN = re.compile(r'["\']?(Hassan|Majer)["\']?\s*:\s*["\']?\s*(NFS|UFS|CFS)\b')
+
+
+def is_valid_CW_answer(content):
+    """True if the answer contains one of the NFS/UFS/CFS labels both prompts ask for."""
+    return CW_LABEL_PATTERN.search(content) is not None
+
+
+def parse_joint_CW_answer(content):
+    """
+    Reads the {"Hassan": "<label>", "Majer": "<label>"} answer of the joint prompt.
+
+    Returns:
+        dict: Column -> label for both JOINT_COLUMNS, or None if either label is missing.
+    """
+    labels = {}
+    try:
+        answer = json.loads(content.strip().strip('`').removeprefix('json'))
+        if isinstance(answer, dict):
+            for column in JOINT_COLUMNS:
+                match = CW_LABEL_PATTERN.search(str(answer.get(column, '')))
+                if match:
+                    labels[column] = match.group(1)
+    except json.JSONDecodeError:
+        # Near-JSON answers (single quotes, missing braces) still name each rubric before its label
+        for column, label in JOINT_LABEL_PATTERN.findall(content):
+            labels.setdefault(column, label)
+    return labels if len(labels) == len(JOINT_COLUMNS) else None
+
+
+def is_valid_joint_CW_answer(content):
+    """True if the joint answer holds a label for both rubrics."""
+    return parse_joint_CW_answer(content) is not None
+
+
+def _build_claim_request(row, prompt_mode, model_name, logprobs=False):
+    """Builds the CW batch request for one claim row, or None if the row is incomplete."""
+    claim = str(row["Individual_Statement"]).strip()
+    context_str = str(row["Context_String"]).strip()
+    conversation_hash = str(row["Conversation_Hash"]).strip()
+    turn_num = str(row["Turn_Num"]).strip()
+    statement_index = str(row["Statement_Index"]).strip() if "Statement_Index" in row else ""
+    if not claim or not context_str or not conversation_hash or not statement_index:
+        return None
+    template = get_prompt(PROMPT_TEMPLATES[prompt_mode])
+    prompt = template.render(factual_claim=claim, conversation_history=context_str)
+    request = {
+        "custom_id": f"{conversation_hash}_{turn_num}_{statement_index}",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model_name,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0,
+            "max_tokens": 1000
+        }
+    }
+    if prompt_mode == "Joint":
+        request["body"]["response_format"] = {"type": "json_object"}
+    if logprobs:
+        request["body"] = with_logprobs(request["body"])
+    return request
+
+
+@instrumented('CW_requests')
 def make_claim_batch_request_file(
-    input_csv_path, output_jsonl_path, prompt_mode='Majer', model_name="gpt-4.1-2025-04-14"
+    input_csv_path, output_jsonl_path, prompt_mode='Majer', model_name="gpt-4.1-2025-04-14", workers=1,
+    max_requests_per_shard=None, dedup=False, logprobs=False
 ):
     """
     Creates a batch request file for SIQing claims for OpenAI batch API.
     Each request uses Individual_Statement as the claim and Context_String as the context.
     custom_id is set to the conversation_hash column.
+    With dedup, only the representative of each near-duplicate cluster (claim_dedup.py) is requested.
+    With logprobs, the requests also ask for the logprobs of the answer tokens (label confidence).
+    With prompt_mode 'Joint', one request per claim asks for both the Hassan and the Majer label (JSON mode).
+    With max_requests_per_shard, the file is split into *_part_NN.jsonl shards (one batch each).
+    Returns the paths of the request files written.
     """
+    if prompt_mode not in PROMPT_TEMPLATES:
+        raise ValueError(f"Unknown prompt_mode: {prompt_mode}")
     df = pd.read_csv(input_csv_path)
+    add_rows(len(df))
     required_columns = ["Individual_Statement", "Context_String", "Conversation_Hash", "Statement_Index"]
     for col in required_columns:
         if col not in df.columns:
             raise ValueError(f"Missing required column: {col}")
-    with open(output_jsonl_path, "w", encoding="utf-8") as f:
-        for i, row in df.iterrows():
-            claim = str(row["Individual_Statement"]).strip()
-            context_str = str(row["Context_String"]).strip()
-            conversation_hash = str(row["Conversation_Hash"]).strip()
-            turn_num = str(row["Turn_Num"]).strip()
-            statement_index = str(row["Statement_Index"]).strip() if "Statement_Index" in row else ""
-            if not claim or not context_str or not conversation_hash or not statement_index:
-                continue
-            if prompt_mode == "Majer":
-                prompt = (
-                    "Classify the extracted claim from the conversation between a human and a language model into one of the following categories:\n"
-                    "- NFS: Non-Factual Sentence\n"
-                    "- UFS: Unimportant Factual Sentence\n"
-                    "- CFS: Check-worthy Factual Sentence\n\n"
-                    "Respond with only one label: NFS, UFS, or CFS. Do not provide any explanation.\n"
-                    f"Claim:\n{claim}\n"
-                    f"Context:{context_str}"
-                )
-            elif prompt_mode == "Hassan":
-                prompt = (
-                    "\nQuestion: Will the user be interested in knowing whether (part of) this sentence is true or false?\n"
-                    "- NFS: There is no factual claim in this sentence.\n"
-                    "- UFS: There is a factual claim but it is unimportant.\n"
-                    "- CFS: There is an important factual claim.\n\n"
-                    "Respond with only one label: NFS, UFS, or CFS. Do not provide any explanation.\n"
-                    "Sentence:\n"
-                    f"{claim}\n\n"
-                    "Context: \n"
-                    f"{context_str}\n"
-                )
-            else:
-                raise ValueError(f"Unknown prompt_mode: {prompt_mode}")
-            request_obj = {
-                "custom_id": f"{conversation_hash}_{turn_num}_{statement_index}",
-                "method": "POST",
-                "url": "/v1/chat/completions",
-                "body": {
-                    "model": model_name,
-                    "messages": [
-                        {"role": "system", "content": "You are a helpful assistant."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0,
-                    "max_tokens": 1000
-                }
-            }
-            f.write(json.dumps(request_obj, ensure_ascii=False) + "\n")
-    print(f"✅ CW batch request file saved to: {output_jsonl_path}")
+    if dedup:
+        if "Cluster_Representative" not in df.columns:
+            raise ValueError("Missing column Cluster_Representative; run claim_dedup.py on the input first")
+        num_claims = len(df)
+        df = df[df["Cluster_Representative"].astype(str).str.upper() == "TRUE"]
+        print(f"📊 Requesting {len(df)} cluster representatives instead of {num_claims} claims")
+    shards = write_batch_requests(
+        df, _build_claim_request, output_jsonl_path, workers=workers,
+        max_requests_per_shard=max_requests_per_shard,
+        prompt_mode=prompt_mode, model_name=model_name, logprobs=logprobs
+    )
+    template = get_prompt(PROMPT_TEMPLATES[prompt_mode])
+    print(f"✅ CW batch request file saved to: {output_jsonl_path} (prompt {template.name}@{template.version})")
+    return [shard['path'] for shard in shards]
+
+
+def add_soft_cw_scores(df):
+    """
+    Soft Intersection/Union of the Hassan and Majer labels from their CFS probabilities, treating the two
+    classifiers as independent: Intersection_P_CFS = P_H * P_M and Union_P_CFS = 1 - (1 - P_H) * (1 - P_M).
+    Thresholding them at 0.5 approximates the hard Intersection/Union; other thresholds trade precision for recall.
+    """
+    if "Hassan_P_CFS" not in df.columns or "Majer_P_CFS" not in df.columns:
+        return df
+    hassan = pd.to_numeric(df["Hassan_P_CFS"], errors="coerce")
+    majer = pd.to_numeric(df["Majer_P_CFS"], errors="coerce")
+    df["Intersection_P_CFS"] = (hassan * majer).round(4)
+    df["Union_P_CFS"] = (1 - (1 - hassan) * (1 - majer)).round(4)
+    return df
 
 
+@instrumented('CW_map_results')
 def add_CW_predictions_to_csv(
     original_csv_path: str,
     batch_results_jsonl_path: str,
     output_csv_path: str,
-    new_column_name: str = "Majer"
+    new_column_name: str = "Majer",
+    broadcast_clusters: bool = False,
+    model_column: str = None,
+    joint: bool = False
 ):
     """
     Maps OpenAI batch results from a JSONL file to the original CSV using conversation_hash and Statement_Index,
     and adds a new column with the prediction.
+    With joint (results of --prompt_mode Joint), both the Hassan and the Majer columns are filled from each
+    JSON answer instead, and new_column_name is not used.
+    With broadcast_clusters, claims without a prediction get the label of their cluster representative.
+    With model_column, the model that answered each claim is stored too (cascade runs mix two models).
+    If the results carry logprobs (--logprobs), the label probabilities go to <column>_P_NFS/_P_UFS/_P_CFS,
+    and the soft Intersection/Union scores are added once both Hassan and Majer have them.
     """
     df = pd.read_csv(original_csv_path)
+    add_rows(len(df))
     df['Statement_Index'] = df['Statement_Index'].astype(str)
     df['Conversation_Hash'] = df['Conversation_Hash'].astype(str)
     df['Turn_Num'] =  df['Turn_Num'].astype(str)
-    predictions = {}
+    label_columns = list(JOINT_COLUMNS) if joint else [new_column_name]
+    predictions = {column: {} for column in label_columns}
+    probabilities = {column: {} for column in label_columns}
+    models = {}
     with open(batch_results_jsonl_path, "r", encoding="utf-8") as f:
         for line in f:
             if not line.strip():
                 continue
             item = json.loads(line)
+            add_usage(item)
             custom_id = item.get("custom_id")
             if not custom_id or "response" not in item:
                 continue
@@ -108,22 +193,112 @@ def add_CW_predictions_to_csv(
             statement_index = parts[-1]
             turn_num = parts[-2]
             conversation_hash = "_".join(parts[:-2])
+            key = (conversation_hash, turn_num, statement_index)
             answer = (
                 item["response"]["body"]["choices"][0]["message"]["content"].strip()
                 if "body" in item["response"] and "choices" in item["response"]["body"]
                 else ""
             )
-            predictions[(conversation_hash, turn_num, statement_index)] = answer
-    df[new_column_name] = [
-        predictions.get((str(row['Conversation_Hash']), str(row['Turn_Num']), str(row['Statement_Index'])), "")
+            answers = (parse_joint_CW_answer(answer) or {}) if joint else {new_column_name: answer}
+            models[key] = item["response"].get("body", {}).get("model", "")
+            for column in label_columns:
+                predictions[column][key] = answers.get(column, "")
+                # Each joint label is read after its own key, so the probabilities follow the labels in any key order
+                label_probs = label_probabilities(item, CW_LABELS, after=JOINT_KEY_PATTERNS[column] if joint else None)
+                if label_probs is not None:
+                    probabilities[column][key] = [label_probs[label] for label in CW_LABELS]
+    keys = [
+        (str(row['Conversation_Hash']), str(row['Turn_Num']), str(row['Statement_Index']))
         for _, row in df.iterrows()
     ]
-    num_predicted = (df[new_column_name] != "").sum()
-    num_empty = (df[new_column_name] == "").sum()
-    print(f"Number of rows with a prediction in '{new_column_name}': {num_predicted}")
-    print(f"Number of rows with EMPTY value in '{new_column_name}': {num_empty}")
+    for column in label_columns:
+        df[column] = [predictions[column].get(key, "") for key in keys]
+    if model_column:
+        df[model_column] = [models.get(key, "") for key in keys]
+    probability_columns = []
+    for column in label_columns:
+        if not probabilities[column]:
+            continue
+        columns = add_probability_columns(df, column, CW_LABELS, probabilities[column], keys)
+        probability_columns += columns
+        print(f"Label probabilities for {len(probabilities[column])} claims saved to {', '.join(columns)}")
+    if broadcast_clusters and "Claim_Cluster" in df.columns:
+        num_requested = (df[label_columns[0]] != "").sum()
+        for column in label_columns + ([model_column] if model_column else []):
+            broadcast_cluster_labels(df, column)
+        representative = df["Cluster_Representative"].astype(str).str.upper() == "TRUE"
+        for column in probability_columns:
+            df[column] = df[column].fillna(df[column].where(representative).groupby(df["Claim_Cluster"]).transform("first"))
+        print(f"Broadcast cluster labels to {(df[label_columns[0]] != '').sum() - num_requested} near-duplicate claims")
+    add_soft_cw_scores(df)
+    for column in label_columns:
+        num_predicted = (df[column] != "").sum()
+        num_empty = (df[column] == "").sum()
+        print(f"Number of rows with a prediction in '{column}': {num_predicted}")
+        print(f"Number of rows with EMPTY value in '{column}': {num_empty}")
     df.to_csv(output_csv_path, index=False, encoding='utf-8')
-    print(f"✅ Updated CSV with '{new_column_name}' saved to: {output_csv_path}")
+    print(f"✅ Updated CSV with '{', '.join(label_columns)}' saved to: {output_csv_path}")
+
+
+def run_CW_cascade(backend, input_csv, output_dir, column_name, results_path, prompt_mode='Majer',
+                   model_name="gpt-4.1-2025-04-14", cascade_model=CASCADE_MODEL, threshold=0.9,
+                   workers=1, dedup=False, max_retries=3, max_requests_per_shard=None):
+    """
+    Two-pass CW labeling: `cascade_model` labels every claim with logprobs, and only the claims whose label
+    confidence is below `threshold` are escalated to `model_name`. Each pass is a batch of its own, so with
+    the Batch API the script is rerun until both are done (like the single pass).
+
+    Returns:
+        bool: True once the merged results are in `results_path` (and the cost report is saved),
+        False while a pass is still running.
+    """
+    paths = cascade_paths(output_dir, column_name)
+    prompt_metadata = get_prompt(PROMPT_TEMPLATES[prompt_mode]).metadata()
+    if not os.path.exists(paths['cascade_metadata']):
+        print(f"\n[cascade 1/2] Labeling every claim with {cascade_model}...")
+        make_claim_batch_request_file(
+            input_csv_path=input_csv,
+            output_jsonl_path=paths['cascade_requests'],
+            prompt_mode=prompt_mode,
+            model_name=cascade_model,
+            workers=workers,
+            max_requests_per_shard=max_requests_per_shard,
+            dedup=dedup,
+            logprobs=True
+        )
+        backend.submit(paths['cascade_requests'], metadata_path=paths['cascade_metadata'], results_path=paths['cascade_results'],
+                       description=f"CW {column_name} cascade", metadata=prompt_metadata)
+    if not os.path.exists(paths['cascade_results']) and not backend.fetch(paths['cascade_metadata'], paths['cascade_results']):
+        return False
+    if not retry_failed_items(backend, paths['cascade_requests'], paths['cascade_results'], validate=is_valid_CW_answer,
+                              max_retries=max_retries, description=f"CW {column_name} cascade",
+                              metadata=prompt_metadata):
+        return False
+
+    if not os.path.exists(paths['escalated_metadata']) and not os.path.exists(paths['escalated_results']):
+        print(f"\n[cascade 2/2] Escalating uncertain claims to {model_name}...")
+        escalations = select_escalations(paths['cascade_results'], threshold, validate=is_valid_CW_answer)
+        write_escalation_requests(paths['cascade_requests'], escalations, paths['escalated_requests'], model_name)
+        if escalations:
+            backend.submit(paths['escalated_requests'], metadata_path=paths['escalated_metadata'], results_path=paths['escalated_results'],
+                           description=f"CW {column_name} escalated", metadata=prompt_metadata)
+        else:
+            open(paths['escalated_results'], 'w').close()
+    if not os.path.exists(paths['escalated_results']) and not backend.fetch(paths['escalated_metadata'], paths['escalated_results']):
+        return False
+    if not retry_failed_items(backend, paths['escalated_requests'], paths['escalated_results'], validate=is_valid_CW_answer,
+                              max_retries=max_retries, description=f"CW {column_name} escalated",
+                              metadata=prompt_metadata):
+        return False
+
+    merge_cascade_results(paths['cascade_results'], paths['escalated_results'], results_path, validate=is_valid_CW_answer)
+    report = cascade_report(paths, strong_model=model_name, threshold=threshold)
+    with open(paths['report'], 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"💰 Escalated {report['escalated']}/{report['claims']} claims; estimated cost ${report['cost_cascade_usd']:.2f} "
+          f"vs ${report['cost_strong_only_usd']:.2f} strong-only ({report['cost_saved_share']:.1%} saved)")
+    print(f"💾 Cascade report saved to: {paths['report']}")
+    return True
 
 
 def main():
@@ -131,65 +306,131 @@ def main():
     parser.add_argument('--input_csv', type=str, required=True, help='Input CSV file (exploded claims)')
     parser.add_argument('--output_dir', type=str, required=False, help='Output directory for all results (defaults to input CSV directory)')
     parser.add_argument('--model_name', type=str, default='gpt-4.1-2025-04-14', help='OpenAI model name (default: gpt-4.1-2025-04-14)')
-    parser.add_argument('--prompt_mode', type=str, default='Majer', choices=['Majer', 'Hassan'], help='Prompt mode (default: Majer)')
-    parser.add_argument('--column_name', type=str, default='Majer', help='Column name for predictions in output CSV (default: Majer)')
+    parser.add_argument('--prompt_mode', type=str, default='Majer', choices=['Majer', 'Hassan', 'Joint'],
+                        help='Prompt mode (default: Majer); Joint asks for the Hassan and Majer labels in one request per claim')
+    parser.add_argument('--column_name', type=str, default='Majer', help='Column name for predictions in output CSV (default: Majer; Joint always fills Hassan and Majer)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for writing the request file (default: 1, 0 = all cores)')
+    parser.add_argument('--dedup', action='store_true', help='Classify one claim per near-duplicate cluster and copy its label to the others')
+    parser.add_argument('--logprobs', action='store_true', help='Request label logprobs and store the NFS/UFS/CFS probabilities in <column_name>_P_* columns')
+    parser.add_argument('--cascade', action='store_true', help='Label every claim with --cascade_model first and escalate only uncertain claims to --model_name')
+    parser.add_argument('--cascade_model', type=str, default=CASCADE_MODEL, help=f'First-pass model of the cascade (default: {CASCADE_MODEL})')
+    parser.add_argument('--cascade_threshold', type=float, default=0.9, help='Escalate claims whose first-pass label probability is below this (default: 0.9)')
+    add_dedup_arguments(parser)
+    add_shard_arguments(parser)
+    add_backend_arguments(parser)
+    add_retry_arguments(parser)
     args = parser.parse_args()
+    if args.cascade and args.prompt_mode == 'Joint':
+        parser.error("--cascade labels one rubric per request; use --prompt_mode Hassan or Majer")
+    backend = backend_from_args(args)
+    joint = args.prompt_mode == 'Joint'
+    # The joint batch files are named after the mode, so they never mix with a single-rubric run's files
+    file_tag = 'Joint' if joint else args.column_name
+    validate = is_valid_joint_CW_answer if joint else is_valid_CW_answer
+    prompt_metadata = get_prompt(PROMPT_TEMPLATES[args.prompt_mode]).metadata()
 
     # Use input CSV directory as default output directory if not specified
     output_dir = args.output_dir if args.output_dir else os.path.dirname(args.input_csv)
     print(f"📁 Using output directory: {output_dir}")
     
     os.makedirs(output_dir, exist_ok=True)
-    batch_requests_path = os.path.join(output_dir, f'batch_requests_CW_{args.column_name}.jsonl')
-    batch_metadata_path = os.path.join(output_dir, f'batch_metadata_CW_{args.column_name}.jsonl')
-    batch_results_path = os.path.join(output_dir, f'batch_results_CW_{args.column_name}.jsonl')
+    batch_requests_path = os.path.join(output_dir, f'batch_requests_CW_{file_tag}.jsonl')
+    batch_metadata_path = os.path.join(output_dir, f'batch_metadata_CW_{file_tag}.jsonl')
+    batch_results_path = os.path.join(output_dir, f'batch_results_CW_{file_tag}.jsonl')
 
-    if os.path.exists(batch_metadata_path):
-        print("Batch metadata found.")
-        if os.path.exists(batch_results_path):
-            print("Results found. Mapping predictions to original CSV...")
+    def retry():
+        return retry_failed_items(backend, batch_requests_path, batch_results_path, validate=validate,
+                                  max_retries=args.max_retries, description=f"CW {file_tag}",
+                                  metadata=prompt_metadata)
+
+    if args.cascade:
+        if args.dedup and "Claim_Cluster" not in pd.read_csv(args.input_csv, nrows=0).columns:
+            dedup_claims_csv(args.input_csv, scope=args.dedup_scope, threshold=args.dedup_threshold)
+        if run_CW_cascade(backend, args.input_csv, output_dir, args.column_name, batch_results_path,
+                          prompt_mode=args.prompt_mode, model_name=args.model_name, cascade_model=args.cascade_model,
+                          threshold=args.cascade_threshold, workers=args.workers, dedup=args.dedup, max_retries=args.max_retries,
+                          max_requests_per_shard=args.max_requests_per_shard):
+            print("Mapping cascade predictions to original CSV...")
             add_CW_predictions_to_csv(
                 original_csv_path=args.input_csv,
                 batch_results_jsonl_path=batch_results_path,
                 output_csv_path=args.input_csv,
-                new_column_name=args.column_name
+                new_column_name=args.column_name,
+                broadcast_clusters=args.dedup,
+                model_column=f"{args.column_name}_Model"
             )
             print(f"\n🎉 Mapping complete! All outputs saved in: {output_dir}")
         else:
-            print("Checking batch status...")
-            statuses = get_batch_statuses_from_metadata(batch_metadata_path)
-            if statuses and statuses[0]['status'] == 'completed':
-                print("Fetching batch results from OpenAI...")
-                fetch_batch_output(
-                    metadata_path=batch_metadata_path,
-                    save_path=batch_results_path
+            print("Cascade batch submitted or running. Please rerun this script later to fetch results.")
+        return
+
+    if os.path.exists(batch_metadata_path):
+        print("Batch metadata found.")
+        if os.path.exists(batch_results_path):
+            if retry():
+                print("Results found. Mapping predictions to original CSV...")
+                add_CW_predictions_to_csv(
+                    original_csv_path=args.input_csv,
+                    batch_results_jsonl_path=batch_results_path,
+                    output_csv_path=args.input_csv,
+                    new_column_name=args.column_name,
+                    broadcast_clusters=args.dedup,
+                    joint=joint
                 )
+                print(f"\n🎉 Mapping complete! All outputs saved in: {output_dir}")
+            else:
+                print("You may need to rerun this script later to process results.")
+        else:
+            print("Checking batch status...")
+            if backend.fetch(batch_metadata_path, batch_results_path) and retry():
                 print("Results fetched. Mapping predictions to original CSV...")
                 add_CW_predictions_to_csv(
                     original_csv_path=args.input_csv,
                     batch_results_jsonl_path=batch_results_path,
                     output_csv_path=args.input_csv,
-                    new_column_name=args.column_name
+                    new_column_name=args.column_name,
+                    broadcast_clusters=args.dedup,
+                    joint=joint
                 )
                 print(f"\n🎉 Mapping complete! All outputs saved in: {output_dir}")
             else:
-                print(f"Batch not completed yet. Status: {statuses[0]['status'] if statuses else 'Unknown'}")
                 print("You may need to rerun this script later to process results.")
     else:
         print("No batch metadata found. Creating and submitting new batch...")
+        if args.dedup and "Claim_Cluster" not in pd.read_csv(args.input_csv, nrows=0).columns:
+            print(f"\n[0/4] Clustering near-duplicate claims...")
+            dedup_claims_csv(args.input_csv, scope=args.dedup_scope, threshold=args.dedup_threshold)
         print(f"\n[1/4] Creating batch request JSONL...")
         make_claim_batch_request_file(
             input_csv_path=args.input_csv,
             output_jsonl_path=batch_requests_path,
             prompt_mode=args.prompt_mode,
-            model_name=args.model_name
+            model_name=args.model_name,
+            workers=args.workers,
+            max_requests_per_shard=args.max_requests_per_shard,
+            dedup=args.dedup,
+            logprobs=args.logprobs
         )
-        print(f"\n[2/4] Submitting batch to OpenAI...")
-        submit_openai_batch(
+        print(f"\n[2/4] Submitting batch to the {backend.name} backend...")
+        backend.submit(
             batch_requests_path,
-            metadata_path=batch_metadata_path
+            metadata_path=batch_metadata_path,
+            results_path=batch_results_path,
+            metadata=prompt_metadata
         )
-        print("Batch submitted. Please rerun this script later to fetch results.")
+        if backend.fetch(batch_metadata_path, batch_results_path) and retry():
+            print(f"\n[3/4] Mapping predictions to original CSV...")
+            add_CW_predictions_to_csv(
+                original_csv_path=args.input_csv,
+                batch_results_jsonl_path=batch_results_path,
+                output_csv_path=args.input_csv,
+                new_column_name=args.column_name,
+                broadcast_clusters=args.dedup,
+                joint=joint
+            )
+            print(f"\n🎉 Mapping complete! All outputs saved in: {output_dir}")
+        else:
+            print("Batch submitted. Please rerun this script later to fetch results.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from batch_retry import read_jsonl, classify_output
+from telemetry import instrumented, add_rows, estimate_cost
+from label_logprobs import label_probabilities
+from request_writer import request_shard_paths
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analysis'))
+from cw_metrics import METRICS, confusion_matrices, metrics_from_counts
+
+
+HUMAN_ANNOTATIONS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'annotations', 'human_annotations.csv')
+CW_LABELS = ['NFS', 'UFS', 'CFS']
+# First pass of the cascade (the model labeling_math_and_code.py uses)
+CASCADE_MODEL = "gpt-4.1-mini-2025-04-14"
+
+
+def cascade_paths(output_dir, column_name):
+    """Files of the two cascade passes of one cw.py column, next to the usual batch_*_CW_<column> files."""
+    paths = {}
+    for step in ('cascade', 'escalated'):
+        for kind in ('requests', 'metadata', 'results'):
+            paths[f'{step}_{kind}'] = os.path.join(output_dir, f'batch_{kind}_CW_{column_name}_{step}.jsonl')
+    paths['report'] = os.path.join(output_dir, f'cascade_report_CW_{column_name}.json')
+    return paths
+
+
+@instrumented('cascade_select')
+def select_escalations(results_path, threshold, validate=None):
+    """
+    Picks the first-pass answers to send to the strong model: those whose label probability (from the
+    answer's logprobs) is below `threshold`, and those without a usable answer or logprobs.
+
+    Returns:
+        dict: custom_id -> confidence of the first-pass label (None without one), for escalated items only.
+    """
+    escalations = {}
+    num_outputs = 0
+    for output in read_jsonl(results_path):
+        num_outputs += 1
+        probabilities = label_probabilities(output, CW_LABELS) if classify_output(output, validate) is None else None
+        confidence = max(probabilities.values()) if probabilities else None
+        if confidence is None or confidence < threshold:
+            escalations[output.get('custom_id')] = confidence
+    add_rows(num_outputs)
+    without_logprobs = sum(confidence is None for confidence in escalations.values())
+    print(f"📊 Escalating {len(escalations)}/{num_outputs} claims below confidence {threshold}"
+          + (f" ({without_logprobs} without a usable answer or logprobs)" if without_logprobs else ""))
+    return escalations
+
+
+def write_escalation_requests(requests_path, custom_ids, output_path, model_name):
+    """Writes strong-model copies (without the logprobs options) of the first-pass requests of `custom_ids`, from every shard."""
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for path in request_shard_paths(requests_path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    request = json.loads(line)
+                    if request.get('custom_id') not in custom_ids:
+                        continue
+                    body = {key: value for key, value in request['body'].items() if key not in ('logprobs', 'top_logprobs')}
+                    request['body'] = {**body, 'model': model_name}
+                    out.write(json.dumps(request, ensure_ascii=False) + '\n')
+                    count += 1
+    print(f"💾 Escalation request file with {count} requests saved to: {output_path}")
+    return count
+
+
+@instrumented('cascade_merge')
+def merge_cascade_results(cascade_results_path, escalated_results_path, output_path, validate=None):
+    """
+    Writes the final results of the cascade: first-pass answers, replaced by the strong model's answer
+    wherever it has a usable one. Returns the number of replaced answers.
+    """
+    merged = {output.get('custom_id'): output for output in read_jsonl(cascade_results_path)}
+    replaced = 0
+    for output in read_jsonl(escalated_results_path):
+        if classify_output(output, validate) is None:
+            merged[output.get('custom_id')] = output
+            replaced += 1
+    add_rows(len(merged))
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for output in merged.values():
+            f.write(json.dumps(output, ensure_ascii=False) + '\n')
+    return replaced
+
+
+def usage_by_model(results_path):
+    """Requests and prompt/completion tokens per model in a batch results file."""
+    usage = {}
+    for output in read_jsonl(results_path):
+        body = (output.get('response') or {}).get('body') or {}
+        if not body.get('usage'):
+            continue
+        counts = usage.setdefault(body.get('model') or 'unknown', {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+        counts['requests'] += 1
+        counts['prompt_tokens'] += int(body['usage'].get('prompt_tokens') or 0)
+        counts['completion_tokens'] += int(body['usage'].get('completion_tokens') or 0)
+    return usage
+
+
+def cascade_report(paths, strong_model, threshold, batch_discount=0.5):
+    """
+    Token usage and estimated cost of the cascade, against running the strong model on every claim.
+    The strong-only cost prices the first pass's tokens (same prompts, same one-label answers) at the
+    strong model's rates.
+    """
+    cascade_usage = usage_by_model(paths['cascade_results'])
+    escalated_usage = usage_by_model(paths['escalated_results'])
+    all_claims = {key: sum(counts[key] for counts in cascade_usage.values()) for key in ('requests', 'prompt_tokens', 'completion_tokens')}
+    cost_cascade = estimate_cost(cascade_usage, batch_discount) + estimate_cost(escalated_usage, batch_discount)
+    cost_strong_only = estimate_cost({strong_model: all_claims}, batch_discount)
+    escalated = sum(counts['requests'] for counts in escalated_usage.values())
+    return {
+        'threshold': threshold,
+        'strong_model': strong_model,
+        'claims': all_claims['requests'],
+        'escalated': escalated,
+        'escalated_share': escalated / all_claims['requests'] if all_claims['requests'] else 0.0,
+        'usage_first_pass': cascade_usage,
+        'usage_escalated': escalated_usage,
+        'cost_cascade_usd': cost_cascade,
+        'cost_strong_only_usd': cost_strong_only,
+        'cost_saved_share': 1 - cost_cascade / cost_strong_only if cost_strong_only else 0.0,
+    }
+
+
+def _is_check_worthy(labels):
+    return labels.fillna('').astype(str).str.upper().str.contains('CFS', regex=False).to_numpy()
+
+
+def evaluate(predictions_csv, column, baseline='Majer', report_path=None, gold_csv=HUMAN_ANNOTATIONS_CSV):
+    """
+    Compares cascade labels with the strong-model labels released in human_annotations.csv, against the
+    human gold labels: precision/recall/F1/kappa per claim extraction method, the F1 lost and, with the
+    cascade report, the cost saved.
+
+    Args:
+        predictions_csv (str): cw.py output with the cascade labels in `column`; claims are matched to the
+            annotations on Conversation_Hash and Individual_Statement.
+        baseline (str): Strong-model column of the annotations (`Hassan` or `Majer`; its `_Binary` flag is used).
+
+    Returns:
+        list: One dict per method (and 'All').
+    """
+    gold_df = pd.read_csv(gold_csv, dtype=str, keep_default_na=False)
+    predictions = pd.read_csv(predictions_csv, usecols=['Conversation_Hash', 'Individual_Statement', column], dtype=str)
+    predictions = predictions.drop_duplicates(['Conversation_Hash', 'Individual_Statement'])
+    df = gold_df.merge(predictions, on=['Conversation_Hash', 'Individual_Statement'], how='inner')
+    print(f"📊 {len(df)}/{len(gold_df)} annotated claims found in {predictions_csv}")
+    report = None
+    if report_path and os.path.exists(report_path):
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    rows = []
+    groups = [(method, group) for method, group in df.groupby('Claim_Extr_Method', sort=False)] + [('All', df)]
+    for method, group in groups:
+        gold = group['Gold'].str.upper().eq('TRUE').to_numpy()
+        classifiers = np.vstack([group[f'{baseline}_Binary'].str.upper().eq('TRUE').to_numpy(), _is_check_worthy(group[column])])
+        metrics = metrics_from_counts(*confusion_matrices(classifiers, gold).T)
+        row = {'method': method, 'rows': len(group)}
+        for i, name in enumerate(('strong', 'cascade')):
+            row.update({f'{metric}_{name}': float(metrics[metric][i]) for metric in METRICS})
+        row['f1_lost'] = row['f1_strong'] - row['f1_cascade']
+        row['label_agreement'] = float((classifiers[0] == classifiers[1]).mean()) if len(group) else 0.0
+        rows.append(row)
+    print(pd.DataFrame(rows).round(4).to_string(index=False))
+    if report:
+        print(f"\n💰 Escalated {report['escalated']}/{report['claims']} claims ({report['escalated_share']:.1%}) at threshold {report['threshold']}")
+        print(f"💰 Estimated cost ${report['cost_cascade_usd']:.2f} vs ${report['cost_strong_only_usd']:.2f} strong-only: "
+              f"{report['cost_saved_share']:.1%} saved for {rows[-1]['f1_lost']:+.4f} F1 lost")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a cw.py --cascade run: cost saved vs. F1 lost on the human annotations.")
+    parser.add_argument('--predictions_csv', required=True, help='cw.py output CSV with the cascade labels')
+    parser.add_argument('--column', required=True, help='Column with the cascade labels (--column_name of cw.py)')
+    parser.add_argument('--baseline', default='Majer', choices=['Majer', 'Hassan'], help='Strong-model labels of the annotations to compare with (default: Majer)')
+    parser.add_argument('--report', default=None, help='cascade_report_CW_<column>.json written by cw.py --cascade')
+    parser.add_argument('--gold_csv', default=HUMAN_ANNOTATIONS_CSV, help='Human annotations CSV (default: annotations/human_annotations.csv)')
+    args = parser.parse_args()
+    evaluate(args.predictions_csv, args.column, baseline=args.baseline, report_path=args.report, gold_csv=args.gold_csv)
+
+
+if __name__ == "__main__":
+    main()
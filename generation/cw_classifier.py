@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+# Reuse the paper's metric definitions so numbers are comparable with effectiveness_automatic_check_worthiness.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analysis'))
+from analysis_engine import calculate_kappa, calculate_precision_recall_f1
+from claims_index import is_check_worthy
+
+
+HUMAN_ANNOTATIONS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'annotations', 'human_annotations.csv')
+TARGETS = ['Hassan', 'Majer', 'Intersection', 'Union']
+
+
+def distillation_targets(df, target):
+    """
+    Builds the binary training target from the LLM label columns of a cw.py output CSV (NFS/UFS/CFS)
+    or of annotations/claims.csv (True/False), with claims_index.is_check_worthy.
+    Intersection/Union need both the Hassan and Majer columns; NA where a needed label is missing.
+    """
+    if target in ('Hassan', 'Majer'):
+        return is_check_worthy(df[target])
+    hassan = is_check_worthy(df['Hassan'])
+    majer = is_check_worthy(df['Majer'])
+    return (hassan & majer) if target == 'Intersection' else (hassan | majer)
+
+
+def gold_claim_keys(gold_csv=HUMAN_ANNOTATIONS_CSV):
+    """(Conversation_Hash, Individual_Statement) of the human-annotated claims, held out of training."""
+    gold = pd.read_csv(gold_csv, usecols=['Conversation_Hash', 'Individual_Statement'], dtype=str, keep_default_na=False)
+    return pd.MultiIndex.from_arrays([gold['Conversation_Hash'].str.strip(), gold['Individual_Statement'].str.strip()])
+
+
+def build_model(max_features=200000, C=4.0):
+    """TF-IDF over word uni/bi-grams of the claim text followed by a class-balanced logistic regression."""
+    return Pipeline([
+        ('tfidf', TfidfVectorizer(
+            ngram_range=(1, 2), min_df=2, max_features=max_features, sublinear_tf=True,
+            strip_accents='unicode', dtype=np.float32,
+        )),
+        ('clf', LogisticRegression(C=C, class_weight='balanced', max_iter=2000, solver='liblinear')),
+    ])
+
+
+def train(train_csvs, model_path, target='Union', max_features=200000, C=4.0, gold_csv=HUMAN_ANNOTATIONS_CSV):
+    """
+    Distils the LLM check-worthiness labels of one or more cw.py output CSVs into a compact classifier.
+
+    Args:
+        train_csvs (list): Claim-level CSVs with Individual_Statement and Hassan/Majer label columns.
+        model_path (str): Where to save the fitted model (joblib).
+        target (str): Which LLM labelling to imitate: Hassan, Majer, Intersection or Union.
+        gold_csv (str): Human annotations used by `evaluate`; their claims are dropped from the training
+            data so the evaluation is on unseen claims (None keeps them).
+
+    Returns:
+        Pipeline: The fitted model.
+    """
+    gold_keys = gold_claim_keys(gold_csv) if gold_csv else None
+    frames = []
+    for path in train_csvs:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        required = ['Individual_Statement'] + (['Hassan', 'Majer'] if target in ('Intersection', 'Union') else [target])
+        if gold_keys is not None:
+            required.append('Conversation_Hash')
+        missing = [col for col in required if col not in df.columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns {missing}; run cw.py for both prompt modes first.")
+        df = df[df['Individual_Statement'].str.strip() != '']
+        if gold_keys is not None:
+            keys = pd.MultiIndex.from_arrays([df['Conversation_Hash'].str.strip(), df['Individual_Statement'].str.strip()])
+            held_out = keys.isin(gold_keys)
+            print(f"📄 {path}: {int(held_out.sum())} gold claims held out of training")
+            df = df[~held_out]
+        labels = distillation_targets(df, target)
+        frames.append(pd.DataFrame({
+            'text': df['Individual_Statement'][labels.notna()],
+            'label': labels[labels.notna()].astype(bool),
+        }))
+    data = pd.concat(frames, ignore_index=True)
+    if data['label'].nunique() < 2:
+        raise ValueError(f"Every training claim has the same {target} label; check the label columns of {train_csvs}")
+    print(f"📄 Training on {len(data)} claims from {len(train_csvs)} file(s), target={target}")
+    print(f"📊 Check-worthy share: {data['label'].mean() * 100:.2f}%")
+    model = build_model(max_features=max_features, C=C)
+    start = time.perf_counter()
+    model.fit(data['text'].to_numpy(), data['label'].to_numpy())
+    print(f"✅ Trained in {time.perf_counter() - start:.1f}s ({len(model.named_steps['tfidf'].vocabulary_)} features)")
+    model.target_ = target
+    os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+    joblib.dump(model, model_path)
+    print(f"💾 Model saved to: {model_path}")
+    return model
+
+
+def predict_proba(model, texts, batch_size=100000):
+    """Vectorized batch inference: returns P(check-worthy) for every text, processing `batch_size` texts at a time."""
+    texts = pd.Series(texts).fillna('').astype(str).to_numpy()
+    probabilities = np.empty(len(texts), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        probabilities[start:start + batch_size] = model.predict_proba(texts[start:start + batch_size])[:, 1]
+    return probabilities
+
+
+def predict_csv(model_path, input_csv, output_csv, column_name='CW_Classifier', threshold=0.5, chunksize=200000):
+    """
+    Labels every claim of a (possibly very large) claim-level CSV, streaming it in chunks.
+
+    Adds `{column_name}` (bool) and `{column_name}_Prob` (P(check-worthy)) columns.
+    """
+    model = joblib.load(model_path)
+    total = 0
+    start = time.perf_counter()
+    for i, chunk in enumerate(pd.read_csv(input_csv, chunksize=chunksize)):
+        probabilities = predict_proba(model, chunk['Individual_Statement'])
+        chunk[f'{column_name}_Prob'] = probabilities.round(4)
+        chunk[column_name] = probabilities >= threshold
+        chunk.to_csv(output_csv, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Labelled {total} claims in {elapsed:.1f}s ({total / elapsed if elapsed > 0 else 0:.0f} claims/s)")
+    print(f"💾 Predictions saved to: {output_csv}")
+    return output_csv
+
+
+def binary_metrics(predictions, gold):
+    """Precision, recall, F1 and Cohen's kappa of boolean predictions against boolean gold labels."""
+    predictions = np.asarray(predictions, dtype=bool)
+    gold = np.asarray(gold, dtype=bool)
+    total = len(gold)
+    true_positives = int(np.sum(predictions & gold))
+    false_positives = int(np.sum(predictions & ~gold))
+    false_negatives = int(np.sum(~predictions & gold))
+    true_negatives = int(np.sum(~predictions & ~gold))
+    precision, recall, f1 = calculate_precision_recall_f1(true_positives, false_positives, false_negatives)
+    observed_agreement = (true_positives + true_negatives) / total if total else 0
+    pred_true_rate = predictions.mean() if total else 0
+    gold_true_rate = gold.mean() if total else 0
+    expected_agreement = pred_true_rate * gold_true_rate + (1 - pred_true_rate) * (1 - gold_true_rate)
+    kappa = calculate_kappa(observed_agreement, expected_agreement)
+    return {'precision': precision, 'recall': recall, 'f1': f1, 'kappa': kappa}
+
+
+def evaluate(model_path, gold_csv=HUMAN_ANNOTATIONS_CSV, threshold=0.5):
+    """
+    Evaluates the classifier against the human gold labels, per claim extraction method, next to the
+    LLM classifiers it was distilled from.
+
+    Returns:
+        dict: method -> column -> metrics.
+    """
+    model = joblib.load(model_path)
+    df = pd.read_csv(gold_csv, dtype=str, keep_default_na=False)
+    gold = df['Gold'].str.upper() == 'TRUE'
+    df['Classifier'] = predict_proba(model, df['Individual_Statement']) >= threshold
+    results = {}
+    for method, group in df.groupby('Claim_Extr_Method', sort=False):
+        group_gold = gold.loc[group.index]
+        print(f"=== Analysis for {method} ===")
+        print(f"Total rows: {len(group)}")
+        print()
+        results[method] = {}
+        columns = [
+            ('Classifier', group['Classifier']),
+            ('Hassan_Binary', group['Hassan_Binary'].str.upper() == 'TRUE'),
+            ('Majer_Binary', group['Majer_Binary'].str.upper() == 'TRUE'),
+            ('Intersection', group['Intersection'].str.upper() == 'TRUE'),
+            ('Union', group['Union'].str.upper() == 'TRUE'),
+        ]
+        for column_name, predictions in columns:
+            metrics = binary_metrics(predictions, group_gold)
+            results[method][column_name] = metrics
+            print(f"--- {column_name} vs Gold ---")
+            print(f"Precision: {metrics['precision']:.4f}")
+            print(f"Recall: {metrics['recall']:.4f}")
+            print(f"F1 Score: {metrics['f1']:.4f}")
+            print(f"Kappa: {metrics['kappa']:.4f}")
+            print()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distilled check-worthiness classifier (TF-IDF + logistic regression).")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='Distil Hassan/Majer LLM labels into a classifier')
+    train_parser.add_argument('--train_csv', nargs='+', required=True, help='cw.py output CSV(s) (NFS/UFS/CFS) or annotations/claims.csv (True/False) with Hassan and Majer columns')
+    train_parser.add_argument('--model_path', required=True, help='Where to save the model (.joblib)')
+    train_parser.add_argument('--target', default='Union', choices=TARGETS, help='LLM labelling to imitate (default: Union)')
+    train_parser.add_argument('--max_features', type=int, default=200000, help='TF-IDF vocabulary size (default: 200000)')
+    train_parser.add_argument('--C', type=float, default=4.0, help='Inverse regularization strength (default: 4.0)')
+    train_parser.add_argument('--gold_csv', default=HUMAN_ANNOTATIONS_CSV,
+                              help='Human annotations whose claims are held out of training (default: annotations/human_annotations.csv)')
+
+    predict_parser = subparsers.add_parser('predict', help='Label a claim-level CSV in batches')
+    predict_parser.add_argument('--model_path', required=True, help='Trained model (.joblib)')
+    predict_parser.add_argument('--input_csv', required=True, help='Claim-level CSV with Individual_Statement')
+    predict_parser.add_argument('--output_csv', required=True, help='Where to save the labelled CSV')
+    predict_parser.add_argument('--column_name', default='CW_Classifier', help='Prediction column name (default: CW_Classifier)')
+    predict_parser.add_argument('--threshold', type=float, default=0.5, help='Decision threshold on P(check-worthy) (default: 0.5)')
+    predict_parser.add_argument('--chunksize', type=int, default=200000, help='Rows per chunk (default: 200000)')
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='Compare against the human gold labels')
+    evaluate_parser.add_argument('--model_path', required=True, help='Trained model (.joblib)')
+    evaluate_parser.add_argument('--gold_csv', default=HUMAN_ANNOTATIONS_CSV, help='Human annotations CSV (default: annotations/human_annotations.csv)')
+    evaluate_parser.add_argument('--threshold', type=float, default=0.5, help='Decision threshold on P(check-worthy) (default: 0.5)')
+
+    args = parser.parse_args()
+    if args.command == 'train':
+        train(args.train_csv, args.model_path, target=args.target, max_features=args.max_features, C=args.C, gold_csv=args.gold_csv)
+    elif args.command == 'predict':
+        predict_csv(args.model_path, args.input_csv, args.output_csv, column_name=args.column_name,
+                    threshold=args.threshold, chunksize=args.chunksize)
+    else:
+        evaluate(args.model_path, gold_csv=args.gold_csv, threshold=args.threshold)
+
+
+if __name__ == "__main__":
+    main()
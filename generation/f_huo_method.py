@@ -1,14 +1,50 @@
-from openai_batch_utils import submit_openai_batch, get_batch_statuses_from_metadata, fetch_batch_output
+from parallel_utils import run_partitioned
+from request_writer import write_batch_requests, add_shard_arguments
+from prompt_registry import get_prompt
+from inference_backends import add_backend_arguments, backend_from_args
+from claim_dedup import add_dedup_arguments, dedup_claims_csv
+from batch_retry import add_retry_arguments, retry_failed_items
+from telemetry import instrumented, add_rows, add_usage
 
 import os
 import pandas as pd
+import ast
 import json
 from openai import OpenAI
 import time
 
-def make_FHuo_batch_request_file(input_csv_path, output_dir, model_name="gpt-4.1-2025-04-14"):
+
+def _build_FHuo_request(row, model_name):
+    """Builds the FHuo extraction request for one agent utterance row."""
+    context = str(row.get('Context_String', '')).strip()
+    question = str(row.get('Corresponding_User_Question', '')).strip()
+    proposed_answer = str(row.get('Selected_Agent_Utterance', '')).strip()
+    template = get_prompt("F_Huo")
+    prompt = template.render(context=context, question=question, proposed_answer=proposed_answer)
+    conversation_hash = str(row.get('Conversation_Hash', '')).strip()
+    turn_num = str(row.get('Turn_Num', '')).strip()
+    custom_id = f'{conversation_hash}_{turn_num}'
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model_name,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 1000,
+            "temperature": 0
+        }
+    }
+
+
+@instrumented('FHuo_requests')
+def make_FHuo_batch_request_file(input_csv_path, output_dir, model_name="gpt-4.1-2025-04-14", workers=1,
+                                 max_requests_per_shard=None):
     output_jsonl_path = os.path.join(output_dir, "FHuo_batch_requests.jsonl")
     df = pd.read_csv(input_csv_path)
+    add_rows(len(df))
     print(f"📄 Creating SIQing batch request file from {input_csv_path}")
     print("-" * 60)
     print(f"Total rows: {len(df)}")
@@ -17,42 +53,38 @@ def make_FHuo_batch_request_file(input_csv_path, output_dir, model_name="gpt-4.1
     if missing_columns:
         print(f"❌ Missing required columns: {missing_columns}")
         print("Make sure to generate_context_string first by running Preprocess_Files_For_Pipeline.py.")
-        return None
-    non_empty_rows = 0
-    with open(output_jsonl_path, "w", encoding="utf-8") as f:
-        for i, row in df.iterrows():
-            context = str(row.get('Context_String', '')).strip()
-            question = str(row.get('Corresponding_User_Question', '')).strip()
-            proposed_answer = str(row.get('Selected_Agent_Utterance', '')).strip()
-            non_empty_rows += 1
-            prompt = f"""I want you to act as a language expert. Your task is given a question\nand a proposed answer, extract concise and relevant factual\nstatements from the proposed answer. Include only statements that\nhave a truth value and are worth validating, and ignore subjective\nclaims. You should generate a bullet list of statements that are\npotentially true or false based on the question and proposed answer.\nPlease only reply with the bullet list and nothing else.\n\nContext: {context}\nQuestion: {question}\nProposed Answer: {proposed_answer}\n\nOutput must be pythonic list format."""
-            conversation_hash = str(row.get('Conversation_Hash', '')).strip()
-            turn_num = str(row.get('Turn_Num', '')).strip()
-            custom_id = f'{conversation_hash}_{turn_num}'
-            request_obj = {
-                "custom_id": custom_id,
-                "method": "POST",
-                "url": "/v1/chat/completions",
-                "body": {
-                    "model": model_name,
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ],
-                    "max_tokens": 1000,
-                    "temperature": 0
-                }
-            }
-            f.write(json.dumps(request_obj, ensure_ascii=False) + "\n")
+        return []
+    shards = write_batch_requests(
+        df, _build_FHuo_request, output_jsonl_path, workers=workers,
+        max_requests_per_shard=max_requests_per_shard, model_name=model_name
+    )
+    non_empty_rows = sum(shard['requests'] for shard in shards)
     print(f"✅ Batch request file created!")
     print(f"📊 Non-empty rows processed: {non_empty_rows}/{len(df)}")
     print(f"📊 Success rate: {(non_empty_rows/len(df))*100:.1f}%")
-    print(f"💾 Saved to: {output_jsonl_path}")
-    return output_jsonl_path
+    print(f"💾 Saved to: {output_jsonl_path} (prompt F_Huo@{get_prompt('F_Huo').version})")
+    return [shard['path'] for shard in shards]
 
 
+def is_valid_FHuo_answer(content):
+    """False for answers the explosion cannot read, e.g. a JSON list cut off at max_tokens."""
+    content = content.strip()
+    if not content.startswith('['):
+        return True
+    try:
+        return isinstance(json.loads(content), list)
+    except json.JSONDecodeError:
+        try:
+            return isinstance(ast.literal_eval(content), list)
+        except (ValueError, SyntaxError):
+            return False
+
+
+@instrumented('FHuo_map_results')
 def map_FHuo_results_to_csv(batch_results_path, input_csv_path, output_dir):
     output_csv_path = os.path.join(output_dir, "FHuo_with_factual_statements.csv")
     df = pd.read_csv(input_csv_path)
+    add_rows(len(df))
     print(f"Original CSV has {len(df)} rows")
     results_mapping = {}
     batch_results_count = 0
@@ -60,6 +92,7 @@ def map_FHuo_results_to_csv(batch_results_path, input_csv_path, output_dir):
         for line in f:
             batch_results_count += 1
             result = json.loads(line.strip())
+            add_usage(result)
             custom_id = result.get('custom_id', '')
             if 'response' in result and 'body' in result['response']:
                 try:
@@ -81,14 +114,8 @@ def map_FHuo_results_to_csv(batch_results_path, input_csv_path, output_dir):
     return output_csv_path
 
 
-def explode_FHuo_factual_statements(csv_path, output_dir):
-    output_csv_path = os.path.join(output_dir, "FHuo_exploded_statements.csv")
-    df = pd.read_csv(csv_path)
-    print(f"📄 Loading SIQing CSV with {len(df)} rows")
-    print(f"📊 Columns: {list(df.columns)}")
-    if 'Factual_Statements' not in df.columns:
-        print("❌ Factual_Statements column not found!")
-        return None
+def _explode_statement_rows(df):
+    """Returns one dict per parsed factual statement in `df` (the per-partition body of the explosion)."""
     exploded_rows = []
     for idx, row in df.iterrows():
         statements_str = str(row.get('Factual_Statements', '')).strip()
@@ -136,6 +163,20 @@ def explode_FHuo_factual_statements(csv_path, output_dir):
         except Exception as e:
             print(f"⚠️ Error parsing statements for row {idx}: {e}")
             continue
+    return exploded_rows
+
+
+@instrumented('FHuo_explode')
+def explode_FHuo_factual_statements(csv_path, output_dir, workers=1):
+    output_csv_path = os.path.join(output_dir, "FHuo_exploded_statements.csv")
+    df = pd.read_csv(csv_path)
+    add_rows(len(df))
+    print(f"📄 Loading SIQing CSV with {len(df)} rows")
+    print(f"📊 Columns: {list(df.columns)}")
+    if 'Factual_Statements' not in df.columns:
+        print("❌ Factual_Statements column not found!")
+        return None
+    exploded_rows = run_partitioned(df, _explode_statement_rows, workers=workers)
     exploded_df = pd.DataFrame(exploded_rows)
     print(f"\n📊 Explosion complete!")
     print(f"📄 Original rows: {len(df)}")
@@ -155,36 +196,63 @@ def main():
     parser.add_argument('--input_csv', required=True, help='Path to the input CSV file')
     parser.add_argument('--output_dir', required=True, help='Directory to save all outputs')
     parser.add_argument('--model_name', default="gpt-4.1-2025-04-14", help='OpenAI model to use')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes, partitioned by Conversation_Hash (default: 1, 0 = all cores)')
+    parser.add_argument('--dedup', action='store_true', help='Cluster near-duplicate claims after explosion (adds Claim_Cluster columns)')
+    add_dedup_arguments(parser)
+    add_shard_arguments(parser)
+    add_backend_arguments(parser)
+    add_retry_arguments(parser)
     args = parser.parse_args()
+    backend = backend_from_args(args)
     os.makedirs(args.output_dir, exist_ok=True)
 
+    requests_file = os.path.join(args.output_dir, "FHuo_batch_requests.jsonl")
     metadata_file = os.path.join(args.output_dir, "FHuo_batch_metadata.jsonl")
     results_file = os.path.join(args.output_dir, "FHuo_batch_results.jsonl")
 
+    def retry():
+        return retry_failed_items(backend, requests_file, results_file, validate=is_valid_FHuo_answer,
+                                  max_retries=args.max_retries, description="SIQing factual statement extraction",
+                                  metadata=get_prompt("F_Huo").metadata())
+
     if os.path.exists(metadata_file):
         print("Batch metadata found.")
         if os.path.exists(results_file):
-            print("Results found. Mapping and exploding...")
-            mapped_csv = map_FHuo_results_to_csv(results_file, args.input_csv, args.output_dir)
-            exploded_csv = explode_FHuo_factual_statements(mapped_csv, args.output_dir)
-            print(f"Done! Exploded CSV saved to {exploded_csv}")
+            if retry():
+                print("Results found. Mapping and exploding...")
+                mapped_csv = map_FHuo_results_to_csv(results_file, args.input_csv, args.output_dir)
+                exploded_csv = explode_FHuo_factual_statements(mapped_csv, args.output_dir, workers=args.workers)
+                if args.dedup and exploded_csv:
+                    dedup_claims_csv(exploded_csv, scope=args.dedup_scope, threshold=args.dedup_threshold)
+                print(f"Done! Exploded CSV saved to {exploded_csv}")
+            else:
+                print("You may need to rerun this script later to process results.")
         else:
             print("Checking batch status...")
-            statuses = get_batch_statuses_from_metadata(metadata_file)
-            if statuses and statuses[0]['status'] == 'completed':
-                print("Fetching batch output...")
-                fetch_batch_output(metadata_file, results_file)
+            if backend.fetch(metadata_file, results_file) and retry():
                 mapped_csv = map_FHuo_results_to_csv(results_file, args.input_csv, args.output_dir)
-                exploded_csv = explode_FHuo_factual_statements(mapped_csv, args.output_dir)
+                exploded_csv = explode_FHuo_factual_statements(mapped_csv, args.output_dir, workers=args.workers)
+                if args.dedup and exploded_csv:
+                    dedup_claims_csv(exploded_csv, scope=args.dedup_scope, threshold=args.dedup_threshold)
                 print(f"Done! Exploded CSV saved to {exploded_csv}")
             else:
-                print(f"Batch not completed yet. Status: {statuses[0]['status'] if statuses else 'Unknown'}")
                 print("You may need to rerun this script later to process results.")
     else:
         print("No batch metadata found. Submitting new batch...")
-        batch_jsonl = make_FHuo_batch_request_file(args.input_csv, args.output_dir, model_name=args.model_name)
-        submit_openai_batch(batch_jsonl, metadata_file, description="SIQing factual statement extraction")
-        print("Batch submitted. Please rerun this script later to fetch results.")
+        batch_jsonls = make_FHuo_batch_request_file(args.input_csv, args.output_dir, model_name=args.model_name, workers=args.workers,
+                                                    max_requests_per_shard=args.max_requests_per_shard)
+        if not batch_jsonls:
+            return
+        backend.submit(batch_jsonls, metadata_file, results_file, description="SIQing factual statement extraction",
+                       metadata=get_prompt("F_Huo").metadata())
+        if backend.fetch(metadata_file, results_file) and retry():
+            mapped_csv = map_FHuo_results_to_csv(results_file, args.input_csv, args.output_dir)
+            exploded_csv = explode_FHuo_factual_statements(mapped_csv, args.output_dir, workers=args.workers)
+            if args.dedup and exploded_csv:
+                dedup_claims_csv(exploded_csv, scope=args.dedup_scope, threshold=args.dedup_threshold)
+            print(f"Done! Exploded CSV saved to {exploded_csv}")
+        else:
+            print("Batch submitted. Please rerun this script later to fetch results.")
 
 if __name__ == "__main__":
     main()
@@ -10,6 +10,10 @@ import argparse
 from tqdm import tqdm
 from typing import Optional
 
+from parallel_utils import run_partitioned
+from claim_dedup import add_dedup_arguments, dedup_claims_csv
+from telemetry import instrumented, add_rows
+
 
 def create_single_json_obj_from_new_format(row, model_name, prompt_source):
     """Create one JSON object from the new CSV format with Context_String, Corresponding_User_Question, and Selected_Agent_Utterance."""
@@ -29,6 +33,7 @@ def create_single_json_obj_from_new_format(row, model_name, prompt_source):
 
 
 
+@instrumented('FSong_requests')
 def batch_generate_jsonl_from_new_format(
     csv_path: str,
     output_dir: str,
@@ -41,6 +46,7 @@ def batch_generate_jsonl_from_new_format(
 
     with open(csv_path, newline="", encoding="utf-8") as f:
         reader = list(csv.DictReader(f))
+        add_rows(len(reader))
         for row_index, row in enumerate(reader):
             conv_hash = row['Conversation_Hash']
             turn_num = row['Turn_Num']
@@ -93,13 +99,45 @@ def run_FSong(requests_dir: str, model_name: str = 'gpt-4.1-2025-04-14', FSong_d
         subprocess.run(cmd, cwd=FSong_dir)
 
 
-def map_FSong_claims_to_csv(FSong_dir, original_csv_path, output_csv_path):
+def _read_FSong_claims_file(file_path):
+    """
+    Reads one claims_{hash}_{turn}.jsonl file and returns its 'all_claims' list (None if absent).
+    """
+    claims = None
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            data = json.loads(line.strip())
+            if 'all_claims' in data:
+                claims = data['all_claims']
+    return claims
+
+
+def _read_FSong_claims_files_partition(files_df):
+    """Reads the claim files listed in a partition of (file, file_path, conv_hash, turn_num) tuples."""
+    results = []
+    for file, file_path, conv_hash, turn_num in files_df['file_info']:
+        try:
+            results.append((file, conv_hash, turn_num, _read_FSong_claims_file(file_path), None))
+        except Exception as e:
+            results.append((file, conv_hash, turn_num, None, str(e)))
+    return results
+
+
+@instrumented('FSong_map_claims')
+def map_FSong_claims_to_csv(FSong_dir, original_csv_path, output_csv_path, workers=1):
     """
     Maps VeriScore claims from JSONL files back to the original CSV rows.
+    With workers > 1 the claim files are read in a process pool, grouped by conversation hash.
     """
     df = pd.read_csv(original_csv_path)
+    add_rows(len(df))
     print(f"📄 Original CSV has {len(df)} rows")
     claims_mapping = {}
+    row_lookup = {}
+    for row_index, conv_hash, turn_num in zip(df.index, df['conversation_hash'], df['turn_num']):
+        if pd.notna(turn_num):
+            row_lookup.setdefault((str(conv_hash), int(turn_num)), row_index)
+    file_infos = []
     for root, dirs, files in os.walk(FSong_dir):
         for file in files:
             if file.endswith('.jsonl'):
@@ -108,25 +146,24 @@ def map_FSong_claims_to_csv(FSong_dir, original_csv_path, output_csv_path):
                 if not claim_match:
                     print(f"⚠️ Could not extract conv_hash and turn_num from filename: {file}")
                     continue
-                conv_hash = claim_match.group(1)
-                turn_num = int(claim_match.group(2))
-                matching_rows = df[(df['conversation_hash'] == conv_hash) & (df['turn_num'] == turn_num)]
-                if len(matching_rows) == 0:
-                    print(f"⚠️ No matching row found for conv_hash: {conv_hash}, turn_num: {turn_num}")
-                    continue
-                row_index = matching_rows.index[0]
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            data = json.loads(line.strip())
-                            if 'all_claims' in data:
-                                claims = data['all_claims']
-                                claims_mapping[row_index] = claims
-                                print(f"✅ Row {row_index} (conv_hash: {conv_hash}, turn: {turn_num}): Found {len(claims)} claims")
-                            else:
-                                print(f"⚠️ Row {row_index} (conv_hash: {conv_hash}, turn: {turn_num}): No 'all_claims' key found")
-                except Exception as e:
-                    print(f"❌ Error reading {file}: {e}")
+                file_infos.append((file, file_path, claim_match.group(1), int(claim_match.group(2))))
+    # Sort so partitions group files of the same conversation and the log order is deterministic
+    file_infos.sort(key=lambda info: (info[2], info[3], info[1]))
+    files_df = pd.DataFrame({'Conversation_Hash': [info[2] for info in file_infos]})
+    files_df['file_info'] = file_infos
+    results = run_partitioned(files_df, _read_FSong_claims_files_partition, workers=workers) if file_infos else []
+    for file, conv_hash, turn_num, claims, error in results:
+        row_index = row_lookup.get((conv_hash, turn_num))
+        if row_index is None:
+            print(f"⚠️ No matching row found for conv_hash: {conv_hash}, turn_num: {turn_num}")
+            continue
+        if error is not None:
+            print(f"❌ Error reading {file}: {error}")
+        elif claims is not None:
+            claims_mapping[row_index] = claims
+            print(f"✅ Row {row_index} (conv_hash: {conv_hash}, turn: {turn_num}): Found {len(claims)} claims")
+        else:
+            print(f"⚠️ Row {row_index} (conv_hash: {conv_hash}, turn: {turn_num}): No 'all_claims' key found")
     print(f"\n📊 Found claims for {len(claims_mapping)} rows")
     df['Factual_Statements'] = df.index.map(claims_mapping)
     rows_with_claims = df['Factual_Statements'].notna().sum()
@@ -154,16 +191,8 @@ def map_FSong_claims_to_csv(FSong_dir, original_csv_path, output_csv_path):
     return df
 
 
-def explode_FSong_claims(csv_path, output_csv_path):
-    """
-    Explodes the Factual_Statements column into separate rows, one for each claim.
-    """
-    df = pd.read_csv(csv_path)
-    print(f"📄 Loading CSV with {len(df)} rows")
-    print(f"📊 Columns: {list(df.columns)}")
-    if 'Factual_Statements' not in df.columns:
-        print("❌ Factual_Statements column not found!")
-        return None
+def _explode_claim_rows(df):
+    """Returns one dict per claim in `df` (the per-partition body of explode_FSong_claims)."""
     exploded_rows = []
     for idx, row in df.iterrows():
         claims_str = str(row.get('Factual_Statements', '')).strip()
@@ -186,6 +215,22 @@ def explode_FSong_claims(csv_path, output_csv_path):
         except json.JSONDecodeError as e:
             print(f"⚠️ Error parsing claims for row {idx}: {e}")
             continue
+    return exploded_rows
+
+
+@instrumented('FSong_explode')
+def explode_FSong_claims(csv_path, output_csv_path, workers=1):
+    """
+    Explodes the Factual_Statements column into separate rows, one for each claim.
+    """
+    df = pd.read_csv(csv_path)
+    add_rows(len(df))
+    print(f"📄 Loading CSV with {len(df)} rows")
+    print(f"📊 Columns: {list(df.columns)}")
+    if 'Factual_Statements' not in df.columns:
+        print("❌ Factual_Statements column not found!")
+        return None
+    exploded_rows = run_partitioned(df, _explode_claim_rows, workers=workers)
     exploded_df = pd.DataFrame(exploded_rows)
     print(f"\n📊 Explosion complete!")
     print(f"📄 Original rows: {len(df)}")
@@ -223,6 +268,9 @@ def main():
     parser.add_argument('--model_name', type=str, default='gpt-4', help='Model name for batch requests (default: gpt-4)')
     parser.add_argument('--FSong_model', type=str, default='gpt-4.1-2025-04-14', help='Model name for VeriScore extraction (default: gpt-4.1-2025-04-14)')
     parser.add_argument('--FSong_dir', type=str, default='VeriScore', help='Path to VeriScore directory (default: VeriScore')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for mapping and explosion, partitioned by Conversation_Hash (default: 1, 0 = all cores)')
+    parser.add_argument('--dedup', action='store_true', help='Cluster near-duplicate claims after explosion (adds Claim_Cluster columns)')
+    add_dedup_arguments(parser)
     args = parser.parse_args()
 
     os.makedirs(args.output_dir, exist_ok=True)
@@ -247,14 +295,19 @@ def main():
     map_FSong_claims_to_csv(
         FSong_dir=args.output_dir,
         original_csv_path=args.input_csv,
-        output_csv_path=mapped_csv
+        output_csv_path=mapped_csv,
+        workers=args.workers
     )
 
     print(f"\n[4/4] Exploding claims to rows...")
     explode_FSong_claims(
         csv_path=mapped_csv,
-        output_csv_path=exploded_csv
+        output_csv_path=exploded_csv,
+        workers=args.workers
     )
+    if args.dedup:
+        print(f"\n[4.5/4] Clustering near-duplicate claims...")
+        dedup_claims_csv(exploded_csv, scope=args.dedup_scope, threshold=args.dedup_threshold)
     print(f"\n🎉 Pipeline complete! All outputs saved in: {args.output_dir}")
 
 
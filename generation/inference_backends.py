@@ -0,0 +1,256 @@
+import os
+import abc
+import json
+import time
+import uuid
+import random
+import urllib.request
+import urllib.error
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from openai_batch_utils import (
+    TERMINAL_BATCH_STATUSES, submit_openai_batch, get_batch_statuses_from_metadata, fetch_batch_output, errors_path_for
+)
+from parallel_utils import resolve_workers
+from request_writer import request_shard_paths
+from telemetry import instrumented, add_rows
+
+
+class InferenceBackend(abc.ABC):
+    """
+    Runs a Batch API request file and produces a results file in the Batch API output schema.
+
+    Every stage writes requests as JSONL (`custom_id`, `method`, `url`, `body`) and maps results back
+    from JSONL (`custom_id`, `response.body.choices[...]`), so a backend only has to honour that contract:
+    - `submit` starts processing a request file, or every shard of it (request_writer.request_shard_paths),
+      and records what it did in `metadata_path`, along with the `metadata` fields of the caller (the
+      prompt template and version);
+    - `fetch` writes `results_path` once processing is done and returns True, otherwise returns False.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def submit(self, requests_path, metadata_path, results_path, description="batch run", metadata=None):
+        pass
+
+    @abc.abstractmethod
+    def fetch(self, metadata_path, results_path):
+        pass
+
+
+class OpenAIBatchBackend(InferenceBackend):
+    """The OpenAI Batch API (asynchronous, up to the 24h completion window)."""
+
+    name = "openai"
+
+    def __init__(self, completion_window="24h", base_url=None):
+        self.completion_window = completion_window
+        # None uses OPENAI_BASE_URL or the real API; point it at mock_openai_server.py for offline runs
+        self.base_url = base_url
+
+    def submit(self, requests_path, metadata_path, results_path, description="batch run", metadata=None):
+        # One batch per shard, all recorded in the same metadata file; fetch concatenates their outputs
+        shards = request_shard_paths(requests_path)
+        return [
+            submit_openai_batch(path, metadata_path, description=description if len(shards) == 1 else f"{description} ({num}/{len(shards)})",
+                                completion_window=self.completion_window, base_url=self.base_url, metadata=metadata)
+            for num, path in enumerate(shards, start=1)
+        ]
+
+    def fetch(self, metadata_path, results_path):
+        # Expired, cancelled and failed batches are harvested too; batch_retry.py resubmits what they did not process
+        statuses = get_batch_statuses_from_metadata(metadata_path, base_url=self.base_url)
+        running = [s['status'] for s in statuses if s['status'] not in TERMINAL_BATCH_STATUSES]
+        if not statuses or running:
+            print(f"Batch not completed yet. Status: {', '.join(running) if statuses else 'Unknown'}")
+            return False
+        return fetch_batch_output(metadata_path=metadata_path, save_path=results_path, base_url=self.base_url)
+
+
+def _read_requests(requests_path):
+    requests = []
+    for path in request_shard_paths(requests_path):
+        with open(path, 'r', encoding='utf-8') as f:
+            requests.extend(json.loads(line) for line in f if line.strip())
+    return requests
+
+
+def make_micro_batches(requests, max_batch_size=32, max_batch_tokens=16000):
+    """
+    Groups requests into micro-batches bounded by request count and (approximate) prompt tokens.
+
+    Requests are kept in file order; a batch is closed as soon as adding the next request would exceed
+    either limit, so short CW prompts travel in large batches and long FHuo prompts in small ones.
+    """
+    batches, current, current_tokens = [], [], 0
+    for request in requests:
+        messages = request.get('body', {}).get('messages', [])
+        # ~4 characters per token is close enough for budgeting
+        tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4 + 1
+        if current and (len(current) >= max_batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(request)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+# Rate limited or overloaded: the same request can succeed a little later
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def _retry_delay(attempt, retry_after=None):
+    """Seconds to wait before retry `attempt`: the server's Retry-After if given, else exponential backoff with jitter."""
+    try:
+        return min(float(retry_after), 60)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+
+
+def _post_chat_completion(request, base_url, model_override, timeout, api_key, max_retries=3):
+    """
+    Sends one request to an OpenAI-compatible /v1/chat/completions endpoint; returns a batch output line.
+    Connection errors and RETRYABLE_STATUS_CODES are retried up to `max_retries` times with backoff;
+    other HTTP errors (400, 401, ...) are returned at once.
+    """
+    body = dict(request['body'])
+    if model_override:
+        body['model'] = model_override
+    url = base_url.rstrip('/') + request.get('url', '/v1/chat/completions').replace('/v1', '', 1)
+    http_request = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {api_key}'},
+    )
+    output = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request['custom_id'], "response": None, "error": None}
+    for attempt in range(max_retries + 1):
+        try:
+            with urllib.request.urlopen(http_request, timeout=timeout) as response:
+                output["response"] = {
+                    "status_code": response.status,
+                    "request_id": response.headers.get('x-request-id', uuid.uuid4().hex),
+                    "body": json.loads(response.read().decode('utf-8')),
+                }
+            output["error"] = None
+            break
+        except urllib.error.HTTPError as e:
+            output["response"] = {"status_code": e.code, "request_id": "", "body": {"error": {"message": e.read().decode('utf-8', 'replace')}}}
+            output["error"] = None
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == max_retries:
+                break
+            time.sleep(_retry_delay(attempt, e.headers.get('Retry-After') if e.headers else None))
+        except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+            # Connection refused/reset while the server is saturated: back off and retry
+            output["response"] = None
+            output["error"] = {"code": type(e).__name__, "message": str(e)}
+            if attempt < max_retries:
+                time.sleep(_retry_delay(attempt))
+        except Exception as e:
+            output["error"] = {"code": type(e).__name__, "message": str(e)}
+            break
+    return output
+
+
+def _run_micro_batch(batch, base_url, model_override, timeout, api_key):
+    """Sends a micro-batch concurrently so the server can schedule the requests into one forward batch."""
+    send = partial(_post_chat_completion, base_url=base_url, model_override=model_override, timeout=timeout, api_key=api_key)
+    with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+        return list(pool.map(send, batch))
+
+
+class LocalServerBackend(InferenceBackend):
+    """
+    A local OpenAI-compatible chat server on our own hardware, e.g. llama.cpp (`llama-server --parallel N`)
+    or vLLM on CPU. Requests are grouped into micro-batches (dynamic batching by size and token budget),
+    and micro-batches are sent from several worker processes at once. Runs synchronously: results are
+    written before `submit` returns.
+    """
+
+    name = "local"
+
+    def __init__(self, base_url="http://localhost:8080/v1", model=None, workers=4, max_batch_size=32,
+                 max_batch_tokens=16000, timeout=600):
+        self.base_url = base_url
+        self.model = model
+        self.workers = resolve_workers(workers)
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.timeout = timeout
+        self.api_key = os.environ.get('LOCAL_API_KEY', 'local')
+
+    @instrumented('local_inference')
+    def run(self, requests_path, results_path):
+        """Processes every request in `requests_path` (all its shards) and writes the batch output JSONL; returns throughput stats."""
+        requests = _read_requests(requests_path)
+        add_rows(len(requests))
+        batches = make_micro_batches(requests, self.max_batch_size, self.max_batch_tokens)
+        run_batch = partial(_run_micro_batch, base_url=self.base_url, model_override=self.model,
+                            timeout=self.timeout, api_key=self.api_key)
+        print(f"🖥️ Local backend: {len(requests)} requests in {len(batches)} micro-batches on {self.workers} workers ({self.base_url})")
+        start = time.perf_counter()
+        succeeded = 0
+        # Like the Batch API, answered requests go to the output file and failed ones to the error file
+        with open(results_path, 'w', encoding='utf-8') as f, open(errors_path_for(results_path), 'w', encoding='utf-8') as error_f:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for outputs in executor.map(run_batch, batches):
+                    for output in outputs:
+                        if output["error"] is None:
+                            succeeded += int(output["response"]["status_code"] == 200)
+                            f.write(json.dumps(output, ensure_ascii=False) + "\n")
+                        else:
+                            error_f.write(json.dumps(output, ensure_ascii=False) + "\n")
+        elapsed = time.perf_counter() - start
+        stats = {
+            "backend": self.name,
+            "base_url": self.base_url,
+            "requests": len(requests),
+            "succeeded": succeeded,
+            "failed": len(requests) - succeeded,
+            "seconds": round(elapsed, 2),
+            "requests_per_second": round(len(requests) / elapsed, 2) if elapsed > 0 else 0,
+        }
+        print(f"✅ {succeeded}/{len(requests)} requests succeeded in {stats['seconds']}s ({stats['requests_per_second']} req/s)")
+        return stats
+
+    def submit(self, requests_path, metadata_path, results_path, description="batch run", metadata=None):
+        stats = self.run(requests_path, results_path)
+        metadata = {"batch_id": f"local_{uuid.uuid4().hex[:12]}", "description": description, **(metadata or {}), **stats}
+        with open(metadata_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(metadata, ensure_ascii=False) + "\n")
+        return metadata
+
+    def fetch(self, metadata_path, results_path):
+        return os.path.exists(results_path)
+
+
+BACKENDS = {
+    OpenAIBatchBackend.name: OpenAIBatchBackend,
+    LocalServerBackend.name: LocalServerBackend,
+}
+
+
+def add_backend_arguments(parser):
+    """Adds the --backend options shared by the LLM stages."""
+    parser.add_argument('--backend', default='openai', choices=sorted(BACKENDS), help='Inference backend (default: openai)')
+    parser.add_argument('--openai_base_url', default=None,
+                        help='OpenAI-compatible API base URL, e.g. http://127.0.0.1:8000/v1 for mock_openai_server.py (backend=openai; default: OPENAI_BASE_URL or the real API)')
+    parser.add_argument('--local_url', default='http://localhost:8080/v1', help='Base URL of the local OpenAI-compatible server (backend=local)')
+    parser.add_argument('--local_model', default=None, help='Model name sent to the local server instead of --model_name (backend=local)')
+    parser.add_argument('--local_workers', type=int, default=4, help='Worker processes sending micro-batches (backend=local, default: 4)')
+    parser.add_argument('--local_batch_size', type=int, default=32, help='Max requests per micro-batch (backend=local, default: 32)')
+
+
+def backend_from_args(args):
+    """Builds the backend selected on the command line."""
+    if args.backend == 'local':
+        return LocalServerBackend(
+            base_url=args.local_url,
+            model=args.local_model,
+            workers=args.local_workers,
+            max_batch_size=args.local_batch_size,
+        )
+    return OpenAIBatchBackend(base_url=args.openai_base_url)
@@ -0,0 +1,90 @@
+import re
+import math
+
+import numpy as np
+
+
+# Alternatives returned per answer token; the Chat Completions API allows up to 20
+DEFAULT_TOP_LOGPROBS = 5
+
+
+def with_logprobs(body, top_logprobs=DEFAULT_TOP_LOGPROBS):
+    """Returns a copy of a chat completion request body that also asks for the logprobs of the answer tokens."""
+    return {**body, "logprobs": True, "top_logprobs": top_logprobs}
+
+
+def _token_label(token, labels):
+    """The label a token starts (e.g. 'N' or 'NFS' -> 'NFS'), or None if it matches no label or several."""
+    text = token.strip().strip('*[]()"\'.:-').upper()
+    if not text:
+        return None
+    matches = [label for label in labels if label.upper().startswith(text) or text.startswith(label.upper())]
+    return matches[0] if len(matches) == 1 else None
+
+
+def label_probabilities(output, labels, after=None):
+    """
+    Probability of each label from the logprobs of a batch output line (or chat completion body).
+
+    The label is read at the first answer token that starts one of `labels`, so formatting tokens before
+    it ('**', '[[') are skipped. The probabilities of that token's top alternatives are summed per label
+    they start and normalized over the labels. Answers holding several labels (the JSON of cw.py
+    --prompt_mode Joint) are read at the first label token after the first match of the regex `after`
+    (e.g. the '"Hassan":' key) in the answer text, whatever the order of the keys; the key may span tokens.
+
+    Returns:
+        dict: label -> probability (summing to 1), or None if the answer has no usable logprobs.
+    """
+    body = (output.get('response') or {}).get('body') if 'response' in output else output
+    try:
+        tokens = body['choices'][0]['logprobs']['content']
+    except (KeyError, IndexError, TypeError):
+        return None
+    tokens = tokens or []
+    start = 0
+    if after is not None:
+        texts = [token.get('token', '') for token in tokens]
+        match = re.search(after, ''.join(texts))
+        if match is None:
+            return None
+        # First token with text past the end of the key
+        start = int(np.searchsorted(np.cumsum([len(text) for text in texts]), match.end(), side='right'))
+    for token in tokens[start:]:
+        if _token_label(token.get('token', ''), labels) is None:
+            continue
+        mass = dict.fromkeys(labels, 0.0)
+        for alternative in token.get('top_logprobs') or [token]:
+            label = _token_label(alternative.get('token', ''), labels)
+            if label is not None:
+                mass[label] += math.exp(alternative['logprob'])
+        total = sum(mass.values())
+        return {label: value / total for label, value in mass.items()} if total > 0 else None
+    return None
+
+
+def probability_column_names(prefix, labels):
+    """Names of the per-label probability columns: '<prefix>_P_<label>', non-alphanumerics in the label as '_'."""
+    return [f"{prefix}_P_{re.sub(r'[^0-9A-Za-z]+', '_', label).strip('_')}" for label in labels]
+
+
+def add_probability_columns(df, prefix, labels, probabilities, keys):
+    """
+    Stores label probabilities as one float32 column per label (see probability_column_names), rounded to
+    4 decimals, so they can be read back as a matrix with df[columns].to_numpy().
+
+    Args:
+        df: DataFrame to add the columns to.
+        prefix: Column the probabilities belong to (e.g. 'CW_Label' or 'Task_Classification').
+        labels: Labels in column order.
+        probabilities: Dict of row key -> list of probabilities in `labels` order.
+        keys: Row key of each row of df; rows without probabilities get NaN.
+
+    Returns:
+        list: Names of the added columns.
+    """
+    missing = [np.nan] * len(labels)
+    matrix = np.array([probabilities.get(key, missing) for key in keys], dtype=np.float32).reshape(len(keys), len(labels))
+    columns = probability_column_names(prefix, labels)
+    for i, column in enumerate(columns):
+        df[column] = np.round(matrix[:, i], 4)
+    return columns
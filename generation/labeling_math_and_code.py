@@ -15,8 +15,10 @@ from openai_batch_utils import (
 )
 
 import argparse
+from telemetry import instrumented, add_rows, add_usage
 
 
+@instrumented('labeling_explode')
 def explode_all_user_utterances_with_all_columns(input_csv, output_dir):
     """
     For each row in the input CSV, create a new row for every user utterance,
@@ -26,6 +28,7 @@ def explode_all_user_utterances_with_all_columns(input_csv, output_dir):
     """
     output_csv = os.path.join(output_dir, "exploded.csv")
     df = pd.read_csv(input_csv)
+    add_rows(len(df))
     user_pattern = re.compile(r'Utterance-(\d+) \(User\)')
 
     all_columns = list(df.columns) + [
@@ -73,6 +76,7 @@ def explode_all_user_utterances_with_all_columns(input_csv, output_dir):
     return output_csv
 
 
+@instrumented('labeling_requests')
 def make_openai_batch_request_file(exploded_csv, output_dir, model_name="gpt-4.1-mini-2025-04-14"):
     """
     Reads the exploded CSV, creates a batch request file for OpenAI batch API, and saves as JSONL in output_dir.
@@ -80,6 +84,7 @@ def make_openai_batch_request_file(exploded_csv, output_dir, model_name="gpt-4.1
     """
     output_jsonl_path = os.path.join(output_dir, "batch_requests.jsonl")
     df = pd.read_csv(exploded_csv)
+    add_rows(len(df))
     system_prompt = (
         "You are an annotation expert tasked with categorizing conversations between humans and AI. "
         "Review each conversation and assign it to one of these categories: 'Math', 'Coding', or 'Others'. "
@@ -113,6 +118,7 @@ def make_openai_batch_request_file(exploded_csv, output_dir, model_name="gpt-4.1
     return output_jsonl_path
 
 
+@instrumented('labeling_map_results')
 def map_batch_results_to_csv(batch_results_path, exploded_csv, output_dir):
     """
     Maps batch results back to the exploded CSV using custom_id/conversation_hash.
@@ -122,6 +128,7 @@ def map_batch_results_to_csv(batch_results_path, exploded_csv, output_dir):
     output_csv_path = os.path.join(output_dir, "labeled_output.csv")
     # Load exploded CSV
     df = pd.read_csv(exploded_csv)
+    add_rows(len(df))
     print(f"Original CSV has {len(df)} rows")
     
     # Load batch results and extract labels
@@ -131,6 +138,7 @@ def map_batch_results_to_csv(batch_results_path, exploded_csv, output_dir):
         for line in f:
             batch_results_count += 1
             result = json.loads(line.strip())
+            add_usage(result)
             custom_id = result.get('custom_id', '')
             if 'response' in result and 'body' in result['response']:
                 try:
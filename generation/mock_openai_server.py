@@ -0,0 +1,397 @@
+import re
+import json
+import math
+import time
+import uuid
+import zlib
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from task_labels import TASK_CATEGORIES
+
+
+CW_LABELS = (['CFS', 'UFS', 'NFS'], [0.35, 0.2, 0.45])
+LABELING_LABELS = (['Others', 'Math', 'Coding'], [0.9, 0.04, 0.06])
+_PROPOSED_ANSWER = re.compile(r'Proposed Answer:(.*?)\n\s*Output must be', re.DOTALL)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+# Phrase of each prompt that the others do not contain; the joint prompt holds both rubrics, so it comes first
+_STAGE_MARKERS = [
+    ('Rubric "Hassan"', 'Hassan_Majer'),
+    ('Will the user be interested in knowing whether', 'Hassan'),
+    ('Check-worthy Factual Sentence', 'Majer'),
+    ('Classify the user turn', 'Task_Classification'),
+    ('Proposed Answer:', 'F_Huo'),
+    ('[[Category]]', 'labeling'),
+]
+
+
+def _request_stage(body):
+    """Prompt template of a request, recognized by a fixed phrase of its prompt text, or 'labeling'."""
+    prompt = '\n'.join(str(message.get('content', '')) for message in body.get('messages') or [])
+    return next((stage for marker, stage in _STAGE_MARKERS if marker in prompt), None)
+
+
+def _approx_tokens(text):
+    # ~4 characters per token, as in inference_backends.make_micro_batches
+    return len(text) // 4 + 1
+
+
+def fake_completion_content(body, seed=0):
+    """
+    Deterministic fake answer for a chat completion request, shaped like the real answer of its stage:
+    [[Category]] labels, task categories, NFS/UFS/CFS labels (a JSON object of two for the joint
+    Hassan_Majer prompt), or a JSON list of FHuo statements taken
+    from the proposed answer. The same request and seed always give the same answer.
+    """
+    stage = _request_stage(body)
+    prompt = str((body.get('messages') or [{}])[-1].get('content', ''))
+    rng = random.Random(zlib.crc32(f'{seed}|{stage}|{prompt}'.encode('utf-8')))
+    if stage == 'labeling':
+        return f"[[{rng.choices(*LABELING_LABELS)[0]}]]"
+    if stage == 'Task_Classification':
+        return rng.choice(TASK_CATEGORIES)
+    if stage in ('Hassan', 'Majer'):
+        return rng.choices(*CW_LABELS)[0]
+    if stage == 'Hassan_Majer':
+        answer = {'Hassan': rng.choices(*CW_LABELS)[0], 'Majer': rng.choices(*CW_LABELS)[0]}
+        # Models do not always keep the key order of the prompt
+        keys = ['Hassan', 'Majer'] if rng.random() < 0.8 else ['Majer', 'Hassan']
+        return json.dumps({key: answer[key] for key in keys})
+    if stage == 'F_Huo':
+        match = _PROPOSED_ANSWER.search(prompt)
+        sentences = [s.strip() for s in _SENTENCE_END.split(match.group(1).strip()) if len(s.split()) >= 4] if match else []
+        statements = rng.sample(sentences, min(len(sentences), rng.randint(0, 8)))
+        return json.dumps(statements, ensure_ascii=False)
+    return 'OK'
+
+
+def _logprob_entry(token, logprob, top_logprobs=()):
+    return {'token': token, 'logprob': logprob, 'bytes': list(token.encode('utf-8')), 'top_logprobs': list(top_logprobs)}
+
+
+def fake_logprobs(body, content, seed=0):
+    """
+    `logprobs` block of a fake answer: one token per word. Label tokens (the first token, or each
+    NFS/UFS/CFS word of a joint answer) have the other labels of the stage as alternatives, so each label
+    has a confidence between ~0.5 and 1 (mostly above 0.9, as for a strong model).
+    """
+    stage = _request_stage(body)
+    prompt = str((body.get('messages') or [{}])[-1].get('content', ''))
+    rng = random.Random(zlib.crc32(f'{seed}|logprobs|{prompt}|{content}'.encode('utf-8')))
+    top_n = int(body.get('top_logprobs') or 0)
+    tokens = re.findall(r'\s*\S+', content) or ['']
+    if stage in ('Hassan', 'Majer', 'Hassan_Majer'):
+        labels = CW_LABELS[0]
+    elif stage == 'Task_Classification':
+        labels = [category.split()[0] for category in TASK_CATEGORIES]
+    else:
+        labels = [tokens[0]]
+    label_tokens = {i for i, token in enumerate(tokens) if any(label in token for label in labels)} if stage == 'Hassan_Majer' else {0}
+    content_logprobs = []
+    for i, token in enumerate(tokens):
+        if i in label_tokens:
+            label = next((label for label in labels if label in token), token)
+            others = [other for other in labels if other != label]
+            chosen = 1 - 0.5 * rng.betavariate(1, 6)
+            weights = [rng.random() for _ in others]
+            probabilities = [(token, chosen)] + [(token.replace(label, other), (1 - chosen) * w / sum(weights)) for other, w in zip(others, weights)]
+            probabilities.sort(key=lambda pair: -pair[1])
+            content_logprobs.append(_logprob_entry(token, math.log(chosen),
+                                                   [_logprob_entry(t, math.log(max(p, 1e-12))) for t, p in probabilities[:top_n]]))
+        else:
+            logprob = math.log(rng.uniform(0.9, 1.0))
+            content_logprobs.append(_logprob_entry(token, logprob, [_logprob_entry(token, logprob)][:top_n]))
+    return {'content': content_logprobs, 'refusal': None}
+
+
+def fake_chat_completion(body, seed=0):
+    """Chat completion response body (with usage, and logprobs if requested) for a request body."""
+    content = fake_completion_content(body, seed)
+    prompt_tokens = sum(_approx_tokens(str(message.get('content', ''))) for message in body.get('messages') or [])
+    completion_tokens = _approx_tokens(content)
+    choice = {'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}
+    if body.get('logprobs'):
+        choice['logprobs'] = fake_logprobs(body, content, seed)
+    return {
+        'id': f'chatcmpl-{uuid.uuid4().hex[:24]}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'mock'),
+        'choices': [choice],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens},
+    }
+
+
+class MockOpenAIState:
+    """
+    Files and batches of a mock OpenAI server, kept in memory.
+
+    A batch is validated instantly and then takes `batch_delay + seconds_per_request * requests` seconds;
+    its status and request counts are derived from the elapsed time whenever it is retrieved, and its
+    output and error files are written when it finishes. Each request fails with probability
+    `failure_rate`, and each batch expires with probability `expiry_rate` after processing only part of
+    its requests (the rest go to the error file with code batch_expired, as on the real API).
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, expiry_rate=0.0, batch_delay=2.0,
+                 seconds_per_request=0.001, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.expiry_rate = expiry_rate
+        self.batch_delay = batch_delay
+        self.seconds_per_request = seconds_per_request
+        self.seed = seed
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.RLock()
+        self.rng = random.Random(seed)
+
+    def add_file(self, content, filename='file.jsonl', purpose='batch'):
+        file_id = f'file-{uuid.uuid4().hex[:24]}'
+        self.files[file_id] = {
+            'object': {'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                       'filename': filename, 'purpose': purpose, 'status': 'processed'},
+            'content': content,
+        }
+        return self.files[file_id]['object']
+
+    def create_batch(self, input_file_id, endpoint, completion_window='24h', metadata=None):
+        lines = [line for line in self.files[input_file_id]['content'].decode('utf-8').splitlines() if line.strip()]
+        batch_id = f'batch_{uuid.uuid4().hex[:24]}'
+        now = time.time()
+        with self.lock:
+            expires = self.rng.random() < self.expiry_rate
+            processed_share = self.rng.uniform(0.3, 0.9) if expires else 1.0
+        self.batches[batch_id] = {
+            'object': {
+                'id': batch_id, 'object': 'batch', 'endpoint': endpoint, 'errors': None,
+                'input_file_id': input_file_id, 'completion_window': completion_window,
+                'status': 'validating', 'output_file_id': None, 'error_file_id': None,
+                'created_at': int(now), 'in_progress_at': None, 'expires_at': int(now) + 24 * 3600,
+                'finalizing_at': None, 'completed_at': None, 'failed_at': None, 'expired_at': None,
+                'cancelling_at': None, 'cancelled_at': None,
+                'request_counts': {'total': len(lines), 'completed': 0, 'failed': 0},
+                'metadata': metadata or {},
+            },
+            'requests': [json.loads(line) for line in lines],
+            'started': now,
+            'duration': self.batch_delay + self.seconds_per_request * len(lines),
+            'processed_share': processed_share,
+        }
+        return self.refresh_batch(batch_id)
+
+    def cancel_batch(self, batch_id):
+        with self.lock:
+            batch = self.batches[batch_id]
+            self.refresh_batch(batch_id)
+            if batch['object']['status'] in ('validating', 'in_progress'):
+                # Requests processed so far are kept, like the real API does on cancellation
+                elapsed = time.time() - batch['started']
+                batch['processed_share'] = min(elapsed / batch['duration'], 1.0) if batch['duration'] else 1.0
+                batch['object']['cancelling_at'] = int(time.time())
+                self._finish(batch, 'cancelled')
+            return batch['object']
+
+    def refresh_batch(self, batch_id):
+        """Advances a batch to the status its elapsed time implies and returns the batch object."""
+        with self.lock:
+            batch = self.batches[batch_id]
+            status = batch['object']['status']
+            if status not in ('validating', 'in_progress'):
+                return batch['object']
+            elapsed = time.time() - batch['started']
+            if elapsed >= batch['duration']:
+                self._finish(batch, 'completed' if batch['processed_share'] >= 1.0 else 'expired')
+            else:
+                batch['object']['status'] = 'in_progress'
+                batch['object']['in_progress_at'] = batch['object']['in_progress_at'] or int(time.time())
+                done = int(len(batch['requests']) * min(elapsed / batch['duration'], batch['processed_share']))
+                batch['object']['request_counts']['completed'] = done
+            return batch['object']
+
+    def _finish(self, batch, status):
+        """Answers the processed requests, writes the output and error files and sets the final status."""
+        requests = batch['requests']
+        processed = int(round(len(requests) * batch['processed_share']))
+        outputs, errors = [], []
+        for i, request in enumerate(requests):
+            line = {'id': f'batch_req_{uuid.uuid4().hex[:24]}', 'custom_id': request.get('custom_id'), 'response': None, 'error': None}
+            if i >= processed:
+                code = 'batch_expired' if status == 'expired' else 'batch_cancelled'
+                line['error'] = {'code': code, 'message': f'This request could not be executed before the batch was {status}.'}
+                errors.append(line)
+                continue
+            with self.lock:
+                failed = self.rng.random() < self.failure_rate
+            if failed:
+                line['response'] = {'status_code': 500, 'request_id': uuid.uuid4().hex,
+                                    'body': {'error': {'message': 'The server had an error processing your request.', 'type': 'server_error'}}}
+                errors.append(line)
+                continue
+            line['response'] = {'status_code': 200, 'request_id': uuid.uuid4().hex,
+                                'body': fake_chat_completion(request.get('body', {}), self.seed)}
+            outputs.append(line)
+        batch_object = batch['object']
+        now = int(time.time())
+        if outputs:
+            content = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in outputs).encode('utf-8')
+            batch_object['output_file_id'] = self.add_file(content, f"{batch_object['id']}_output.jsonl", 'batch_output')['id']
+        if errors:
+            content = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in errors).encode('utf-8')
+            batch_object['error_file_id'] = self.add_file(content, f"{batch_object['id']}_error.jsonl", 'batch_output')['id']
+        batch_object['request_counts'] = {'total': len(requests), 'completed': len(outputs), 'failed': len(errors)}
+        batch_object['status'] = status
+        batch_object['in_progress_at'] = batch_object['in_progress_at'] or now
+        batch_object['finalizing_at'] = now
+        batch_object[f'{status}_at'] = now
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Routes the Files, Batches and Chat Completions endpoints to the server's MockOpenAIState."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('x-request-id', uuid.uuid4().hex)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message, error_type='invalid_request_error'):
+        self._send_json({'error': {'message': message, 'type': error_type, 'param': None, 'code': None}}, status)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _path(self):
+        # Accept both /v1/files and /files (base URLs with or without /v1)
+        path = self.path.split('?', 1)[0].rstrip('/')
+        return path[3:] if path.startswith('/v1/') else path
+
+    def do_GET(self):
+        state = self.server.state
+        path = self._path()
+        match = re.fullmatch(r'/files/([\w-]+)(/content)?', path)
+        if match:
+            file = state.files.get(match.group(1))
+            if file is None:
+                return self._send_error(404, f"No such File object: {match.group(1)}")
+            if not match.group(2):
+                return self._send_json(file['object'])
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(file['content'])))
+            self.end_headers()
+            self.wfile.write(file['content'])
+            return
+        match = re.fullmatch(r'/batches/([\w-]+)', path)
+        if match:
+            if match.group(1) not in state.batches:
+                return self._send_error(404, f"No batch found with id '{match.group(1)}'.")
+            return self._send_json(state.refresh_batch(match.group(1)))
+        if path == '/batches':
+            batches = [state.refresh_batch(batch_id) for batch_id in reversed(list(state.batches))]
+            return self._send_json({'object': 'list', 'data': batches, 'has_more': False,
+                                    'first_id': batches[0]['id'] if batches else None,
+                                    'last_id': batches[-1]['id'] if batches else None})
+        return self._send_error(404, f"Unknown path: {self.path}")
+
+    def do_POST(self):
+        state = self.server.state
+        path = self._path()
+        body = self._read_body()
+        if path == '/files':
+            # multipart/form-data with a `file` part and a `purpose` field
+            message = BytesParser(policy=HTTP).parsebytes(
+                b'Content-Type: ' + self.headers.get('Content-Type', '').encode('latin-1') + b'\r\n\r\n' + body)
+            parts = {part.get_param('name', header='content-disposition'): part for part in message.iter_parts()}
+            if 'file' not in parts:
+                return self._send_error(400, "Missing file")
+            purpose = parts['purpose'].get_content().strip() if 'purpose' in parts else 'batch'
+            filename = parts['file'].get_filename() or 'file.jsonl'
+            return self._send_json(state.add_file(parts['file'].get_payload(decode=True), filename, purpose))
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            return self._send_error(400, "Request body is not valid JSON")
+        if path == '/batches':
+            if payload.get('input_file_id') not in state.files:
+                return self._send_error(400, f"Invalid input_file_id: {payload.get('input_file_id')}")
+            return self._send_json(state.create_batch(payload['input_file_id'], payload.get('endpoint', '/v1/chat/completions'),
+                                                      payload.get('completion_window', '24h'), payload.get('metadata')))
+        match = re.fullmatch(r'/batches/([\w-]+)/cancel', path)
+        if match:
+            if match.group(1) not in state.batches:
+                return self._send_error(404, f"No batch found with id '{match.group(1)}'.")
+            return self._send_json(state.cancel_batch(match.group(1)))
+        if path == '/chat/completions':
+            with state.lock:
+                delay = state.rng.expovariate(1 / state.latency) if state.latency > 0 else 0.0
+                failed = state.rng.random() < state.failure_rate
+            time.sleep(delay)
+            if failed:
+                return self._send_error(500, 'The server had an error processing your request.', 'server_error')
+            return self._send_json(fake_chat_completion(payload, state.seed))
+        return self._send_error(404, f"Unknown path: {self.path}")
+
+
+def make_server(host='127.0.0.1', port=8000, verbose=False, **options):
+    """
+    Builds (without starting) a threaded mock server; `options` are MockOpenAIState arguments.
+    Use port 0 for a free port (the chosen one is server.server_address[1]).
+    """
+    server = ThreadingHTTPServer((host, port), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.state = MockOpenAIState(**options)
+    server.verbose = verbose
+    return server
+
+
+def start_server_in_thread(**kwargs):
+    """Starts a mock server in a daemon thread and returns (server, base_url); stop it with server.shutdown()."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Files, Batches and Chat Completions APIs.")
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port (default: 8000)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mean chat completion latency in seconds, exponentially distributed (default: 0)')
+    parser.add_argument('--failure_rate', type=float, default=0.0, help='Share of requests answered with a 500 error (default: 0)')
+    parser.add_argument('--expiry_rate', type=float, default=0.0, help='Share of batches that expire after processing only part of their requests (default: 0)')
+    parser.add_argument('--batch_delay', type=float, default=2.0, help='Fixed processing time of a batch in seconds (default: 2)')
+    parser.add_argument('--seconds_per_request', type=float, default=0.001, help='Batch processing time per request (default: 0.001)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the fake answers and of the failure/expiry draws (default: 0)')
+    parser.add_argument('--verbose', action='store_true', help='Log every HTTP request')
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, verbose=args.verbose, latency=args.latency, failure_rate=args.failure_rate,
+                         expiry_rate=args.expiry_rate, batch_delay=args.batch_delay,
+                         seconds_per_request=args.seconds_per_request, seed=args.seed)
+    host, port = server.server_address[:2]
+    print(f"🚀 Mock OpenAI server listening on http://{host}:{port}/v1")
+    print(f"   export OPENAI_BASE_URL=http://{host}:{port}/v1 OPENAI_API_KEY=mock")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
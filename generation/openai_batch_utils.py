@@ -4,7 +4,14 @@ import os
 from openai import OpenAI
 
 
-def submit_openai_batch(jsonl_path: str, metadata_path: str, description: str = "batch run", completion_window: str = "24h") -> dict:
+def errors_path_for(results_path):
+    """Where the items that failed are saved next to a results file, mirroring the Batch API error file."""
+    root, ext = os.path.splitext(results_path)
+    return f"{root}_errors{ext}"
+
+
+def submit_openai_batch(jsonl_path: str, metadata_path: str, description: str = "batch run", completion_window: str = "24h",
+                        base_url: str = None, metadata: dict = None) -> dict:
     """
     Submits a batch job to OpenAI and saves metadata for later retrieval.
 
@@ -13,11 +20,13 @@ def submit_openai_batch(jsonl_path: str, metadata_path: str, description: str =
         metadata_path (str): Where to save the metadata JSON.
         description (str): Description for the batch job.
         completion_window (str): Completion window for the batch job.
+        base_url (str): OpenAI-compatible API base URL, e.g. mock_openai_server.py (default: OPENAI_BASE_URL or the real API).
+        metadata (dict): Extra string fields (e.g. prompt_template, prompt_version) recorded with the batch and in the metadata file.
 
     Returns:
         dict: Metadata including batch ID and input file ID.
     """
-    openai_client = OpenAI()
+    openai_client = OpenAI(base_url=base_url)
     with open(jsonl_path, "rb") as f:
         input_file = openai_client.files.create(file=f, purpose="batch")
     print(f"✅ Uploaded file: {input_file.id}")
@@ -25,72 +34,117 @@ def submit_openai_batch(jsonl_path: str, metadata_path: str, description: str =
         input_file_id=input_file.id,
         endpoint="/v1/chat/completions",
         completion_window=completion_window,
-        metadata={"description": description}
+        metadata={"description": description, **(metadata or {})}
     )
     print(f"🚀 Batch submitted: {batch.id}")
     metadata = {
         "batch_id": batch.id,
-        "input_file_id": input_file.id
+        "input_file_id": input_file.id,
+        **(metadata or {})
     }
     with open(metadata_path, "a", encoding="utf-8") as f:
         f.write(json.dumps(metadata, ensure_ascii=False) + "\n")
     return metadata
 
 
-def get_batch_statuses_from_metadata(metadata_jsonl_path: str) -> list:
+# Statuses after which a batch will not process any more requests
+TERMINAL_BATCH_STATUSES = ("completed", "expired", "cancelled", "failed")
+
+
+def read_batch_metadata(metadata_path: str) -> list:
+    """
+    Reads the batch records of a metadata JSONL file (one line per submitted batch).
+    Metadata saved as a single indented JSON object by older versions is read as one record.
+    """
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            records = []
+            break
+    if not records and text.strip():
+        try:
+            records = [json.loads(text)]
+        except json.JSONDecodeError:
+            print(f"Skipping invalid metadata file: {metadata_path}")
+    return [record for record in records if record.get("batch_id")]
+
+
+def get_batch_statuses_from_metadata(metadata_jsonl_path: str, base_url: str = None) -> list:
     """
     Retrieves the status of all batches listed in a metadata JSONL file.
 
     Args:
         metadata_jsonl_path (str): Path to the metadata JSONL file.
+        base_url (str): OpenAI-compatible API base URL (default: OPENAI_BASE_URL or the real API).
 
     Returns:
         list: List of dicts with batch_id and status.
     """
-    client = OpenAI()
+    client = OpenAI(base_url=base_url)
     statuses = []
-    with open(metadata_jsonl_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                data = json.loads(line)
-                batch_id = data.get('batch_id')
-                if batch_id:
-                    response = client.batches.retrieve(batch_id)
-                    print(response)
-                    statuses.append({'batch_id': batch_id, 'status': response.status})
-            except json.JSONDecodeError:
-                print(f"Skipping invalid JSON line: {line}")
+    for data in read_batch_metadata(metadata_jsonl_path):
+        response = client.batches.retrieve(data["batch_id"])
+        print(response)
+        statuses.append({'batch_id': data["batch_id"], 'status': response.status})
     return statuses
 
 
-def fetch_batch_output(metadata_path: str, save_path: str):
+def fetch_batch_output(metadata_path: str, save_path: str, base_url: str = None) -> bool:
     """
-    Fetches and saves the completed batch output file.
+    Fetches and saves the output of every batch listed in a metadata JSONL file, once all of them have ended.
+
+    Batches that expired, were cancelled or failed are harvested like completed ones: the requests they
+    processed go to `save_path` and the rest are listed in the error file (`*_errors.jsonl`), from which
+    batch_retry.py resubmits only the remainder.
 
     Args:
-        metadata_path (str): Path to saved batch metadata (JSON file).
+        metadata_path (str): Path to the batch metadata JSONL file written by submit_openai_batch.
         save_path (str): File path to save the output.
+        base_url (str): OpenAI-compatible API base URL (default: OPENAI_BASE_URL or the real API).
+
+    Returns:
+        bool: True if the output was saved, False while a batch is still running.
     """
-    openai_client = OpenAI()
-    with open(metadata_path, "r") as meta_f:
-        metadata = json.load(meta_f)
-    batch_id = metadata["batch_id"]
-    batch = openai_client.batches.retrieve(batch_id)
-    print(f"📦 Batch status: {batch.status}")
-    if batch.status != "completed":
+    openai_client = OpenAI(base_url=base_url)
+    records = read_batch_metadata(metadata_path)
+    batches = [openai_client.batches.retrieve(record["batch_id"]) for record in records]
+    for batch in batches:
+        print(f"📦 Batch {batch.id} status: {batch.status}")
+    if not batches or any(batch.status not in TERMINAL_BATCH_STATUSES for batch in batches):
         print("⏳ Batch is not completed yet.")
-        return
-    output_file_id = batch.output_file_id
-    metadata["output_file_id"] = output_file_id
-    file_content = openai_client.files.content(output_file_id)
-    with open(save_path, "w", encoding="utf-8") as f:
-        f.write(file_content.text)
+        return False
+    errors_path = errors_path_for(save_path)
+    with open(save_path, "w", encoding="utf-8") as out_f, open(errors_path, "w", encoding="utf-8") as error_f:
+        for record, batch in zip(records, batches):
+            record["status"] = batch.status
+            # A batch whose requests all failed (or that failed validation) has no output file
+            if batch.output_file_id:
+                record["output_file_id"] = batch.output_file_id
+                out_f.write(_with_final_newline(openai_client.files.content(batch.output_file_id).text))
+            # Failed requests, and those an expired or cancelled batch never ran, are only in the error file
+            if batch.error_file_id:
+                record["error_file_id"] = batch.error_file_id
+                error_f.write(_with_final_newline(openai_client.files.content(batch.error_file_id).text))
+            if batch.status != "completed":
+                counts = batch.request_counts
+                done = f"{counts.completed}/{counts.total}" if counts else "0"
+                print(f"⚠️ Batch {batch.id} {batch.status}: harvested {done} processed requests")
     print(f"✅ Output file saved to {save_path}")
-    with open(metadata_path, "w") as meta_f:
-        json.dump(metadata, meta_f, indent=2)
+    with open(metadata_path, "w", encoding="utf-8") as meta_f:
+        for record in records:
+            meta_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return True
+
+
+def _with_final_newline(text):
+    return text if not text or text.endswith("\n") else text + "\n"
 
 
 def split_jsonl_file(input_jsonl_path, output_dir, lines_per_file=10000):
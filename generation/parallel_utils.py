@@ -0,0 +1,107 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+
+# Each worker gets a few partitions so a slow conversation does not stall the pool.
+PARTITIONS_PER_WORKER = 4
+
+
+def resolve_workers(workers):
+    """
+    Normalizes a --workers value: None/1 means serial, 0 or negative means all cores.
+    """
+    if workers is None:
+        return 1
+    workers = int(workers)
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def partition_by_conversation(df, num_partitions, key="Conversation_Hash"):
+    """
+    Splits a DataFrame into contiguous partitions, cutting only where the value of `key` changes.
+
+    Rows of one conversation are never split across partitions (as long as they are contiguous,
+    which is how every exploded file in this pipeline is written), and concatenating the
+    partitions in order gives back the original DataFrame.
+
+    Args:
+        df (pd.DataFrame): Input rows.
+        num_partitions (int): Desired number of partitions (may return fewer).
+        key (str): Column used to group rows.
+
+    Returns:
+        list: List of DataFrames.
+    """
+    if num_partitions <= 1 or len(df) <= 1:
+        return [df]
+    if key in df.columns:
+        keys = df[key].astype(str).to_numpy()
+        boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    else:
+        boundaries = np.arange(1, len(df))
+    if len(boundaries) == 0:
+        return [df]
+    targets = np.linspace(0, len(df), num_partitions + 1)[1:-1]
+    positions = np.clip(np.searchsorted(boundaries, targets), 0, len(boundaries) - 1)
+    cuts = np.unique(boundaries[positions])
+    edges = [0] + cuts.tolist() + [len(df)]
+    return [df.iloc[start:end] for start, end in zip(edges[:-1], edges[1:]) if end > start]
+
+
+def _concat_results(results):
+    results = [r for r in results if r is not None]
+    if not results:
+        return None
+    first = results[0]
+    if isinstance(first, pd.DataFrame):
+        non_empty = [r for r in results if len(r.columns) > 0]
+        return pd.concat(non_empty, ignore_index=True) if non_empty else pd.DataFrame()
+    if isinstance(first, pd.Series):
+        return pd.concat(results)
+    return list(chain.from_iterable(results))
+
+
+def run_partitioned(df, func, workers=1, key="Conversation_Hash", **kwargs):
+    """
+    Runs `func(partition, **kwargs)` over partitions of `df` and concatenates the results in order.
+
+    `func` must be a module-level function so it can be sent to worker processes. It may return a
+    DataFrame, a Series or a list; results are concatenated in partition order, so the output is
+    identical to calling `func(df, **kwargs)` directly.
+
+    Args:
+        df (pd.DataFrame): Input rows.
+        func (callable): Per-partition function.
+        workers (int): Number of worker processes (1 runs in-process, 0 uses all cores).
+        key (str): Column used to partition rows (default: Conversation_Hash).
+
+    Returns:
+        The concatenated result.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        return func(df, **kwargs)
+    partitions = partition_by_conversation(df, workers * PARTITIONS_PER_WORKER, key=key)
+    if len(partitions) == 1:
+        return func(df, **kwargs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(partial(func, **kwargs), partitions))
+    return _concat_results(results)
+
+
+def map_in_pool(func, items, workers=1, chunksize=64):
+    """
+    Applies `func` to every item, optionally in a process pool, and returns results in input order.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        return [func(item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
@@ -3,24 +3,14 @@ import re
 import argparse
 import os
 
-def explode_all_system_utterances_with_all_columns(input_csv, output_dir):
-    """
-    For each row in the input CSV, create a new row for every system utterance (Agent/System),
-    with context, preceding user question, and all original columns, ready for claim extraction.
-    Context_String will be a Python-style list of utterance strings.
-    Saves the exploded CSV as 'exploded_system.csv' in output_dir.
-    """
-    output_csv = os.path.join(output_dir, "exploded_system.csv")
-    df = pd.read_csv(input_csv)
-    system_pattern = re.compile(r'Utterance-(\d+) \((Agent|System)\)')
+from parallel_utils import run_partitioned
+from telemetry import instrumented, add_rows
 
-    all_columns = list(df.columns) + [
-        'Turn_Num', 'Context_String', 'Corresponding_User_Question',
-        'Selected_Agent_Utterance', 'Selected_Agent_Column'
-    ]
 
+def _explode_system_rows(df):
+    """Returns one dict per system utterance in `df` (the per-partition body of the explosion)."""
+    system_pattern = re.compile(r'Utterance-(\d+) \((Agent|System)\)')
     exploded_rows = []
-
     for idx, row in df.iterrows():
         # Find all system utterance columns for this row
         system_cols = [col for col in df.columns if system_pattern.match(col) and pd.notna(row[col]) and str(row[col]).strip() != '']
@@ -50,6 +40,28 @@ def explode_all_system_utterances_with_all_columns(input_csv, output_dir):
                 'Selected_Agent_Column': sys_col,
             })
             exploded_rows.append(new_row)
+    return exploded_rows
+
+
+@instrumented('preprocess_explode')
+def explode_all_system_utterances_with_all_columns(input_csv, output_dir, workers=1):
+    """
+    For each row in the input CSV, create a new row for every system utterance (Agent/System),
+    with context, preceding user question, and all original columns, ready for claim extraction.
+    Context_String will be a Python-style list of utterance strings.
+    Saves the exploded CSV as 'exploded_system.csv' in output_dir.
+    With workers > 1 the rows are partitioned by Conversation_Hash across a process pool.
+    """
+    output_csv = os.path.join(output_dir, "exploded_system.csv")
+    df = pd.read_csv(input_csv)
+    add_rows(len(df))
+
+    all_columns = list(df.columns) + [
+        'Turn_Num', 'Context_String', 'Corresponding_User_Question',
+        'Selected_Agent_Utterance', 'Selected_Agent_Column'
+    ]
+
+    exploded_rows = run_partitioned(df, _explode_system_rows, workers=workers)
 
     exploded_df = pd.DataFrame(exploded_rows)
     # Ensure all columns are present and in the same order
@@ -63,20 +75,8 @@ def explode_all_system_utterances_with_all_columns(input_csv, output_dir):
     return output_csv
 
 
-def generate_context_string(exploded_csv, output_dir, seed=42):
-    """
-    Generates a context string containing conversation history before the selected agent utterance.
-    The context includes all user-system exchanges up to but not including the selected utterance.
-    Saves the file as 'context_system.csv' in output_dir.
-    """
-    output_csv_path = os.path.join(output_dir, "context_system.csv")
-    df = pd.read_csv(exploded_csv)
-    print(f"🔍 Generating context strings from {exploded_csv}")
-    print("-" * 60)
-    print(f"Original rows: {len(df)}")
-    if 'Selected_Agent_Column' not in df.columns:
-        print("❌ Selected_Agent_Column not found! Run select_random_agent_utterance first.")
-        return None
+def _context_strings_for_rows(df):
+    """Returns the context string of every row in `df` (the per-partition body of generate_context_string)."""
     context_strings = []
     for idx, row in df.iterrows():
         selected_column = row.get('Selected_Agent_Column', '')
@@ -105,6 +105,26 @@ def generate_context_string(exploded_csv, output_dir, seed=42):
         else:
             context_string = "[]"
         context_strings.append(context_string)
+    return context_strings
+
+
+@instrumented('preprocess_context')
+def generate_context_string(exploded_csv, output_dir, seed=42, workers=1):
+    """
+    Generates a context string containing conversation history before the selected agent utterance.
+    The context includes all user-system exchanges up to but not including the selected utterance.
+    Saves the file as 'context_system.csv' in output_dir.
+    """
+    output_csv_path = os.path.join(output_dir, "context_system.csv")
+    df = pd.read_csv(exploded_csv)
+    add_rows(len(df))
+    print(f"🔍 Generating context strings from {exploded_csv}")
+    print("-" * 60)
+    print(f"Original rows: {len(df)}")
+    if 'Selected_Agent_Column' not in df.columns:
+        print("❌ Selected_Agent_Column not found! Run select_random_agent_utterance first.")
+        return None
+    context_strings = run_partitioned(df, _context_strings_for_rows, workers=workers)
     df['Context_String'] = context_strings
     df.to_csv(output_csv_path, index=False)
     print(f"💾 CSV with context strings saved to: {output_csv_path}")
@@ -116,7 +136,8 @@ def generate_context_string(exploded_csv, output_dir, seed=42):
     return output_csv_path
 
 
-def preprocess(input_csv, output_dir):
+@instrumented('preprocess')
+def preprocess(input_csv, output_dir, workers=1):
     """
     Runs the full preprocessing pipeline:
     1. Explodes all system utterances with all columns.
@@ -124,9 +145,9 @@ def preprocess(input_csv, output_dir):
     3. Merges context strings into the exploded DataFrame and saves a unified CSV.
     """
     print("Exploding all system utterances...")
-    exploded_csv_path = explode_all_system_utterances_with_all_columns(input_csv, output_dir)
+    exploded_csv_path = explode_all_system_utterances_with_all_columns(input_csv, output_dir, workers=workers)
     print("Generating context strings...")
-    context_csv_path = generate_context_string(exploded_csv_path, output_dir)
+    context_csv_path = generate_context_string(exploded_csv_path, output_dir, workers=workers)
 
     # Load both DataFrames
     exploded_df = pd.read_csv(exploded_csv_path)
@@ -146,9 +167,10 @@ def main():
     parser = argparse.ArgumentParser(description="Explode system utterances and generate context strings.")
     parser.add_argument('--input_csv', required=True, help='Path to the input CSV file')
     parser.add_argument('--output_dir', required=True, help='Directory to save all outputs')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes, partitioned by Conversation_Hash (default: 1, 0 = all cores)')
     args = parser.parse_args()
     os.makedirs(args.output_dir, exist_ok=True)
-    preprocess(args.input_csv, args.output_dir)
+    preprocess(args.input_csv, args.output_dir, workers=args.workers)
 
 if __name__ == "__main__":
     main()
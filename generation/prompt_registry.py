@@ -0,0 +1,88 @@
+import os
+import glob
+import hashlib
+import string
+from functools import lru_cache
+
+
+PROMPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'prompts'))
+
+
+class PromptTemplate:
+    """
+    A prompt loaded from prompts/<name>.txt, precompiled for fast rendering.
+
+    Placeholders use str.format syntax ({factual_claim}, {context}, ...). At load time the template is
+    compiled into a printf-style string, so rendering is a single C-level `%` operation and values
+    containing braces or percent signs are inserted verbatim.
+
+    Attributes:
+        name (str): File stem, e.g. "Majer".
+        text (str): Raw template text.
+        fields (tuple): Placeholder names in order of first appearance.
+        version (str): Short SHA-256 of the template text; changes whenever the prompt changes.
+    """
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        self.version = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+        parts = []
+        fields = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(text):
+            parts.append(literal.replace('%', '%%'))
+            if field_name is not None:
+                if not field_name.isidentifier() or format_spec or conversion:
+                    raise ValueError(f"Unsupported placeholder {{{field_name}}} in prompt '{name}'")
+                parts.append(f"%({field_name})s")
+                if field_name not in fields:
+                    fields.append(field_name)
+        self.fields = tuple(fields)
+        self._compiled = ''.join(parts)
+
+    def render(self, **values):
+        """Fills every placeholder; raises KeyError naming the missing field."""
+        try:
+            return self._compiled % values
+        except KeyError as e:
+            raise KeyError(f"Prompt '{self.name}' needs a value for {e}") from None
+
+    def metadata(self):
+        """Template name and version, recorded in the batch metadata of every batch built from this template."""
+        return {"prompt_template": self.name, "prompt_version": self.version}
+
+    def __repr__(self):
+        return f"PromptTemplate(name={self.name!r}, version={self.version!r}, fields={self.fields!r})"
+
+
+@lru_cache(maxsize=None)
+def load_prompt_registry(prompts_dir=PROMPTS_DIR):
+    """
+    Loads and compiles every prompts/*.txt file once per process.
+
+    Returns:
+        dict: Template name (file stem) -> PromptTemplate.
+    """
+    registry = {}
+    for path in sorted(glob.glob(os.path.join(prompts_dir, '*.txt'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'r', encoding='utf-8') as f:
+            registry[name] = PromptTemplate(name, f.read())
+    return registry
+
+
+def get_prompt(name, prompts_dir=PROMPTS_DIR):
+    """Returns the compiled template prompts/<name>.txt."""
+    registry = load_prompt_registry(prompts_dir)
+    if name not in registry:
+        raise ValueError(f"Unknown prompt template: {name} (available: {', '.join(registry)})")
+    return registry[name]
+
+
+def main():
+    for template in load_prompt_registry().values():
+        print(f"{template.name:<22} {template.version}  fields: {', '.join(template.fields) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
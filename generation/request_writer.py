@@ -0,0 +1,171 @@
+import os
+import re
+import glob
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from parallel_utils import partition_by_conversation, resolve_workers
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder
+    orjson = None
+
+
+# Rows serialized per chunk; chunks are the unit of work sent to each worker process.
+CHUNK_ROWS = 5000
+# Most requests one Batch API input file may hold
+BATCH_API_MAX_REQUESTS = 50_000
+
+
+def dumps_line(obj):
+    """Serializes one request object to a UTF-8 JSONL line (bytes, newline-terminated)."""
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _serialize_chunk(chunk_df, build_request, build_kwargs):
+    """Builds and serializes the requests of one chunk; returns a list of encoded lines."""
+    lines = []
+    for row in chunk_df.to_dict("records"):
+        request_obj = build_request(row, **build_kwargs)
+        if request_obj is not None:
+            lines.append(dumps_line(request_obj))
+    return lines
+
+
+def _iter_serialized_chunks(df, build_request, build_kwargs, workers, chunk_rows):
+    """Yields serialized chunks in input order, computing them in a process pool when workers > 1."""
+    num_chunks = max(1, math.ceil(len(df) / chunk_rows))
+    chunks = partition_by_conversation(df, num_chunks)
+    serialize = partial(_serialize_chunk, build_request=build_request, build_kwargs=build_kwargs)
+    if workers == 1 or len(chunks) == 1:
+        for chunk_df in chunks:
+            yield serialize(chunk_df)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # executor.map keeps input order, so the file is identical to a serial run
+        yield from executor.map(serialize, chunks)
+
+
+def shard_path(output_path, shard_num, sharded):
+    """Returns the file path of one shard: foo.jsonl -> foo_part_01.jsonl."""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_part_{shard_num:02d}{ext}" if sharded else output_path
+
+
+def _shard_files(output_path):
+    """Shard files of `output_path` on disk (foo_part_NN.jsonl), in shard order."""
+    root, ext = os.path.splitext(output_path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"_part_(\d+)" + re.escape(ext) + "$")
+    shards = {}
+    for path in glob.glob(f"{glob.escape(root)}_part_*{ext}"):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            shards[int(match.group(1))] = path
+    return [shards[num] for num in sorted(shards)]
+
+
+def request_shard_paths(requests_path):
+    """
+    Request files to submit for `requests_path`: the shards write_batch_requests split it into, or the
+    file itself when it was not sharded. A list of paths is returned as is.
+    """
+    if isinstance(requests_path, (list, tuple)):
+        return list(requests_path)
+    return _shard_files(requests_path) or [requests_path]
+
+
+class _ShardedWriter:
+    """Streams encoded lines into one or more shard files and tracks their sizes."""
+
+    def __init__(self, output_path, max_requests=None, max_bytes=None):
+        self.output_path = output_path
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.sharded = bool(max_requests or max_bytes)
+        self.shards = []
+        self._file = None
+
+    def _open_next(self):
+        self.close()
+        path = shard_path(self.output_path, len(self.shards) + 1, self.sharded)
+        self._file = open(path, "wb")
+        self.shards.append({"path": path, "requests": 0, "bytes": 0})
+
+    def write(self, line):
+        shard = self.shards[-1] if self.shards else None
+        if (
+            shard is None
+            or (self.max_requests and shard["requests"] >= self.max_requests)
+            or (self.max_bytes and shard["requests"] and shard["bytes"] + len(line) > self.max_bytes)
+        ):
+            self._open_next()
+            shard = self.shards[-1]
+        self._file.write(line)
+        shard["requests"] += 1
+        shard["bytes"] += len(line)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def write_batch_requests(
+    df,
+    build_request,
+    output_path,
+    workers=1,
+    max_requests_per_shard=None,
+    max_bytes_per_shard=None,
+    chunk_rows=CHUNK_ROWS,
+    **build_kwargs,
+):
+    """
+    Writes a Batch API request file from a DataFrame, one request per row.
+
+    Rows are serialized in chunks (in a process pool when workers > 1) and streamed to disk in input
+    order, so memory stays bounded by a few chunks rather than the whole file. Request files left by an
+    earlier run at the same path (the file or its shards) are removed first, so request_shard_paths only
+    finds the files of this run.
+
+    Args:
+        df (pd.DataFrame): Input rows.
+        build_request (callable): Module-level function `build_request(row: dict, **build_kwargs)` that
+            returns the request object for a row, or None to skip it.
+        output_path (str): Path of the JSONL file (shards get a `_part_NN` suffix).
+        workers (int): Number of worker processes (0 = all cores).
+        max_requests_per_shard (int): Start a new shard after this many requests (Batch API limit: 50,000).
+        max_bytes_per_shard (int): Start a new shard before exceeding this many bytes (Batch API limit: 200 MB).
+        chunk_rows (int): Rows per serialization chunk.
+
+    Returns:
+        list: One dict per shard with its path, number of requests and bytes.
+    """
+    workers = resolve_workers(workers)
+    for path in _shard_files(output_path) + [output_path]:
+        if os.path.exists(path):
+            os.remove(path)
+    writer = _ShardedWriter(output_path, max_requests_per_shard, max_bytes_per_shard)
+    try:
+        for lines in _iter_serialized_chunks(df, build_request, build_kwargs, workers, chunk_rows):
+            for line in lines:
+                writer.write(line)
+        if not writer.shards:
+            writer._open_next()
+    finally:
+        writer.close()
+    for shard in writer.shards:
+        print(f"📦 {shard['path']}: {shard['requests']} requests, {shard['bytes'] / 1e6:.1f} MB")
+    return writer.shards
+
+
+def add_shard_arguments(parser):
+    """Adds the --max_requests_per_shard option shared by the LLM stages."""
+    parser.add_argument('--max_requests_per_shard', type=int, default=None,
+                        help=f'Split the request file into *_part_NN.jsonl shards of at most this many requests, '
+                             f'each submitted as its own batch (Batch API limit: {BATCH_API_MAX_REQUESTS})')
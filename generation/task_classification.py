@@ -11,9 +11,16 @@ from openai import OpenAI
 import numpy as np
 import argparse
 
-from openai_batch_utils import submit_openai_batch, get_batch_statuses_from_metadata, fetch_batch_output, split_jsonl_file
+from request_writer import write_batch_requests, add_shard_arguments
+from prompt_registry import get_prompt
+from inference_backends import add_backend_arguments, backend_from_args
+from batch_retry import add_retry_arguments, retry_failed_items
+from label_logprobs import with_logprobs, label_probabilities, add_probability_columns
+from task_labels import TASK_CATEGORIES, canonicalize_task_labels, is_valid_task_answer
+from telemetry import instrumented, add_rows, add_usage
 
 
+@instrumented('task_explode')
 def explode_all_user_utterances_with_all_columns(input_csv, output_dir):
     """
     For each row in the input CSV, create a new row for every user utterance,
@@ -23,6 +30,7 @@ def explode_all_user_utterances_with_all_columns(input_csv, output_dir):
     """
     output_csv = os.path.join(output_dir, "exploded_user_utterances.csv")
     df = pd.read_csv(input_csv)
+    add_rows(len(df))
     user_pattern = re.compile(r'Utterance-(\d+) \(User\)')
 
     all_columns = list(df.columns) + [
@@ -81,71 +89,70 @@ def explode_all_user_utterances_with_all_columns(input_csv, output_dir):
     return output_csv
 
 
+def _build_task_classification_request(row, model_name, logprobs=False):
+    """Builds the task classification request for one user utterance row, or None if it is incomplete."""
+    user_utterance = str(row["Selected_User_Utterance"]).strip()
+    context_str = str(row["Context_String"]).strip()
+    conversation_hash = str(row["Conversation_Hash"]).strip()
+    turn_num = str(row["Turn_Num"]).strip()
+    
+    if not user_utterance or not conversation_hash or not turn_num:
+        return None
+    
+    template = get_prompt("Task_Classification")
+    # {classification} is left empty so the prompt ends where the model should answer
+    prompt = template.render(user_turn=user_utterance, context=context_str, classification="")
+    
+    request = {
+        "custom_id": f"{conversation_hash}_{turn_num}",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model_name,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant that classifies user utterances into task categories."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0,
+            "max_tokens": 1000
+        }
+    }
+    if logprobs:
+        request["body"] = with_logprobs(request["body"])
+    return request
+
+
+@instrumented('task_requests')
 def make_task_classification_batch_request_file(
-    input_csv_path, output_jsonl_path, model_name="gpt-4.1-2025-04-14"
+    input_csv_path, output_jsonl_path, model_name="gpt-4.1-2025-04-14", workers=1,
+    max_requests_per_shard=None, logprobs=False
 ):
     """
     Creates a batch request file for task classification using OpenAI batch API.
     Each request uses Selected_User_Utterance as the input and Context_String as context.
     custom_id is set to conversation_hash + turn_num.
+    With logprobs, the requests also ask for the logprobs of the answer tokens (category confidence).
+    With max_requests_per_shard, the file is split into *_part_NN.jsonl shards (one batch each).
+    Returns the paths of the request files written.
     """
     df = pd.read_csv(input_csv_path)
+    add_rows(len(df))
     required_columns = ["Selected_User_Utterance", "Context_String", "Conversation_Hash", "Turn_Num"]
     for col in required_columns:
         if col not in df.columns:
             raise ValueError(f"Missing required column: {col}")
     
-    with open(output_jsonl_path, "w", encoding="utf-8") as f:
-        for i, row in df.iterrows():
-            user_utterance = str(row["Selected_User_Utterance"]).strip()
-            context_str = str(row["Context_String"]).strip()
-            conversation_hash = str(row["Conversation_Hash"]).strip()
-            turn_num = str(row["Turn_Num"]).strip()
-            
-            if not user_utterance or not conversation_hash or not turn_num:
-                continue
-            
-            prompt = (
-        "You are given a conversation context and a user turn. Classify the user turn into one of the following categories without additional explanation:\n"
-        "• Information seeking - Users ask for specific information or facts about various topics.\n"
-        "• Reasoning - Queries require logical thinking, problem-solving, or processing of complex ideas.\n"
-        "• Planning - Users need assistance in creating plans or strategies for activities and projects.\n"
-        "• Editing - Involves editing, rephrasing, proofreading, or other tasks related to the composition of general written content.\n"
-        "• Coding & Debugging - Users seek help with writing, reviewing, or fixing code in programming.\n"
-        "• Math - Queries related to mathematical concepts, problems, and calculations.\n"
-        "• Role playing - Users engage in scenarios requiring ChatGPT to adopt a character or persona.\n"
-        "• Data Analysis - Requests involve interpreting data, statistics, or performing analytical tasks.\n"
-        "• Creative Writing - Users seek assistance with crafting stories, poems, or other creative texts.\n"
-        "• Advice seeking - Users ask for recommendations or guidance on various personal or professional issues.\n"
-        "• Brainstorming - Involves generating ideas, creative thinking, or exploring possibilities.\n"
-        "• Others - Any queries that do not fit into the above categories or are of a miscellaneous nature.\n"
-        "User turn:\n"
-        "{user_turn}\n"
-        "Context:\n"
-        "{context}\n"
-        "Classification for user turn:\n"
-        "{classification}"
-            )
-            
-            request_obj = {
-                "custom_id": f"{conversation_hash}_{turn_num}",
-                "method": "POST",
-                "url": "/v1/chat/completions",
-                "body": {
-                    "model": model_name,
-                    "messages": [
-                        {"role": "system", "content": "You are a helpful assistant that classifies user utterances into task categories."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0,
-                    "max_tokens": 1000
-                }
-            }
-            f.write(json.dumps(request_obj, ensure_ascii=False) + "\n")
+    shards = write_batch_requests(
+        df, _build_task_classification_request, output_jsonl_path, workers=workers,
+        max_requests_per_shard=max_requests_per_shard, model_name=model_name,
+        logprobs=logprobs
+    )
     
-    print(f"✅ Task classification batch request file saved to: {output_jsonl_path}")
+    print(f"✅ Task classification batch request file saved to: {output_jsonl_path} (prompt Task_Classification@{get_prompt('Task_Classification').version})")
+    return [shard['path'] for shard in shards]
 
 
+@instrumented('task_map_results')
 def map_task_classification_results_to_csv(
     original_csv_path: str,
     batch_results_jsonl_path: str,
@@ -154,17 +161,25 @@ def map_task_classification_results_to_csv(
     """
     Maps OpenAI batch results from a JSONL file to the original CSV using conversation_hash and turn_num,
     and adds a new column with the classification.
+    The answers are canonicalized to the prompt's categories (task_labels.py); the raw text is kept in
+    Task_Classification_Raw, and answers that match no category are left empty.
+    If the results carry logprobs (--logprobs), the probability of each category goes to a float column
+    Task_Classification_P_<category> (e.g. Task_Classification_P_Coding_Debugging, like the CW _P_* columns)
+    and Task_Classification_Confidence holds the highest of them.
     """
     df = pd.read_csv(original_csv_path)
+    add_rows(len(df))
     df['Turn_Num'] = df['Turn_Num'].astype(str)
     df['Conversation_Hash'] = df['Conversation_Hash'].astype(str)
     
     classifications = {}
+    probabilities = {}
     with open(batch_results_jsonl_path, "r", encoding="utf-8") as f:
         for line in f:
             if not line.strip():
                 continue
             item = json.loads(line)
+            add_usage(item)
             custom_id = item.get("custom_id")
             if not custom_id or "response" not in item:
                 continue
@@ -182,16 +197,25 @@ def map_task_classification_results_to_csv(
                 else ""
             )
             classifications[(conversation_hash, turn_num)] = answer
+            category_probs = label_probabilities(item, TASK_CATEGORIES)
+            if category_probs is not None:
+                probabilities[(conversation_hash, turn_num)] = [category_probs[category] for category in TASK_CATEGORIES]
     
-    df['Task_Classification'] = [
-        classifications.get((str(row['Conversation_Hash']), str(row['Turn_Num'])), "")
-        for _, row in df.iterrows()
-    ]
+    keys = list(zip(df['Conversation_Hash'], df['Turn_Num']))
+    df['Task_Classification_Raw'] = [classifications.get(key, "") for key in keys]
+    df['Task_Classification'] = canonicalize_task_labels(df['Task_Classification_Raw'])
+    if probabilities:
+        columns = add_probability_columns(df, 'Task_Classification', TASK_CATEGORIES, probabilities, keys)
+        df['Task_Classification_Confidence'] = df[columns].max(axis=1)
+        print(f"Category probabilities for {len(probabilities)} rows saved to Task_Classification_P_* columns")
     
-    num_classified = (df['Task_Classification'] != "").sum()
-    num_empty = (df['Task_Classification'] == "").sum()
+    num_classified = df['Task_Classification'].notna().sum()
+    num_empty = (df['Task_Classification_Raw'] == "").sum()
+    num_unmatched = len(df) - num_classified - num_empty
     print(f"Number of rows with classification: {num_classified}")
     print(f"Number of rows with EMPTY classification: {num_empty}")
+    if num_unmatched:
+        print(f"⚠️ Number of rows whose answer matches no category (kept in Task_Classification_Raw): {num_unmatched}")
     
     df.to_csv(output_csv_path, index=False, encoding='utf-8')
     print(f"✅ Updated CSV with classifications saved to: {output_csv_path}")
@@ -209,7 +233,13 @@ def main():
     parser.add_argument('--input_csv', type=str, required=True, help='Input CSV file with conversations')
     parser.add_argument('--output_dir', type=str, required=False, default='output_task_classification', help='Output directory for all results')
     parser.add_argument('--model_name', type=str, default='gpt-4.1-2025-04-14', help='OpenAI model name')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for writing the request file (default: 1, 0 = all cores)')
+    parser.add_argument('--logprobs', action='store_true', help='Request label logprobs and store the category probabilities in Task_Classification_P_* columns')
+    add_shard_arguments(parser)
+    add_backend_arguments(parser)
+    add_retry_arguments(parser)
     args = parser.parse_args()
+    backend = backend_from_args(args)
 
     os.makedirs(args.output_dir, exist_ok=True)
     
@@ -220,25 +250,27 @@ def main():
     batch_results_path = os.path.join(args.output_dir, 'batch_results.jsonl')
     classified_csv = os.path.join(args.output_dir, 'task_classified.csv')
 
+    def retry():
+        return retry_failed_items(backend, batch_requests_path, batch_results_path, validate=is_valid_task_answer,
+                                  max_retries=args.max_retries, description="Task classification",
+                                  metadata=get_prompt("Task_Classification").metadata())
+
     if os.path.exists(batch_metadata_path):
         print("Batch metadata found.")
         if os.path.exists(batch_results_path):
-            print("Results found. Mapping classifications to CSV...")
-            map_task_classification_results_to_csv(
-                original_csv_path=exploded_csv,
-                batch_results_jsonl_path=batch_results_path,
-                output_csv_path=classified_csv
-            )
-            print(f"\n🎉 Task classification complete! Results saved in: {args.output_dir}")
+            if retry():
+                print("Results found. Mapping classifications to CSV...")
+                map_task_classification_results_to_csv(
+                    original_csv_path=exploded_csv,
+                    batch_results_jsonl_path=batch_results_path,
+                    output_csv_path=classified_csv
+                )
+                print(f"\n🎉 Task classification complete! Results saved in: {args.output_dir}")
+            else:
+                print("You may need to rerun this script later to process results.")
         else:
             print("Checking batch status...")
-            statuses = get_batch_statuses_from_metadata(batch_metadata_path)
-            if statuses and statuses[0]['status'] == 'completed':
-                print("Fetching batch results from OpenAI...")
-                fetch_batch_output(
-                    metadata_path=batch_metadata_path,
-                    save_path=batch_results_path
-                )
+            if backend.fetch(batch_metadata_path, batch_results_path) and retry():
                 print("Results fetched. Mapping classifications to CSV...")
                 map_task_classification_results_to_csv(
                     original_csv_path=exploded_csv,
@@ -247,7 +279,6 @@ def main():
                 )
                 print(f"\n🎉 Task classification complete! Results saved in: {args.output_dir}")
             else:
-                print(f"Batch not completed yet. Status: {statuses[0]['status'] if statuses else 'Unknown'}")
                 print("You may need to rerun this script later to process results.")
     else:
         print("No batch metadata found. Creating and submitting new batch...")
@@ -261,16 +292,31 @@ def main():
         make_task_classification_batch_request_file(
             input_csv_path=exploded_csv,
             output_jsonl_path=batch_requests_path,
-            model_name=args.model_name
+            model_name=args.model_name,
+            workers=args.workers,
+            max_requests_per_shard=args.max_requests_per_shard,
+            logprobs=args.logprobs
         )
         
-        # Step 3: Submit batch to OpenAI
-        print(f"\n[3/4] Submitting batch to OpenAI...")
-        submit_openai_batch(
+        # Step 3: Submit batch to the inference backend
+        print(f"\n[3/4] Submitting batch to the {backend.name} backend...")
+        backend.submit(
             batch_requests_path,
-            metadata_path=batch_metadata_path
+            metadata_path=batch_metadata_path,
+            results_path=batch_results_path,
+            metadata=get_prompt("Task_Classification").metadata()
         )
-        print("Batch submitted. Please rerun this script later to fetch results.")
+        if backend.fetch(batch_metadata_path, batch_results_path) and retry():
+            # Step 4: Local backends finish synchronously, so map right away
+            print(f"\n[4/4] Mapping classifications to CSV...")
+            map_task_classification_results_to_csv(
+                original_csv_path=exploded_csv,
+                batch_results_jsonl_path=batch_results_path,
+                output_csv_path=classified_csv
+            )
+            print(f"\n🎉 Task classification complete! Results saved in: {args.output_dir}")
+        else:
+            print("Batch submitted. Please rerun this script later to fetch results.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import re
+import difflib
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from prompt_registry import get_prompt
+from telemetry import instrumented, add_rows
+
+
+# Categories listed in the prompt ("• Name - description"); order of the Task_Classification_P_* columns
+TASK_CATEGORIES = re.findall(r'^•\s*(.+?)\s+-\s', get_prompt("Task_Classification").text, re.M)
+# Other spellings of a category, after normalization (lowercase, punctuation dropped)
+TASK_ALIASES = {
+    'coding and debugging': 'Coding & Debugging',
+    'coding debugging': 'Coding & Debugging',
+    'coding': 'Coding & Debugging',
+    'debugging': 'Coding & Debugging',
+    'roleplaying': 'Role Playing',
+    'roleplay': 'Role Playing',
+    'role play': 'Role Playing',
+    'brainstorm': 'Brainstorming',
+    'other': 'Others',
+}
+_CANONICAL = {**{category.lower(): category for category in TASK_CATEGORIES}, **TASK_ALIASES}
+# Longest names first, so 'coding & debugging' wins over 'coding'
+_CATEGORY_PATTERN = '(' + '|'.join(re.escape(name) for name in sorted(_CANONICAL, key=len, reverse=True)) + r')\b'
+_CATEGORY_RE = re.compile(r'\b' + _CATEGORY_PATTERN)
+_NON_LABEL_RE = re.compile(r'[^a-z&]+')
+
+
+def _normalize(labels):
+    """First line of each answer, lowercased, with bullets, markdown and punctuation turned into single spaces."""
+    first_line = labels.fillna('').astype(str).str.strip().str.split('\n', n=1).str[0]
+    return first_line.str.lower().str.replace(_NON_LABEL_RE, ' ', regex=True).str.strip()
+
+
+def _fuzzy_category(text, cutoff=0.8):
+    """Closest category of a normalized answer the pattern missed (typos), comparing its first 1-3 words too."""
+    words = text.split()
+    candidates = [text] + [' '.join(words[:k]) for k in (1, 2, 3) if k < len(words)]
+    best, best_ratio = None, cutoff
+    for candidate in candidates:
+        for name in difflib.get_close_matches(candidate, _CANONICAL, n=1, cutoff=best_ratio):
+            ratio = difflib.SequenceMatcher(None, candidate, name).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = _CANONICAL[name], ratio
+    return best
+
+
+@instrumented('task_canonicalize')
+def canonicalize_task_labels(labels, cutoff=0.8):
+    """
+    Maps raw task classification answers ("• Information seeking.", "**Math**", "Coding and debugging:
+    the user ...") to the categories of prompts/Task_Classification.txt.
+
+    The column is factorized first, so each distinct answer is matched once: against one precompiled
+    alternation of the category names and aliases, then, only if that misses, by fuzzy matching
+    (difflib, `cutoff` similarity). The category codes are then broadcast back with one take.
+
+    Returns:
+        pd.Series: Categorical with TASK_CATEGORIES as categories; NaN where no category matched.
+    """
+    labels = pd.Series(labels)
+    add_rows(len(labels))
+    codes, uniques = pd.factorize(labels)
+    normalized = _normalize(pd.Series(uniques, dtype=object))
+    # object dtype: pandas' string dtype rejects the masked list assignment of the fuzzy matches below
+    matched = normalized.str.extract(_CATEGORY_RE, expand=False).map(_CANONICAL).astype(object)
+    missing = matched.isna() & (normalized != '')
+    if missing.any():
+        matched[missing] = [_fuzzy_category(text, cutoff) for text in normalized[missing]]
+    category_codes = pd.Categorical(matched, categories=TASK_CATEGORIES).codes
+    # Unique answer -> category code, with -1 (NaN) for unmatched and missing answers
+    category_codes = np.append(category_codes, -1)[codes]
+    return pd.Series(pd.Categorical.from_codes(category_codes, categories=TASK_CATEGORIES), index=labels.index, name=labels.name)
+
+
+def canonical_task_label(text, cutoff=0.8):
+    """Category of a single answer (same rules as canonicalize_task_labels), or None if it matches none."""
+    if not isinstance(text, str):
+        return None
+    normalized = _NON_LABEL_RE.sub(' ', text.strip().split('\n', 1)[0].lower()).strip()
+    match = _CATEGORY_RE.search(normalized)
+    if match:
+        return _CANONICAL[match.group(1)]
+    return _fuzzy_category(normalized, cutoff) if normalized else None
+
+
+def is_valid_task_answer(content):
+    """False for answers that name no category, so batch_retry.py asks again."""
+    return canonical_task_label(content) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Canonicalize the task classification labels of a CSV.")
+    parser.add_argument('--input_csv', required=True, help='CSV with task labels, e.g. task_classified.csv')
+    parser.add_argument('--output_csv', default=None, help='Where to save the result (default: overwrite the input)')
+    parser.add_argument('--column', default='Task_Classification', help='Label column (default: Task_Classification)')
+    parser.add_argument('--cutoff', type=float, default=0.8, help='Minimum fuzzy similarity for answers the pattern misses (default: 0.8)')
+    args = parser.parse_args()
+    df = pd.read_csv(args.input_csv, dtype={args.column: str}, keep_default_na=False)
+    raw = df[args.column]
+    df[args.column] = canonicalize_task_labels(raw, args.cutoff)
+    unmatched = df[args.column].isna() & (raw != '')
+    rewritten = df[args.column].notna() & (df[args.column].astype(object) != raw)
+    print(f"📊 {int(rewritten.sum())} labels rewritten, {int(unmatched.sum())} unmatched")
+    if unmatched.any():
+        print(raw[unmatched].value_counts().head(10))
+    df.to_csv(args.output_csv or args.input_csv, index=False)
+    print(df[args.column].value_counts())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Unix only; without it (and /proc) the peak RSS fields are recorded as None
+    resource = None
+
+
+# Set to a path to record every instrumented stage of every script as one JSON line
+RUN_LOG_ENV = 'WILDCLAIMS_RUN_LOG'
+# Shared by the scripts of one pipeline run (default: a new id per process)
+RUN_ID_ENV = 'WILDCLAIMS_RUN_ID'
+
+# USD per 1M (prompt, completion) tokens at standard rates; the Batch API bills half (--batch_discount)
+MODEL_PRICES = {
+    'gpt-4.1-nano': (0.10, 0.40),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+}
+
+_config = {'path': os.environ.get(RUN_LOG_ENV) or None, 'run_id': os.environ.get(RUN_ID_ENV) or uuid.uuid4().hex[:12]}
+# Stages currently running in this process, outermost first
+_active = []
+
+
+def configure(path, run_id=None):
+    """Enables (or, with path=None, disables) the run log for this process."""
+    _config['path'] = path
+    if run_id:
+        _config['run_id'] = run_id
+
+
+def enabled():
+    return _config['path'] is not None
+
+
+def _read_status_mb(field):
+    """VmHWM / VmRSS of this process in MB from /proc (None where /proc is not available)."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Resets the kernel's peak RSS counter (Linux >= 4.0) so the next stage measures its own peak."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss_mb(children=False):
+    """Lifetime peak RSS in MB of this process (or of its largest child), or None without the resource module."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class StageMetrics:
+    """Counters of one running stage; stage code adds to them through add_rows / add_usage."""
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.rows = 0
+        self.requests = 0
+        self.usage = {}
+        self.peak_rss_mb = _read_status_mb('VmRSS')
+
+    def add_usage(self, model, prompt_tokens, completion_tokens):
+        counts = self.usage.setdefault(model or 'unknown', {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+        counts['requests'] += 1
+        counts['prompt_tokens'] += prompt_tokens
+        counts['completion_tokens'] += completion_tokens
+        self.requests += 1
+
+
+def _note_peak():
+    """Credits the peak RSS since the last reset to every active stage."""
+    peak = _read_status_mb('VmHWM')
+    if peak is None:
+        peak = _maxrss_mb()
+    if peak is None:
+        return
+    for metrics in _active:
+        metrics.peak_rss_mb = peak if metrics.peak_rss_mb is None else max(metrics.peak_rss_mb, peak)
+
+
+@contextmanager
+def stage(name):
+    """
+    Measures a block as a pipeline stage: wall time, rows/s, peak RSS and the token usage added with
+    add_usage. Nested stages are recorded as sub-steps of the enclosing one. A JSON line is appended to
+    the run log when it is enabled (WILDCLAIMS_RUN_LOG or configure()); otherwise only counting happens.
+    """
+    _note_peak()
+    _reset_peak_rss()
+    metrics = StageMetrics(name, parent=_active[-1].name if _active else None)
+    _active.append(metrics)
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    start = time.perf_counter()
+    error = None
+    try:
+        yield metrics
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        _note_peak()
+        _active.pop()
+        if enabled():
+            _write_record(metrics, started_at, seconds, error)
+
+
+def _round_mb(value):
+    return round(value, 1) if value is not None else None
+
+
+def _write_record(metrics, started_at, seconds, error):
+    prompt_tokens = sum(counts['prompt_tokens'] for counts in metrics.usage.values())
+    completion_tokens = sum(counts['completion_tokens'] for counts in metrics.usage.values())
+    record = {
+        'run_id': _config['run_id'],
+        'started_at': started_at,
+        'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+        'stage': metrics.name,
+        'parent': metrics.parent,
+        'status': 'error' if error else 'ok',
+        'error': error,
+        'seconds': round(seconds, 4),
+        'rows': metrics.rows,
+        'rows_per_second': round(metrics.rows / seconds, 1) if seconds > 0 and metrics.rows else None,
+        'peak_rss_mb': _round_mb(metrics.peak_rss_mb),
+        # Lifetime peak of the largest worker process (--workers > 1)
+        'children_peak_rss_mb': _round_mb(_maxrss_mb(children=True)),
+        'requests': metrics.requests,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'usage_by_model': metrics.usage,
+    }
+    with open(_config['path'], 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def instrumented(name):
+    """Decorator running a pipeline function as stage `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_rows(count):
+    """Adds processed rows to the innermost running stage (no-op outside stages)."""
+    if _active:
+        _active[-1].rows += int(count)
+
+
+def add_usage(result):
+    """Adds the `usage` block of one Batch API output line (or chat completion body) to the innermost stage."""
+    if not _active or not isinstance(result, dict):
+        return
+    body = (result.get('response') or {}).get('body') if 'response' in result else result
+    usage = (body or {}).get('usage') if isinstance(body, dict) else None
+    if not usage:
+        return
+    _active[-1].add_usage(body.get('model'), int(usage.get('prompt_tokens') or 0), int(usage.get('completion_tokens') or 0))
+
+
+def model_price(model):
+    """(prompt, completion) USD per 1M tokens of a model, matched on the longest known prefix; None if unknown."""
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if str(model).startswith(prefix):
+            return MODEL_PRICES[prefix]
+    return None
+
+
+def estimate_cost(usage_by_model, batch_discount=0.5):
+    """USD cost of a usage_by_model dict; models without a price count as 0."""
+    cost = 0.0
+    for model, counts in (usage_by_model or {}).items():
+        price = model_price(model)
+        if price:
+            cost += (counts['prompt_tokens'] * price[0] + counts['completion_tokens'] * price[1]) / 1e6
+    return cost * (1 - batch_discount)
+
+
+def load_run_log(path, run_id=None):
+    """Run log records as a DataFrame, optionally only those of one run."""
+    with open(path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    df = pd.DataFrame(records)
+    if run_id and len(df):
+        df = df[df['run_id'] == run_id]
+    return df
+
+
+def summarize(df, batch_discount=0.5):
+    """
+    Per-stage totals of a run log: calls, seconds, rows, rows/s, max peak RSS, tokens and cost.
+
+    Returns:
+        pd.DataFrame: one row per stage, slowest first.
+    """
+    if not len(df):
+        return pd.DataFrame()
+    df = df.copy()
+    df['cost_usd'] = [estimate_cost(usage, batch_discount) for usage in df['usage_by_model']]
+    summary = df.groupby('stage', sort=False).agg(
+        calls=('stage', 'size'),
+        errors=('status', lambda status: int((status == 'error').sum())),
+        seconds=('seconds', 'sum'),
+        rows=('rows', 'sum'),
+        peak_rss_mb=('peak_rss_mb', 'max'),
+        requests=('requests', 'sum'),
+        prompt_tokens=('prompt_tokens', 'sum'),
+        completion_tokens=('completion_tokens', 'sum'),
+        cost_usd=('cost_usd', 'sum'),
+    )
+    summary['rows_per_second'] = (summary['rows'] / summary['seconds']).where(summary['rows'] > 0).round(1)
+    return summary.sort_values('seconds', ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary of a pipeline run log (slowest and most expensive stages).")
+    parser.add_argument('--run_log', default=os.environ.get(RUN_LOG_ENV), required=not os.environ.get(RUN_LOG_ENV),
+                        help=f'Run log JSONL (default: ${RUN_LOG_ENV})')
+    parser.add_argument('--run_id', default=None, help='Only this run (default: every record in the log)')
+    parser.add_argument('--top', type=int, default=10, help='Stages to list per ranking (default: 10)')
+    parser.add_argument('--batch_discount', type=float, default=0.5, help='Discount of the Batch API on token prices (default: 0.5; 0 for synchronous calls)')
+    parser.add_argument('--output_csv', default=None, help='Also save the per-stage summary as CSV')
+    args = parser.parse_args()
+
+    df = load_run_log(args.run_log, args.run_id)
+    if not len(df):
+        print(f"⚠️ No records in {args.run_log}")
+        return
+    summary = summarize(df, args.batch_discount)
+    print(f"📊 {len(df)} records, {df['run_id'].nunique()} runs, {summary['calls'].sum()} stage calls")
+    print(f"⏱️ Total time in top-level stages: {df.loc[df['parent'].isna(), 'seconds'].sum():.1f}s")
+    print(f"💰 Tokens: {int(summary['prompt_tokens'].sum())} prompt + {int(summary['completion_tokens'].sum())} completion, "
+          f"estimated ${summary['cost_usd'].sum():.2f}")
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(f"\n=== Slowest stages ===")
+        print(summary[['calls', 'seconds', 'rows', 'rows_per_second', 'peak_rss_mb']].head(args.top).to_string())
+        expensive = summary[summary['requests'] > 0].sort_values('cost_usd', ascending=False)
+        if len(expensive):
+            print(f"\n=== Most expensive stages ===")
+            print(expensive[['requests', 'prompt_tokens', 'completion_tokens', 'cost_usd']].head(args.top).round(4).to_string())
+    if summary['errors'].sum():
+        print(f"\n⚠️ Stages with errors: {', '.join(summary.index[summary['errors'] > 0])}")
+    if args.output_csv:
+        summary.to_csv(args.output_csv)
+        print(f"💾 Summary saved to: {args.output_csv}")
+
+
+if __name__ == "__main__":
+    main()